@@ -0,0 +1,204 @@
+'''NMEA0183 capture file with offset index'''
+
+import bisect
+import datetime
+import math
+import mmap
+import os
+import struct
+import zlib
+from typing import Iterator, Optional
+
+from .RMC import RMC
+from .Sentence import Sentence, bytes_to_sentence
+from .status import try_parse
+
+_BLOCK = 4096 # bytes of the capture the index header fingerprints, at its start and before the indexed end
+
+def _timestamp(time: datetime.datetime) -> float:
+  return time.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+def _fingerprint(f, indexed: int) -> tuple[int, int]:
+  '''crc32 of the first block of the capture and of the block that ends where the index ends'''
+  f.seek(0)
+  head = zlib.crc32(f.read(min(indexed, _BLOCK)))
+  start = max(0, indexed - _BLOCK)
+  f.seek(start)
+  tail = zlib.crc32(f.read(indexed - start))
+  return head, tail
+
+class CaptureFile:
+  '''
+  Raw NMEA0183 capture (one sentence per line) with a persistent index.
+
+  The index lives next to the capture in "<filename>.idx" and stores offset,
+  length, talker, topic and the time of the latest preceding RMC for every
+  sentence. update() only indexes what was appended since the last call, so
+  it is cheap on a log that is still being written. Queries use the index
+  and read just the matching lines from the memory-mapped capture; lines
+  that do not parse are skipped and counted in corrupt:
+
+    with CaptureFile('2021-07-01.nmea') as capture:
+      for sentence in capture.select(topic=b'GSV', start=datetime(2021, 7, 1, 13, 55), end=datetime(2021, 7, 1, 14, 5)):
+        ...
+  '''
+
+  _MAGIC = b'NMEAIDX2'
+  _HEADER = struct.Struct('<8sQQdII') # magic, indexed bytes, number of records, last RMC time, _fingerprint() of the indexed bytes
+  _RECORD = struct.Struct('<QI2s3sxd') # offset, length, talker, topic, time
+
+  def __init__(self, filename: str, index: Optional[str] = None):
+    self._filename = filename
+    self._index_filename = index or filename + '.idx'
+
+    self._offsets = list()
+    self._lengths = list()
+    self._keys = list()
+    self._times = list()
+    self._indexed = 0
+    self._time = -math.inf
+    self._sorted = True
+    self._corrupt = 0
+
+    self._file = open(self._filename, 'rb')
+    self._map = None
+    self._index = self._open_index()
+    self.update()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def __len__(self) -> int:
+    return len(self._offsets)
+
+  def close(self) -> None:
+    if self._map is not None:
+      self._map.close()
+      self._map = None
+    self._index.close()
+    self._file.close()
+
+  def _open_index(self):
+    try:
+      index = open(self._index_filename, 'r+b')
+    except FileNotFoundError:
+      index = open(self._index_filename, 'w+b')
+
+    header = index.read(self._HEADER.size)
+    if len(header) == self._HEADER.size:
+      magic, indexed, count, time, head, tail = self._HEADER.unpack(header)
+      # rebuild if the capture was truncated or replaced, also by a larger file
+      if magic == self._MAGIC and indexed <= os.path.getsize(self._filename) and (head, tail) == _fingerprint(self._file, indexed):
+        data = index.read(count * self._RECORD.size)
+        if len(data) == count * self._RECORD.size:
+          for record in self._RECORD.iter_unpack(data):
+            self._append(*record)
+          self._indexed = indexed
+          self._time = time
+          # drop records written after the last header update
+          index.truncate(self._HEADER.size + count * self._RECORD.size)
+          return index
+
+    index.seek(0)
+    index.truncate()
+    index.write(self._HEADER.pack(self._MAGIC, 0, 0, -math.inf, *_fingerprint(self._file, 0)))
+    return index
+
+  def _append(self, offset: int, length: int, talker: bytes, topic: bytes, time: float) -> None:
+    if self._times and time < self._times[-1]:
+      self._sorted = False
+    self._offsets.append(offset)
+    self._lengths.append(length)
+    self._keys.append(talker + topic)
+    self._times.append(time)
+
+  def update(self) -> int:
+    '''index sentences appended to the capture since the last update'''
+    size = os.path.getsize(self._filename)
+    if size == 0 or (size == self._indexed and self._map is not None):
+      return 0
+
+    if self._map is not None:
+      self._map.close()
+    self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+    data = self._map
+    size = len(data)
+
+    records = list()
+    pos = self._indexed
+    while True:
+      end = data.find(b'\n', pos, size)
+      if end < 0:
+        break # incomplete line, wait for the rest
+      end += 1
+
+      if data[pos] == 0x24 and end - pos > 6:
+        talker = data[pos + 1:pos + 3]
+        topic = data[pos + 3:pos + 6]
+        if topic == b'RMC':
+          try:
+            self._time = _timestamp(RMC(bytes_to_sentence(data[pos:end])).time)
+          except Exception:
+            pass
+        records.append(self._RECORD.pack(pos, end - pos, talker, topic, self._time))
+        self._append(pos, end - pos, talker, topic, self._time)
+      pos = end
+
+    # records first, then the header that makes them valid
+    self._index.seek(0, os.SEEK_END)
+    self._index.write(b''.join(records))
+    self._index.flush()
+    self._indexed = pos
+    self._index.seek(0)
+    self._index.write(self._HEADER.pack(self._MAGIC, self._indexed, len(self._offsets), self._time, *_fingerprint(self._file, self._indexed)))
+    self._index.flush()
+
+    return len(records)
+
+  def select(self, talker: Optional[bytes] = None, topic: Optional[bytes] = None, start: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None) -> Iterator[Sentence]:
+    '''sentences matching talker, topic and RMC time range [start, end)'''
+    for offset, length in self.offsets(talker, topic, start, end):
+      status, sentence = try_parse(self._map[offset:offset + length])
+      if status:
+        self._corrupt += 1
+        continue
+      yield sentence
+
+  def offsets(self, talker: Optional[bytes] = None, topic: Optional[bytes] = None, start: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None) -> Iterator[tuple[int, int]]:
+    '''(offset, length) of the sentences matching select()'''
+    first, last = 0, len(self._times)
+    lower = _timestamp(start) if start else -math.inf
+    upper = _timestamp(end) if end else math.inf
+    if self._sorted:
+      first = bisect.bisect_left(self._times, lower)
+      last = bisect.bisect_left(self._times, upper)
+
+    for i in range(first, last):
+      key = self._keys[i]
+      if talker and key[0:2] != talker:
+        continue
+      if topic and key[2:5] != topic:
+        continue
+      if not self._sorted and not lower <= self._times[i] < upper:
+        continue
+      yield self._offsets[i], self._lengths[i]
+
+  @property
+  def filename(self) -> str:
+    return self._filename
+
+  @property
+  def corrupt(self) -> int:
+    '''number of indexed lines select() skipped because they do not parse'''
+    return self._corrupt
+
+  @property
+  def topics(self) -> set[bytes]:
+    return {key[2:5] for key in self._keys}
+
+  @property
+  def talkers(self) -> set[bytes]:
+    return {key[0:2] for key in self._keys}
@@ -0,0 +1,165 @@
+'''NMEA0183 ring buffer of recent fixes'''
+
+import datetime
+import struct
+from typing import NamedTuple, Optional, Union
+
+import numpy
+
+from .GGA import GGA
+from .GSA import GSA
+from .RMC import RMC
+
+EARTH_RADIUS = 6378.137 * 1000 # WGS84 semi-major axis (m)
+
+COLUMNS = ('time', 'latitude', 'longitude', 'speed', 'heading', 'altitude', 'satellites', 'hdop', 'vdop')
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_ROW = struct.Struct('<%dd' % len(COLUMNS))
+_TIME, _LATITUDE, _LONGITUDE, _SPEED, _HEADING, _ALTITUDE, _SATELLITES, _HDOP, _VDOP = range(len(COLUMNS))
+
+Time = Union[datetime.datetime, float] # datetime (naive = UTC) or seconds since the epoch
+
+class Fix(NamedTuple):
+  '''one row of FixBuffer; NaN where a value is not known'''
+  time: float # seconds since the epoch
+  latitude: float
+  longitude: float
+  speed: float # knots
+  heading: float
+  altitude: float
+  satellites: float
+  hdop: float
+  vdop: float
+
+def _seconds(time: Time) -> float:
+  if isinstance(time, datetime.datetime):
+    if time.tzinfo is not None:
+      return time.timestamp()
+    return (time - _EPOCH).total_seconds()
+  return time
+
+def _float(value) -> float:
+  return numpy.nan if value is None else value
+
+class FixBuffer:
+  '''
+  The last capacity fixes as numpy columns (see COLUMNS), for windowed
+  queries such as the mean speed over the last ten minutes:
+
+    fixes = FixBuffer(capacity=3600)
+    fixes.update_rmc(rmc)
+    fixes.mean('speed', seconds=600)
+
+  Every RMC appends a fix in O(1), with the altitude, satellites and DOP of
+  the latest GGA and GSA. The arrays are allocated once, so memory stays
+  the same however long the buffer runs. Each fix is written twice, at its
+  row and capacity rows later, so the fixes in time order are always one
+  contiguous block of rows and column() returns a view. Fixes are expected in time
+  order, as a receiver sends them; a window is found by binary search.
+  '''
+
+  def __init__(self, capacity: int = 3600):
+    if capacity < 1:
+      raise Exception('Capacity must be positive', capacity)
+    self._capacity = capacity
+    self._data = numpy.full((2 * capacity, len(COLUMNS)), numpy.nan)
+    self._bytes = memoryview(self._data).cast('B') # a fix is written as one packed row
+    self._next = 0 # row of the next fix
+    self._count = 0
+    self._latest = [numpy.nan] * len(COLUMNS) # altitude, satellites and DOP carried over to the next fix
+
+  def __len__(self) -> int:
+    return self._count
+
+  @property
+  def capacity(self) -> int:
+    return self._capacity
+
+  def append(self, time: Time, latitude: float, longitude: float, speed: Optional[float] = None, heading: Optional[float] = None) -> None:
+    '''a fix with the latest altitude, satellites and DOP'''
+    row = self._latest
+    row[_TIME] = _seconds(time)
+    row[_LATITUDE] = latitude
+    row[_LONGITUDE] = longitude
+    row[_SPEED] = _float(speed)
+    row[_HEADING] = _float(heading)
+    packed = _ROW.pack(*row)
+    offset = self._next * _ROW.size
+    self._bytes[offset:offset + _ROW.size] = packed
+    offset += self._capacity * _ROW.size
+    self._bytes[offset:offset + _ROW.size] = packed
+    self._next = self._next + 1 if self._next + 1 < self._capacity else 0
+    if self._count < self._capacity:
+      self._count += 1
+
+  def update_rmc(self, rmc: RMC) -> None:
+    self.append((rmc.time - _EPOCH).total_seconds(), rmc.latitude, rmc.longitude, rmc.speed, rmc.heading)
+
+  def update_gga(self, gga: GGA) -> None:
+    self._latest[_ALTITUDE] = gga.altitude
+    self._latest[_SATELLITES] = _float(gga.numberOfSatellites)
+
+  def update_gsa(self, gsa: GSA) -> None:
+    self._latest[_HDOP] = gsa.hdop
+    self._latest[_VDOP] = gsa.vdop
+
+  def latest(self) -> Optional[Fix]:
+    if not self._count:
+      return None
+    return Fix._make(_ROW.unpack_from(self._bytes, (self._next + self._capacity - 1) * _ROW.size))
+
+  def _range(self, start: Optional[Time], end: Optional[Time], seconds: Optional[float]) -> tuple[int, int]:
+    '''rows of the fixes in [start, end], or in the last seconds before the latest fix'''
+    upper = self._next + self._capacity
+    lower = upper - self._count
+    if not self._count or (start is None and end is None and seconds is None):
+      return lower, upper
+    times = self._data[lower:upper, _TIME]
+    if seconds is not None:
+      start = times[-1] - seconds
+    if start is not None:
+      lower += int(times.searchsorted(_seconds(start), 'left'))
+    if end is not None:
+      upper -= len(times) - int(times.searchsorted(_seconds(end), 'right'))
+    return lower, max(lower, upper)
+
+  def column(self, name: str, start: Optional[Time] = None, end: Optional[Time] = None, seconds: Optional[float] = None) -> numpy.ndarray:
+    '''
+    Read-only view of one column in time order, of the fixes from start to
+    end (inclusive) or of the last seconds before the latest fix. The view
+    changes as fixes are appended; copy it to keep it.
+    '''
+    lower, upper = self._range(start, end, seconds)
+    view = self._data[lower:upper, COLUMNS.index(name)]
+    view.flags.writeable = False
+    return view
+
+  def mean(self, name: str, start: Optional[Time] = None, end: Optional[Time] = None, seconds: Optional[float] = None) -> Optional[float]:
+    '''mean of a column over a window (see column), None if it has no values'''
+    values = self.column(name, start, end, seconds)
+    n = numpy.count_nonzero(~numpy.isnan(values))
+    return float(numpy.nansum(values)) / n if n else None
+
+  def max(self, name: str, start: Optional[Time] = None, end: Optional[Time] = None, seconds: Optional[float] = None) -> Optional[float]:
+    values = self.column(name, start, end, seconds)
+    return float(numpy.nanmax(values)) if not numpy.isnan(values).all() else None
+
+  def min(self, name: str, start: Optional[Time] = None, end: Optional[Time] = None, seconds: Optional[float] = None) -> Optional[float]:
+    values = self.column(name, start, end, seconds)
+    return float(numpy.nanmin(values)) if not numpy.isnan(values).all() else None
+
+  def percentile(self, name: str, q: float, start: Optional[Time] = None, end: Optional[Time] = None, seconds: Optional[float] = None) -> Optional[float]:
+    '''q-th percentile (0 to 100); the only query that copies the window, to partition it'''
+    values = self.column(name, start, end, seconds)
+    return float(numpy.nanpercentile(values, q)) if not numpy.isnan(values).all() else None
+
+  def distance(self, start: Optional[Time] = None, end: Optional[Time] = None, seconds: Optional[float] = None) -> float:
+    '''metres travelled over a window (haversine between consecutive fixes)'''
+    lower, upper = self._range(start, end, seconds)
+    if upper - lower < 2:
+      return 0.0
+    lat = numpy.radians(self._data[lower:upper, _LATITUDE])
+    lon = numpy.radians(self._data[lower:upper, _LONGITUDE])
+    a = numpy.sin(numpy.diff(lat) / 2) ** 2 + numpy.cos(lat[:-1]) * numpy.cos(lat[1:]) * numpy.sin(numpy.diff(lon) / 2) ** 2
+    return float(EARTH_RADIUS * 2 * numpy.arcsin(numpy.sqrt(a)).sum())
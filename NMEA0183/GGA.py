@@ -1,10 +1,18 @@
 ''''''
 
-from NMEA0183 import Sentence
+from typing import NamedTuple, Optional
+
+from .Sentence import Sentence
+from .status import OK, Status
 
 def int_or_none(value):
   return int(value) if value else None
 
+class GGARecord(NamedTuple):
+  '''compact, immutable GGA values (see GGA.record)'''
+  altitude: float
+  sentence: Optional[Sentence] = None
+
 class GGA:
   '''
   The NMEA GGA sentence is one of the most common sentences used with
@@ -93,17 +101,42 @@ class GGA:
     if self._sentence.topic != b'GGA':
       raise Exception('Wrong sentence, expected **GGA', self._sentence)
 
-    if sentence.fields[5] == '0': # Invalid, no position available
+    if sentence.fields[5] == b'0': # Invalid, no position available
       raise Exception('Void', self._sentence)
 
+    self._quality = int(sentence.fields[5])
+    self._numberOfSatellites = int_or_none(sentence.fields[6])
     self._alt = float(sentence.fields[8])
 
+  @staticmethod
+  def check(fields: list[bytes]) -> Status:
+    '''status of the fields without decoding them (see try_decode)'''
+    if len(fields) < 9:
+      return Status.TRUNCATED
+    if fields[5] == b'0': # Invalid, no position available
+      return Status.VOID
+    return OK
+
   def __repr__(self):
     return '%s: %s' % (type(self), self._sentence)
 
+  def record(self, keep_sentence: bool = False) -> GGARecord:
+    '''decoded values without the per-instance overhead of this class'''
+    return GGARecord(self._alt, self._sentence if keep_sentence else None)
+
   def __str__(self):
     return '%s' % self._sentence
 
+  @property
+  def quality(self) -> int:
+    '''fix quality (1 = GPS, 2 = DGPS, 4 = RTK fixed, 5 = RTK float, ...)'''
+    return self._quality
+
+  @property
+  def numberOfSatellites(self):
+    '''number of satellites in use'''
+    return self._numberOfSatellites
+
   @property
   def altitude(self) -> float:
     '''altitude (height of the Geoid (mean sea level) above the
@@ -1,7 +1,16 @@
 ''''''
 
-from NMEA0183 import Sentence
+from typing import NamedTuple, Optional
 
+from .Sentence import Sentence
+from .status import OK, Status
+
+class GSARecord(NamedTuple):
+  '''compact, immutable GSA values (see GSA.record)'''
+  dop: float
+  hdop: float
+  vdop: float
+  sentence: Optional[Sentence] = None
 
 class GSA:
   '''
@@ -47,16 +56,40 @@ class GSA:
     if self._sentence.topic != b'GSA':
       raise Exception('Wrong sentence, expected **GSA', self._sentence)
 
+    self._prns = [int(prn) for prn in sentence.fields[2:14] if prn]
+    self._system = sentence.fields[17] if len(sentence.fields) > 17 else None
+
     self._dop = float(sentence.fields[14])
     self._hdop = float(sentence.fields[15])
     self._vdop = float(sentence.fields[16])
 
+  @staticmethod
+  def check(fields: list[bytes]) -> Status:
+    '''status of the fields without decoding them (see try_decode)'''
+    if len(fields) < 17:
+      return Status.TRUNCATED
+    return OK
+
   def __repr__(self):
     return '%s: %s' % (type(self), self._sentence)
 
+  def record(self, keep_sentence: bool = False) -> GSARecord:
+    '''decoded values without the per-instance overhead of this class'''
+    return GSARecord(self._dop, self._hdop, self._vdop, self._sentence if keep_sentence else None)
+
   def __str__(self):
     return '%s' % self._sentence
 
+  @property
+  def prns(self) -> list[int]:
+    '''PRNs of satellites used for fix'''
+    return self._prns
+
+  @property
+  def system(self) -> Optional[bytes]:
+    '''GNSS system id (NMEA 4.1 and later)'''
+    return self._system
+
   @property
   def dop(self) -> float:
     '''P-DOP (dilution of precision)'''
@@ -1,10 +1,27 @@
 ''''''
 
-from NMEA0183 import Sentence
+from typing import NamedTuple, Optional
+
+from .Sentence import Sentence
+from .status import OK, Status
 
 def int_or_none(value):
   return int(value) if value else None
 
+class Satellite(NamedTuple):
+  prn: int
+  elevation: Optional[int]
+  azimuth: Optional[int]
+  snr: Optional[int]
+
+class GSVRecord(NamedTuple):
+  '''compact, immutable GSV values (see GSV.record)'''
+  numberOfSentences: int
+  index: int
+  numberOfSatellites: int
+  satellites: tuple[Satellite, ...]
+  sentence: Optional[Sentence] = None
+
 class GSV:
   '''
   GSV - Satellites in View shows data about the satellites that the unit might
@@ -63,9 +80,21 @@ class GSV:
         self._satellites.append((int(sentence.fields[3 + i*4 + 0]), int_or_none(sentence.fields[3 + i*4 + 1]), int_or_none(sentence.fields[3 + i*4 + 2]), int_or_none(sentence.fields[3 + i*4 + 3])))
       i += 1
 
+  @staticmethod
+  def check(fields: list[bytes]) -> Status:
+    '''status of the fields without decoding them (see try_decode)'''
+    if len(fields) < 3:
+      return Status.TRUNCATED
+    return OK
+
   def __repr__(self):
     return '%s: %s' % (type(self), self._sentence)
 
+  def record(self, keep_sentence: bool = False) -> GSVRecord:
+    '''decoded values without the per-instance overhead of this class'''
+    satellites = tuple(Satellite(*satellite) for satellite in self._satellites)
+    return GSVRecord(self._numberOfSentences, self._index, self._numberOfSatellites, satellites, self._sentence if keep_sentence else None)
+
   def __str__(self):
     return '%s' % self._sentence
 
@@ -0,0 +1,80 @@
+'''NMEA0183 lazy Sentence'''
+
+from typing import Union
+
+from .Sentence import Sentence, calculate_checksum
+
+class LazySentence(Sentence):
+  '''
+  Sentence backed by the received buffer (bytes, memoryview, zmq frame, ...).
+
+  Only the framing is checked up front. Talker and topic are sliced on first
+  access, the fields are split (and the checksum validated) when they are
+  first needed, and raw returns the received bytes without re-encoding. This
+  keeps the cost of sentences that are dropped after a look at talker or topic
+  close to zero.
+  '''
+
+  def __init__(self, raw: Union[bytes,bytearray,memoryview]):
+    if not isinstance(raw, (bytes, memoryview)):
+      raw = memoryview(raw)
+
+    if raw[0] != ord('$'):
+      raise Exception('Invalid prefix', bytes(raw))
+    if raw[-2:] != b'\r\n':
+      raise Exception('Invalid suffix', bytes(raw))
+
+    self._buffer = raw
+    self._end = len(raw) - 5 if raw[-5] == ord('*') else len(raw) - 2 # end of msg
+
+    self._talker = None
+    self._topic = None
+    self._fields = None
+    self._checksum = None
+
+  @property
+  def raw(self) -> bytes:
+    if not isinstance(self._buffer, bytes):
+      self._buffer = bytes(self._buffer)
+    return self._buffer
+
+  @property
+  def talker(self) -> bytes:
+    if self._talker is None:
+      self._talker = bytes(self._buffer[1:3])
+    return self._talker
+
+  @property
+  def topic(self) -> bytes:
+    if self._topic is None:
+      self._topic = bytes(self._buffer[3:6])
+    return self._topic
+
+  @property
+  def msg(self) -> bytes:
+    return bytes(self._buffer[1:self._end])
+
+  @property
+  def fields(self) -> list[bytes]:
+    if self._fields is None:
+      msg = self.msg
+      if self.has_checksum:
+        checksum = self.checksum
+        if checksum != calculate_checksum(msg):
+          raise Exception('Wrong checksum - got {} expected {}'.format(checksum, calculate_checksum(msg)), self.raw)
+      self._fields = msg.split(b',')[1:]
+    return self._fields
+
+  @property
+  def checksum(self) -> bytes:
+    if self._checksum is None:
+      if self.has_checksum:
+        self._checksum = bytes(self._buffer[self._end + 1:self._end + 3])
+      else:
+        self._checksum = calculate_checksum(self.msg)
+    return self._checksum
+
+  @property
+  def has_checksum(self) -> bool:
+    '''whether the received sentence carries a checksum'''
+    return self._end == len(self._buffer) - 5
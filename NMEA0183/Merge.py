@@ -0,0 +1,176 @@
+'''NMEA0183 time-ordered merge of several sources'''
+
+import heapq
+from typing import Callable, Iterable, Iterator, Mapping, NamedTuple, Optional, Union
+
+from .status import try_parse
+
+# topic -> field with the UTC time of day (hhmmss.ss)
+_TIME_FIELD = {b'RMC': 0, b'GGA': 0, b'GLL': 4, b'GNS': 0, b'ZDA': 0, b'GBS': 0, b'GST': 0}
+
+_DAY = 86400.0
+
+def time_of_day(raw: Union[bytes,memoryview]) -> Optional[float]:
+  '''UTC seconds of the day a sentence carries, None if it has none or is not valid'''
+  field = _TIME_FIELD.get(bytes(raw[3:6]))
+  if field is None:
+    return None
+  status, sentence = try_parse(raw)
+  if status or len(sentence.fields) <= field:
+    return None
+  value = sentence.fields[field]
+  try:
+    return int(value[0:2]) * 3600 + int(value[2:4]) * 60 + float(value[4:])
+  except ValueError:
+    return None
+
+class Merged(NamedTuple):
+  time: float # merge key, seconds on the clock of the receive times
+  source: str
+  raw: Union[bytes,memoryview]
+
+class _Source:
+  __slots__ = ('offset', 'last', 'pending', 'late')
+
+  def __init__(self):
+    self.offset = None # source time of day to receive clock, the smallest delay seen
+    self.last = None # key of the last sentence with a time
+    self.pending = 0
+    self.late = 0
+
+class Merge:
+  '''
+  Orders the sentences of several sources by the time they carry:
+
+    merge = Merge(window=0.5)
+    merge.push('gps', raw, time.time())
+    for item in merge.pop(time.time()):
+      ...
+
+  Sentences with a time (RMC, GGA, GLL, ...) are put on the receive clock
+  with the smallest delay seen from their source, so receive jitter does
+  not reorder them, and differing clocks of sources do not matter.
+  Sentences without a time follow the previous sentence of their source,
+  those of sources without any time are ordered by receive time.
+
+  A sentence is held until it is window seconds old. One that arrives after
+  a later sentence was already released is late: it is counted per source
+  and given to on_late (default: dropped) instead of waiting for it. At
+  most limit sentences are held per source; more release the oldest ones
+  early.
+  '''
+
+  def __init__(self, window: float = 0.5, limit: int = 1024, on_late: Optional[Callable[[Merged], None]] = None):
+    self._window = window
+    self._limit = limit
+    self._on_late = on_late
+    self._heap = list() # (time, sequence, Merged)
+    self._sequence = 0 # keeps sentences with the same time in arrival order
+    self._sources = dict() # source -> _Source
+    self._ready = list() # released early by the limit
+    self._released = float('-inf') # time of the last released sentence
+
+  def __len__(self) -> int:
+    return len(self._heap) + len(self._ready)
+
+  @property
+  def window(self) -> float:
+    return self._window
+
+  @property
+  def late(self) -> dict[str, int]:
+    '''late sentences per source'''
+    return {name: source.late for name, source in self._sources.items()}
+
+  def _key(self, source: _Source, raw: Union[bytes,memoryview], received: float) -> float:
+    seconds = time_of_day(raw)
+    if seconds is None:
+      if source.last is None:
+        return received
+      return max(source.last, received - self._window / 2) # not behind a source that stopped sending times
+
+    if source.offset is None:
+      source.offset = received - seconds
+    key = seconds + source.offset
+    key += _DAY * round((received - key) / _DAY) # midnight
+    if key > received: # less delay than seen so far
+      source.offset -= key - received
+      key = received
+    elif received - key > 10 * self._window: # the clock of the source jumped (a restarted receiver or replay)
+      source.offset = received - seconds
+      key = received
+    source.last = key
+    return key
+
+  def push(self, name: str, raw: Union[bytes,memoryview], received: float) -> None:
+    '''a sentence of source name received at received (seconds)'''
+    source = self._sources.get(name)
+    if source is None:
+      source = self._sources[name] = _Source()
+    key = self._key(source, raw, received)
+    item = Merged(key, name, raw)
+    if key < self._released:
+      source.late += 1
+      if self._on_late is not None:
+        self._on_late(item)
+      return
+
+    self._sequence += 1
+    heapq.heappush(self._heap, (key, self._sequence, item))
+    source.pending += 1
+    while source.pending > self._limit:
+      self._ready.append(self._pop())
+
+  def _pop(self) -> Merged:
+    key, _, item = heapq.heappop(self._heap)
+    self._sources[item.source].pending -= 1
+    self._released = key
+    return item
+
+  def pop(self, now: float) -> list[Merged]:
+    '''the sentences that are at least window seconds older than now, in order'''
+    ready, self._ready = self._ready, list()
+    heap = self._heap
+    until = now - self._window
+    while heap and heap[0][0] <= until:
+      ready.append(self._pop())
+    return ready
+
+  def flush(self) -> list[Merged]:
+    '''all held sentences, in order'''
+    ready, self._ready = self._ready, list()
+    while self._heap:
+      ready.append(self._pop())
+    return ready
+
+def merge(sources: Mapping[str, Iterable[tuple[float, Union[bytes,memoryview]]]], window: float = 0.5, limit: int = 1024, on_late: Optional[Callable[[Merged], None]] = None) -> Iterator[Merged]:
+  '''
+  Merges finite sources of (receive time, sentence), such as recordings:
+
+    with Recording('a.rec') as a, Recording('b.rec') as b:
+      for item in merge({'a': ((r.time / 1e9, r.raw) for r in a.records()), 'b': ...}):
+        ...
+
+  The next sentence is always taken from the source that is furthest
+  behind, so each source needs to be in receive order only.
+  '''
+  merger = Merge(window, limit, on_late)
+  heap = list() # (receive time, index, raw, source name, iterator)
+  for index, (name, items) in enumerate(sources.items()):
+    iterator = iter(items)
+    for received, raw in iterator:
+      heap.append((received, index, raw, name, iterator))
+      break
+  heapq.heapify(heap)
+
+  while heap:
+    received, index, raw, name, iterator = heap[0]
+    merger.push(name, raw, received)
+    for received, raw in iterator:
+      heapq.heapreplace(heap, (received, index, raw, name, iterator))
+      break
+    else:
+      heapq.heappop(heap)
+    # everything before the source that is furthest behind is complete
+    yield from merger.pop(heap[0][0] if heap else received)
+  yield from merger.flush()
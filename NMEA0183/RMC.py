@@ -1,9 +1,19 @@
 ''''''
 
 import datetime
+from typing import NamedTuple, Optional
 
-from NMEA0183 import Sentence
+from .Sentence import Sentence
+from .status import OK, Status
 
+class RMCRecord(NamedTuple):
+  '''compact, immutable RMC values (see RMC.record)'''
+  time: datetime.datetime
+  latitude: float
+  longitude: float
+  speed: float
+  heading: float
+  sentence: Optional[Sentence] = None
 
 class RMC:
   '''
@@ -71,9 +81,22 @@ class RMC:
     self._speed = float(sentence.fields[6])
     self._heading = float(sentence.fields[7])
 
+  @staticmethod
+  def check(fields: list[bytes]) -> Status:
+    '''status of the fields without decoding them (see try_decode)'''
+    if len(fields) < 12:
+      return Status.TRUNCATED
+    if fields[1] != b'A' or fields[11] not in (b'A', b'D'):
+      return Status.VOID
+    return OK
+
   def __repr__(self):
     return '%s: %s' % (type(self), self._sentence)
 
+  def record(self, keep_sentence: bool = False) -> RMCRecord:
+    '''decoded values without the per-instance overhead of this class'''
+    return RMCRecord(self._time, self._latitude, self._longitude, self._speed, self._heading, self._sentence if keep_sentence else None)
+
   def __str__(self):
     return '%s' % self._sentence
 
@@ -0,0 +1,271 @@
+'''NMEA0183 binary recording of the raw feed'''
+
+import bisect
+import datetime
+import os
+import struct
+import time as mod_time
+import zlib
+from typing import Iterator, NamedTuple, Optional, Union
+
+from .Sentence import Sentence
+from .status import try_parse
+
+Time = Union[datetime.datetime, int] # datetime (naive = UTC) or nanoseconds since the epoch
+
+def _ns(time: Time) -> int:
+  if isinstance(time, datetime.datetime):
+    if time.tzinfo is None:
+      time = time.replace(tzinfo=datetime.timezone.utc)
+    return int(time.timestamp() * 1e6) * 1000
+  return time
+
+class Record(NamedTuple):
+  time: int # receive time, nanoseconds since the epoch
+  source: str
+  raw: bytes
+
+class Chunk(NamedTuple):
+  offset: int # of the chunk header
+  records: int
+  first: int # earliest receive time in this chunk (of the first record in version 1 files)
+  last: int # latest receive time up to the end of this chunk
+
+_MAGIC = b'NMEAREC2'
+_CHUNK = struct.Struct('<4sIIII2q') # b'CHNK', compressed size, size, records, crc32 of the compressed data, first, last
+_RECORD = struct.Struct('<qBI') # receive time, source number within the chunk, length
+_RECORDS = {b'NMEAREC1': struct.Struct('<qBH'), _MAGIC: _RECORD} # record header by version, Recording reads both
+_INDEX = struct.Struct('<QI2q') # Chunk
+_TRAILER = struct.Struct('<QI8s') # offset of the index, chunks, b'NMEAIDX1'
+
+def _chunks(f, size: int) -> tuple[list[Chunk], int]:
+  '''chunks from their headers and the end of the last complete one'''
+  chunks = list()
+  pos = len(_MAGIC)
+  last = None
+  while pos + _CHUNK.size <= size:
+    f.seek(pos)
+    magic, compressed, _, records, _, first, end = _CHUNK.unpack(f.read(_CHUNK.size))
+    if magic != b'CHNK' or pos + _CHUNK.size + compressed > size:
+      break
+    last = end if last is None else max(last, end)
+    chunks.append(Chunk(pos, records, first, last))
+    pos += _CHUNK.size + compressed
+  return chunks, pos
+
+def _index(f, size: int) -> Optional[tuple[list[Chunk], int]]:
+  '''chunks from the index written on close and its offset, None if there is none'''
+  if size < len(_MAGIC) + _TRAILER.size:
+    return None
+  f.seek(size - _TRAILER.size)
+  offset, count, magic = _TRAILER.unpack(f.read(_TRAILER.size))
+  if magic != b'NMEAIDX1' or offset + count * _INDEX.size + _TRAILER.size != size:
+    return None
+  f.seek(offset)
+  return [Chunk(*entry) for entry in _INDEX.iter_unpack(f.read(count * _INDEX.size))], offset
+
+class Recorder:
+  '''
+  Append-only binary log of received sentences with their source and
+  receive time in nanoseconds:
+
+    with Recorder('voyage.rec') as recorder:
+      recorder.append(line, 'serial0')
+
+  Records are length-prefixed and collected into chunks that are compressed
+  with zlib once they reach chunk_size bytes or are interval seconds old, so
+  a crash loses at most the last chunk. close() appends an index of the
+  chunks; an existing recording is continued after its last complete chunk.
+  '''
+
+  def __init__(self, filename: str, chunk_size: int = 256 * 1024, interval: float = 10.0, level: int = 6):
+    self._chunk_size = chunk_size
+    self._interval = int(interval * 1e9)
+    self._level = level
+
+    self._file = open(filename, 'a+b')
+    size = self._file.seek(0, os.SEEK_END)
+    if size == 0:
+      self._file.write(_MAGIC)
+      self._chunks = list()
+    else:
+      self._file.seek(0)
+      if self._file.read(len(_MAGIC)) != _MAGIC:
+        self._file.close()
+        raise Exception('Not a recording', filename)
+      index = _index(self._file, size)
+      if index is not None:
+        self._chunks, end = index
+      else:
+        self._chunks, end = _chunks(self._file, size) # after a crash
+      self._file.truncate(end) # the index or a partial chunk
+    self._file.flush()
+
+    self._buffer = bytearray()
+    self._sources = dict() # source -> number within the chunk
+    self._records = 0
+    self._first = 0
+    self._last = 0
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def append(self, raw: Union[bytes,memoryview], source: str = '', time: Optional[int] = None) -> None:
+    '''raw sentence received at time (nanoseconds since the epoch, default now)'''
+    if time is None:
+      time = mod_time.time_ns()
+    number = self._sources.get(source)
+    if number is None:
+      if len(self._sources) == 255:
+        self.flush()
+      number = self._sources[source] = len(self._sources)
+
+    if not self._records or time < self._first:
+      self._first = time
+    self._last = max(self._last, time)
+    self._buffer += _RECORD.pack(time, number, len(raw))
+    self._buffer += raw
+    self._records += 1
+
+    if len(self._buffer) >= self._chunk_size or time - self._first >= self._interval:
+      self.flush()
+
+  def flush(self) -> None:
+    '''compress and write the records collected so far as one chunk'''
+    if not self._records:
+      return
+    table = bytearray([len(self._sources)])
+    for source in self._sources: # in the order of their numbers
+      name = source.encode('utf-8')[:255]
+      table += bytes([len(name)]) + name
+    size = len(table) + len(self._buffer)
+    data = zlib.compress(bytes(table + self._buffer), self._level)
+
+    last = max(self._last, self._chunks[-1].last) if self._chunks else self._last
+    offset = self._file.seek(0, os.SEEK_END)
+    self._file.write(_CHUNK.pack(b'CHNK', len(data), size, self._records, zlib.crc32(data), self._first, last) + data)
+    self._file.flush()
+    self._chunks.append(Chunk(offset, self._records, self._first, last))
+
+    self._buffer = bytearray()
+    self._sources = dict()
+    self._records = 0
+    self._last = 0
+
+  def close(self) -> None:
+    '''write the last chunk and the index'''
+    if self._file.closed:
+      return
+    self.flush()
+    offset = self._file.seek(0, os.SEEK_END)
+    self._file.write(b''.join(_INDEX.pack(*chunk) for chunk in self._chunks) + _TRAILER.pack(offset, len(self._chunks), b'NMEAIDX1'))
+    self._file.close()
+
+class Recording:
+  '''
+  Reads a recording written by Recorder, also one that is still being
+  written or was not closed (the chunk index is then rebuilt from the chunk
+  headers):
+
+    with Recording('voyage.rec') as recording:
+      for record in recording.records(start=datetime(2021, 7, 1, 13, 55)):
+        ...
+
+  records() only decompresses the chunks that can hold the time range, so
+  seeking to a time is fast. A full scan is not: decompressing and building
+  a Record per record makes it about 1.5 to 2.5 times slower than splitting
+  a text log (benchmarks/recording.py); the format is for size and seeks.
+  '''
+
+  def __init__(self, filename: str):
+    self._filename = filename
+    self._file = open(filename, 'rb')
+    self._record = _RECORDS.get(self._file.read(len(_MAGIC)))
+    if self._record is None:
+      self._file.close()
+      raise Exception('Not a recording', filename)
+    size = os.path.getsize(filename)
+    index = _index(self._file, size)
+    self._chunks = index[0] if index is not None else _chunks(self._file, size)[0]
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def __len__(self) -> int:
+    return sum(chunk.records for chunk in self._chunks)
+
+  def close(self) -> None:
+    self._file.close()
+
+  @property
+  def filename(self) -> str:
+    return self._filename
+
+  @property
+  def chunks(self) -> list[Chunk]:
+    return self._chunks
+
+  def _read(self, chunk: Chunk) -> list[Record]:
+    self._file.seek(chunk.offset)
+    magic, compressed, size, records, crc, _, _ = _CHUNK.unpack(self._file.read(_CHUNK.size))
+    data = self._file.read(compressed)
+    if magic != b'CHNK' or zlib.crc32(data) != crc:
+      raise Exception('Corrupt chunk', chunk)
+    data = zlib.decompress(data)
+
+    sources = list()
+    pos = 1
+    for _ in range(data[0]):
+      sources.append(data[pos + 1:pos + 1 + data[pos]].decode('utf-8', 'replace'))
+      pos += 1 + data[pos]
+
+    # Record() is slow for the number of records, tuple.__new__ builds the same
+    new = tuple.__new__
+    unpack = self._record.unpack_from
+    header = self._record.size
+    result = list()
+    append = result.append
+    for _ in range(records):
+      time, number, length = unpack(data, pos)
+      pos += header
+      append(new(Record, (time, sources[number], data[pos:pos + length])))
+      pos += length
+    return result
+
+  def records(self, start: Optional[Time] = None, end: Optional[Time] = None, source: Optional[str] = None) -> Iterator[Record]:
+    '''records received in [start, end), in the order they were recorded'''
+    lower = _ns(start) if start is not None else None
+    upper = _ns(end) if end is not None else None
+    first = 0
+    if lower is not None:
+      # chunk.last never decreases, the first chunk that reaches start
+      first = bisect.bisect_left([chunk.last for chunk in self._chunks], lower)
+
+    for chunk in self._chunks[first:]:
+      if upper is not None and chunk.first >= upper:
+        continue # a later chunk may still hold earlier times if the clock was set back
+      records = self._read(chunk)
+      if lower is None and upper is None and source is None:
+        yield from records
+        continue
+      for record in records:
+        if lower is not None and record.time < lower:
+          continue
+        if upper is not None and record.time >= upper:
+          continue
+        if source is not None and record.source != source:
+          continue
+        yield record
+
+  def sentences(self, start: Optional[Time] = None, end: Optional[Time] = None, source: Optional[str] = None) -> Iterator[Sentence]:
+    '''the records that parse as sentences'''
+    for record in self.records(start, end, source):
+      status, sentence = try_parse(record.raw)
+      if not status:
+        yield sentence
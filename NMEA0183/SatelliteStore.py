@@ -0,0 +1,113 @@
+'''NMEA0183 satellite state'''
+
+import types
+from typing import Mapping, NamedTuple, Optional
+
+from .GSA import GSA
+from .GSV import GSV
+
+# NMEA 4.1 GSA system id to talker
+_SYSTEM_TALKER = {b'1': b'GP', b'2': b'GL', b'3': b'GA', b'4': b'GB', b'5': b'GQ'}
+
+# NMEA 4.0 PRN ranges to talker, for GN GSA without system id (GPS and SBAS
+# are both reported as GP)
+_PRN_TALKER = ((1, 64, b'GP'), (65, 96, b'GL'), (193, 200, b'GQ'), (201, 264, b'GB'), (301, 336, b'GA'), (401, 437, b'GB'))
+
+def _prn_talker(prn: int) -> bytes:
+  for low, high, talker in _PRN_TALKER:
+    if low <= prn <= high:
+      return talker
+  return b'GN'
+
+class SatelliteState(NamedTuple):
+  talker: bytes
+  prn: int
+  elevation: Optional[int]
+  azimuth: Optional[int]
+  snr: Optional[int]
+  used: bool
+
+class Delta(NamedTuple):
+  '''a satellite that changed; state is None if it is no longer in view'''
+  talker: bytes
+  prn: int
+  state: Optional[SatelliteState]
+
+class SatelliteStore:
+  '''
+  Satellites in view keyed by talker and PRN.
+
+  GSV groups are tracked per talker, so interleaved GP, GL, GA and GB groups
+  do not mix. Each satellite of a GSV sentence is updated in O(1); when a
+  group completes, satellites of that talker that were not part of it are
+  removed. GSA marks the satellites used in the fix. A GN GSA belongs to
+  the constellation of its NMEA 4.1 system id or, without one (NMEA 4.0
+  sends one GN GSA per constellation), of the PRN range of its satellites,
+  so the GSA of each constellation only replaces the in-use set of that
+  constellation. An empty GN GSA without system id cannot be attributed and
+  is ignored. The update methods return only the satellites whose
+  elevation, azimuth, SNR or in-use flag changed.
+  '''
+
+  def __init__(self):
+    self._satellites = dict() # talker -> prn -> SatelliteState
+    self._group = dict() # talker -> prns seen in the current GSV group
+    self._used = dict() # talker -> prns used in the fix
+
+  def update_gsv(self, talker: bytes, gsv: GSV) -> list[Delta]:
+    satellites = self._satellites.setdefault(talker, dict())
+    if gsv.index == 1 or talker not in self._group:
+      self._group[talker] = set()
+    group = self._group[talker]
+    used = self._used.get(talker, frozenset())
+    if talker != b'GN' and b'GN' in self._used:
+      used = used | self._used[b'GN']
+
+    deltas = list()
+    for prn, elevation, azimuth, snr in gsv.satellites:
+      group.add(prn)
+      state = SatelliteState(talker, prn, elevation, azimuth, snr, prn in used)
+      if satellites.get(prn) != state:
+        satellites[prn] = state
+        deltas.append(Delta(talker, prn, state))
+
+    if gsv.index == gsv.numberOfSentences:
+      for prn in [prn for prn in satellites if prn not in group]:
+        del satellites[prn]
+        deltas.append(Delta(talker, prn, None))
+      del self._group[talker]
+
+    return deltas
+
+  def update_gsa(self, talker: bytes, gsa: GSA) -> list[Delta]:
+    if talker == b'GN':
+      if gsa.system in _SYSTEM_TALKER:
+        talker = _SYSTEM_TALKER[gsa.system]
+      elif gsa.prns:
+        talker = _prn_talker(gsa.prns[0])
+      else:
+        return list()
+
+    used = frozenset(gsa.prns)
+    previous = self._used.get(talker, frozenset())
+    self._used[talker] = used
+
+    # GN outside the known ranges: the PRNs may belong to any constellation
+    talkers = self._satellites if talker == b'GN' else (talker,)
+
+    deltas = list()
+    for prn in used ^ previous:
+      for t in talkers:
+        state = self._satellites.get(t, {}).get(prn)
+        if state is not None and state.used != (prn in used):
+          state = state._replace(used=prn in used)
+          self._satellites[t][prn] = state
+          deltas.append(Delta(t, prn, state))
+    return deltas
+
+  def snapshot(self) -> Mapping[tuple[bytes, int], SatelliteState]:
+    '''immutable view of all satellites in view, keyed by (talker, prn)'''
+    return types.MappingProxyType({(talker, prn): state for talker, satellites in self._satellites.items() for prn, state in satellites.items()})
+
+  def __len__(self) -> int:
+    return sum(len(satellites) for satellites in self._satellites.values())
@@ -14,9 +14,9 @@ class Sentence:
     self._talker = _to_bytes(talker)
     self._topic = _to_bytes(topic)
     self._fields = [_to_bytes(field) for field in fields]
-    self._checksum = calculate_checksum(self.msg)
+    self._checksum = None # calculated on first use
 
-    if checksum and _to_bytes(checksum) != self._checksum:
+    if checksum and _to_bytes(checksum) != self.checksum:
       raise Exception('Wrong checksum - got {} expected {}'.format(checksum, self._checksum), self)
 
   def __repr__(self) -> str:
@@ -27,7 +27,7 @@ class Sentence:
 
   @property
   def raw(self) -> bytes:
-    return b'$' + self.msg + b'*' + self._checksum + b'\r\n'
+    return b'$' + self.msg + b'*' + self.checksum + b'\r\n'
 
   @property
   def talker(self) -> bytes:
@@ -47,6 +47,8 @@ class Sentence:
 
   @property
   def checksum(self) -> bytes:
+    if self._checksum is None:
+      self._checksum = calculate_checksum(self.msg)
     return self._checksum
 
 def bytes_to_sentence(raw: bytes) -> Sentence:
@@ -61,26 +63,43 @@ def bytes_to_sentence(raw: bytes) -> Sentence:
   if raw[-5] == ord('*'): # optional checksum
     msg = raw[1:-5]
     checksum = raw[-4:-2]
+    # validate against the received bytes instead of the re-joined fields
+    if checksum != calculate_checksum(msg):
+      raise Exception('Wrong checksum - got {} expected {}'.format(checksum, calculate_checksum(msg)), raw)
   else:
     msg = raw[1:-2]
     checksum = None
 
   fields = msg.split(b',')[1:]
-  return Sentence(talker, topic, fields, checksum)
+  sentence = Sentence(talker, topic, fields)
+  if checksum:
+    sentence._checksum = checksum
+  return sentence
+
+# masks selecting one bit of every byte; the parity of the masked value is the
+# corresponding bit of the xor over all bytes
+_MASK_LENGTH = 128
+_MASKS = tuple(int.from_bytes(bytes([1 << bit]) * _MASK_LENGTH, 'little') for bit in range(8))
+_HEX = tuple(b'%02X' % i for i in range(256))
+
+def _xor(msg: bytes) -> int:
+  if len(msg) > _MASK_LENGTH:
+    sum = 0
+    for i in range(0, len(msg), _MASK_LENGTH):
+      sum ^= _xor(msg[i:i + _MASK_LENGTH])
+    return sum
+
+  x = int.from_bytes(msg, 'little')
+  m0, m1, m2, m3, m4, m5, m6, m7 = _MASKS
+  return ((x & m0).bit_count() & 1) \
+    | ((x & m1).bit_count() & 1) << 1 \
+    | ((x & m2).bit_count() & 1) << 2 \
+    | ((x & m3).bit_count() & 1) << 3 \
+    | ((x & m4).bit_count() & 1) << 4 \
+    | ((x & m5).bit_count() & 1) << 5 \
+    | ((x & m6).bit_count() & 1) << 6 \
+    | ((x & m7).bit_count() & 1) << 7
 
 def calculate_checksum(msg: bytes) -> bytes:
-  # calculate checksum
-  sum = 0
-  for c in msg:
-    sum = sum ^ c # xor
-
-  # convert to two digits in hexadecimal
-  if sum == 0:
-    return b'00'
-
-  alphabet = b'0123456789ABCDEF'
-  digits = []
-  while sum:
-    digits.append(int(sum % 16))
-    sum //= 16
-  return bytes([alphabet[d] for d in digits[::-1]]).rjust(2, b'0')
+  # xor of all bytes as two digits in hexadecimal
+  return _HEX[_xor(msg)]
@@ -0,0 +1,68 @@
+'''NMEA0183 sentence templates'''
+
+from typing import Iterable, Union
+
+from .Sentence import _HEX, _to_bytes, _xor
+
+class SentenceTemplate:
+  '''
+  Precompiled encoder for sentences that are sent again and again with new
+  values. Fields starting with '%' are placeholders in bytes formatting
+  style (%.2f, %03d, %s for bytes), all other fields are constant:
+
+    xdr = SentenceTemplate('II', 'XDR', ['C', '%.2f', 'C', 'TempAir'])
+    socket.send(xdr.encode(19.52)) # b'$IIXDR,C,19.52,C,TempAir*..\\r\\n'
+
+  The constant prefix up to the first placeholder and its checksum are
+  computed once. encode() formats the rest of the sentence, xors only that
+  and builds the line in one more formatting operation. Values are not
+  checked for ',' or '*'.
+  '''
+
+  def __init__(self, talker: Union[str,bytes], topic: Union[str,bytes], fields: list[Union[str,bytes]]):
+    self._talker = _to_bytes(talker)
+    self._topic = _to_bytes(topic)
+    msg = [self._talker + self._topic] + [_to_bytes(field) for field in fields]
+    placeholders = [i for i, field in enumerate(msg) if i and field.startswith(b'%')]
+    self._count = len(placeholders)
+
+    if not placeholders:
+      body = b','.join(msg)
+      self._line = b'$' + body + b'*' + _HEX[_xor(body)] + b'\r\n'
+      self._rest = None
+      return
+
+    # constant fields may contain '%' anywhere but at the start
+    first = placeholders[0]
+    prefix = b','.join(msg[:first]) + b','
+    self._rest = b','.join(field if i in placeholders else field.replace(b'%', b'%%') for i, field in enumerate(msg) if i >= first)
+    self._line = b'$' + prefix.replace(b'%', b'%%') + b'%s*%s\r\n'
+    self._sum = _xor(prefix)
+
+  @property
+  def talker(self) -> bytes:
+    return self._talker
+
+  @property
+  def topic(self) -> bytes:
+    return self._topic
+
+  def encode(self, *values) -> bytes:
+    '''the sentence with these values for the placeholders, framed and with checksum'''
+    if self._rest is None:
+      if values:
+        raise Exception('Template has no placeholders', values)
+      return self._line
+    rest = self._rest % values
+    return self._line % (rest, _HEX[self._sum ^ _xor(rest)])
+
+  def encode_many(self, records: Iterable[tuple]) -> bytes:
+    '''
+    Sentences for many records (tuples of values) in one buffer, e.g. for a
+    single send; server.py splits such messages into sentences again.
+    '''
+    if self._rest is None:
+      return b''.join(self.encode(*values) for values in records)
+    line = self._line
+    sum = self._sum
+    return b''.join([line % (rest, _HEX[sum ^ _xor(rest)]) for rest in map(self._rest.__mod__, records)])
@@ -0,0 +1,96 @@
+'''NMEA0183 stream parser'''
+
+from typing import Callable, Optional, Union
+
+from .Sentence import Sentence
+from .status import Status, try_parse
+
+class StreamParser:
+  '''
+  Incremental framer for NMEA0183 byte streams.
+
+  Chunks of arbitrary size are passed to feed(), which returns all complete
+  sentences found so far. Partial sentences are carried over to the next call
+  and everything that does not frame as "$...\\r\\n" is skipped, so the parser
+  resynchronises on the next '$' without raising.
+
+    parser = StreamParser()
+    while True:
+      for sentence in parser.feed(ser.read(ser.in_waiting or 1)):
+        ...
+  '''
+
+  def __init__(self, max_length: int = 1024, on_error: Optional[Callable[[Status, bytes], None]] = None):
+    '''on_error receives the reason and the line of every rejected line, e.g. StatusLog.report'''
+    self._buffer = b''
+    self._max_length = max_length
+    self._on_error = on_error
+
+    self._sentences = 0
+    self._errors = 0
+    self._discarded = 0
+
+  def feed(self, chunk: Union[bytes,bytearray,memoryview]) -> list[Sentence]:
+    data = self._buffer + chunk if self._buffer else bytes(chunk)
+    sentences = list()
+
+    pos = 0
+    while True:
+      start = data.find(b'$', pos)
+      if start < 0:
+        # no sentence start left, drop the noise
+        self._discarded += len(data) - pos
+        self._buffer = b''
+        return sentences
+      self._discarded += start - pos
+
+      end = data.find(b'\r\n', start)
+      if end < 0:
+        break
+
+      # a truncated sentence followed by a complete one; resync on the last '$'
+      restart = data.rfind(b'$', start + 1, end)
+      if restart >= 0:
+        self._discarded += restart - start
+        start = restart
+
+      end += 2
+      status, sentence = try_parse(data[start:end])
+      if status:
+        self._errors += 1
+        if self._on_error is not None:
+          self._on_error(status, data[start:end])
+      else:
+        sentences.append(sentence)
+        self._sentences += 1
+      pos = end
+
+    # carry the partial sentence over to the next call
+    if len(data) - start > self._max_length:
+      restart = data.find(b'$', start + 1)
+      if restart < 0:
+        restart = len(data)
+      self._discarded += restart - start
+      start = restart
+    self._buffer = data[start:]
+    return sentences
+
+  def reset(self) -> None:
+    '''drop any buffered partial sentence'''
+    self._discarded += len(self._buffer)
+    self._buffer = b''
+
+  @property
+  def sentences(self) -> int:
+    '''number of sentences returned so far'''
+    return self._sentences
+
+  @property
+  def errors(self) -> int:
+    '''number of framed lines rejected by try_parse'''
+    return self._errors
+
+  @property
+  def discarded(self) -> int:
+    '''number of bytes skipped while resynchronising'''
+    return self._discarded
@@ -0,0 +1,73 @@
+''''''
+
+from typing import Optional
+
+from .Sentence import Sentence
+from .status import OK, Status
+
+def float_or_none(value):
+  return float(value) if value else None
+
+class VTG:
+  '''
+  VTG - Velocity made good. The gps receiver may use the LC prefix instead of
+  GP if it is emulating Loran output.
+
+  $GPVTG,054.7,T,034.4,M,005.5,N,010.2,K*48
+
+  where:
+      VTG          Track made good and ground speed
+      054.7,T      True track made good (degrees)
+      034.4,M      Magnetic track made good
+      005.5,N      Ground speed, knots
+      010.2,K      Ground speed, Kilometers per hour
+      *48          Checksum
+
+  NMEA 2.3 adds a mode indicator after the speed in km/h (A=autonomous,
+  D=differential, E=Estimated, N=not valid, S=Simulator).
+
+  ref: https://www.gpsinformation.org/dale/nmea.htm#VTG
+  '''
+
+  def __init__(self, sentence: Sentence):
+    self._sentence = sentence
+
+    if self._sentence.topic != b'VTG':
+      raise Exception('Wrong sentence, expected **VTG', self._sentence)
+
+    if len(sentence.fields) > 8 and sentence.fields[8] == b'N':
+      raise Exception('Void', self._sentence)
+
+    self._heading = float_or_none(sentence.fields[0])
+    self._magnetic_heading = float_or_none(sentence.fields[2])
+    self._speed = float(sentence.fields[4])
+
+  @staticmethod
+  def check(fields: list[bytes]) -> Status:
+    '''status of the fields without decoding them (see try_decode)'''
+    if len(fields) < 5:
+      return Status.TRUNCATED
+    if len(fields) > 8 and fields[8] == b'N':
+      return Status.VOID
+    return OK
+
+  def __repr__(self):
+    return '%s: %s' % (type(self), self._sentence)
+
+  def __str__(self):
+    return '%s' % self._sentence
+
+  @property
+  def heading(self) -> Optional[float]:
+    '''true track made good, degrees'''
+    return self._heading
+
+  @property
+  def magnetic_heading(self) -> Optional[float]:
+    '''magnetic track made good, degrees'''
+    return self._magnetic_heading
+
+  @property
+  def speed(self) -> float:
+    '''speed over ground, knots'''
+    return self._speed
@@ -0,0 +1,56 @@
+''''''
+
+from typing import NamedTuple, Optional
+
+from .Sentence import Sentence
+from .status import OK, Status
+
+class Measurement(NamedTuple):
+  type: bytes
+  value: Optional[float]
+  unit: bytes
+  name: bytes
+
+class XDR:
+  '''
+  XDR - Transducer measurements. One sentence carries any number of
+  measurements of four fields each.
+
+  $IIXDR,C,19.52,C,TempAir*19
+
+  where:
+      C            Transducer type (C = temperature, P = pressure,
+                   A = angle, H = humidity, ...)
+      19.52        Measurement, empty if not available
+      C            Unit (C = degrees Celsius, B = bar, D = degrees, P = percent, ...)
+      TempAir      Transducer name
+  '''
+
+  def __init__(self, sentence: Sentence):
+    self._sentence = sentence
+
+    if self._sentence.topic != b'XDR':
+      raise Exception('Wrong sentence, expected **XDR', self._sentence)
+
+    fields = sentence.fields
+    if len(fields) % 4:
+      raise Exception('Wrong number of fields', self._sentence)
+
+    self._measurements = [Measurement(fields[i], float(fields[i + 1]) if fields[i + 1] else None, fields[i + 2], fields[i + 3]) for i in range(0, len(fields), 4)]
+
+  @staticmethod
+  def check(fields: list[bytes]) -> Status:
+    '''status of the fields without decoding them (see try_decode)'''
+    if not fields or len(fields) % 4:
+      return Status.TRUNCATED
+    return OK
+
+  def __repr__(self):
+    return '%s: %s' % (type(self), self._sentence)
+
+  def __str__(self):
+    return '%s' % self._sentence
+
+  @property
+  def measurements(self) -> list[Measurement]:
+    return self._measurements
@@ -1,5 +1,61 @@
-from .GGA import *
-from .GSA import *
-from .GSV import *
-from .RMC import *
+'''
+NMEA0183 sentences and decoders
+
+Only Sentence is imported with the package. Every other name is imported
+from its module on first use (NMEA0183.RMC loads RMC.py), so a publisher
+does not load the decoders and a server only those of the topics it sees
+(see registry).
+'''
+
+import importlib
+import sys
+import types
+
 from .Sentence import *
+
+# name -> module that defines it
+_EXPORTS = {
+  'GGA': 'GGA', 'GGARecord': 'GGA',
+  'GSA': 'GSA', 'GSARecord': 'GSA',
+  'GSV': 'GSV', 'GSVRecord': 'GSV', 'Satellite': 'GSV', 'int_or_none': 'GSV',
+  'RMC': 'RMC', 'RMCRecord': 'RMC',
+  'VTG': 'VTG',
+  'XDR': 'XDR', 'Measurement': 'XDR',
+  'LazySentence': 'LazySentence',
+  'StreamParser': 'StreamParser',
+  'validate_checksums': 'checksum', 'validate_file': 'checksum',
+  'CaptureFile': 'CaptureFile',
+  'FixBuffer': 'FixBuffer', 'Fix': 'FixBuffer',
+  'Merge': 'Merge', 'Merged': 'Merge', 'merge': 'Merge', 'time_of_day': 'Merge',
+  'Recorder': 'Recording', 'Recording': 'Recording', 'Record': 'Recording', 'Chunk': 'Recording',
+  'SatelliteStore': 'SatelliteStore', 'SatelliteState': 'SatelliteStore', 'Delta': 'SatelliteStore',
+  'SentenceTemplate': 'SentenceTemplate',
+  'Status': 'status', 'Result': 'status', 'try_parse': 'status', 'try_decode': 'status', 'StatusLog': 'status',
+  'register_decoder': 'registry', 'find_decoder': 'registry', 'decoder_topics': 'registry', 'decode': 'registry',
+}
+
+__all__ = ['Sentence', 'bytes_to_sentence', 'calculate_checksum', *_EXPORTS]
+
+def __getattr__(name: str):
+  module = _EXPORTS.get(name)
+  if module is None:
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+  importlib.import_module('.' + module, __name__)
+  return globals()[name]
+
+def __dir__():
+  return sorted(set(globals()) | set(_EXPORTS))
+
+class _Package(types.ModuleType):
+  def __setattr__(self, name, value):
+    # the import system binds every loaded submodule in the package, which
+    # would hide the classes named like their module: bind its names instead
+    if isinstance(value, types.ModuleType) and value.__name__ == '%s.%s' % (__name__, name):
+      for export, module in _EXPORTS.items():
+        if module == name:
+          super().__setattr__(export, getattr(value, export))
+      if name in _EXPORTS:
+        return
+    super().__setattr__(name, value)
+
+sys.modules[__name__].__class__ = _Package
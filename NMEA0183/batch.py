@@ -0,0 +1,183 @@
+'''NMEA0183 columnar batch decoder
+
+Decodes a whole capture into one numpy structured array per topic instead of
+one Sentence plus one decoder object per line:
+
+  import NMEA0183.batch
+  tables = NMEA0183.batch.decode_file('capture.nmea')
+  rmc = tables[b'RMC']
+  rmc['latitude'][rmc['valid']]
+
+Lines with a bad checksum or broken framing are skipped. Every other line of
+a supported topic becomes a row; rows the corresponding decoder class would
+reject (void fix, missing or unparsable fields) have valid = False and NaN in
+the affected columns. Values follow the decoder classes (RMC, GGA, GSA), up to
+float rounding in the last digits of latitude and longitude.
+'''
+
+from typing import Union
+
+import numpy
+
+from .checksum import validate_checksums
+
+RMC_DTYPE = numpy.dtype([
+  ('talker', 'S2'),
+  ('time', 'datetime64[s]'),
+  ('latitude', 'f8'),
+  ('longitude', 'f8'),
+  ('speed', 'f8'),
+  ('heading', 'f8'),
+  ('valid', '?')])
+
+GGA_DTYPE = numpy.dtype([
+  ('talker', 'S2'),
+  ('time_of_day', 'f8'), # seconds since midnight UTC
+  ('latitude', 'f8'),
+  ('longitude', 'f8'),
+  ('quality', 'i1'),
+  ('numberOfSatellites', 'i2'), # -1 if not given
+  ('altitude', 'f8'),
+  ('valid', '?')])
+
+GSA_DTYPE = numpy.dtype([
+  ('talker', 'S2'),
+  ('dop', 'f8'),
+  ('hdop', 'f8'),
+  ('vdop', 'f8'),
+  ('valid', '?')])
+
+def decode_buffer(data: Union[bytes,bytearray,memoryview]) -> dict[bytes, numpy.ndarray]:
+  '''decode all RMC, GGA and GSA sentences of a buffer'''
+  data = bytes(data)
+  lines = data.split(b'\n')
+  if lines and not lines[-1]:
+    lines.pop()
+  mask, _ = validate_checksums(data)
+
+  bodies = {topic: list() for topic in _decoders}
+  for line, ok in zip(lines, mask):
+    if ok:
+      topic = line[3:6]
+      if topic in bodies:
+        # strip '$', checksum and '\r'
+        bodies[topic].append(line[1:-4] if len(line) >= 5 and line[-4] == 0x2A else line[1:-1])
+
+  return {topic: decoder(bodies[topic]) for topic, decoder in _decoders.items()}
+
+def decode_file(filename: str) -> dict[bytes, numpy.ndarray]:
+  '''decode_buffer() over a capture file'''
+  with open(filename, 'rb') as f:
+    return decode_buffer(f.read())
+
+def _table(bodies: list[bytes], width: int) -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+  '''talkers, fields as a (rows, width) byte-string array and the rows with enough fields'''
+  pad = [b''] * width
+  rows = [body.split(b',') for body in bodies]
+  complete = numpy.array([len(row) > width for row in rows], dtype=bool)
+  table = numpy.array([(row[1:] + pad)[:width] for row in rows], dtype='S').reshape(len(rows), width)
+  talkers = numpy.array([body[0:2] for body in bodies], dtype='S2')
+  return talkers, table, complete
+
+def _float(column: numpy.ndarray) -> tuple[numpy.ndarray, numpy.ndarray]:
+  '''column as float, NaN and not ok where empty or unparsable'''
+  ok = column != b''
+  values = numpy.full(len(column), numpy.nan)
+  try:
+    values[ok] = column[ok].astype(numpy.float64)
+  except ValueError:
+    for i in numpy.flatnonzero(ok):
+      try:
+        values[i] = float(column[i])
+      except ValueError:
+        ok[i] = False
+  return values, ok
+
+def _degrees(column: numpy.ndarray, hemisphere: numpy.ndarray, negative: bytes) -> tuple[numpy.ndarray, numpy.ndarray]:
+  '''(d)ddmm.mmmm to signed decimal degrees'''
+  value, ok = _float(column)
+  degrees = numpy.floor(value / 100.0)
+  value = degrees + (value - 100.0 * degrees) / 60.0
+  value[hemisphere == negative] *= -1.0
+  return value, ok
+
+def _rmc(bodies: list[bytes]) -> numpy.ndarray:
+  result = numpy.zeros(len(bodies), dtype=RMC_DTYPE)
+  if not bodies:
+    return result
+  result['talker'], fields, valid = _table(bodies, 12)
+
+  valid &= fields[:, 1] == b'A'
+  valid &= (fields[:, 11] == b'A') | (fields[:, 11] == b'D')
+
+  time, ok = _float(fields[:, 0])
+  valid &= ok
+  date, ok = _float(fields[:, 8])
+  valid &= ok
+
+  time = numpy.nan_to_num(time).astype(numpy.int64)
+  hour, min, sec = time // 10000, time // 100 % 100, time % 100
+  date = numpy.nan_to_num(date).astype(numpy.int64)
+  dd, mm, yy = date // 10000, date // 100 % 100, 2000 + date % 100
+  valid &= (hour < 24) & (min < 60) & (sec < 60) & (mm >= 1) & (mm <= 12) & (dd >= 1)
+
+  # datetime rejects days past the end of the month
+  month = ((yy - 1970) * 12 + numpy.clip(mm, 1, 12) - 1).astype('datetime64[M]')
+  day = month.astype('datetime64[D]') + (dd - 1).astype('timedelta64[D]')
+  valid &= day.astype('datetime64[M]') == month
+  result['time'] = day.astype('datetime64[s]') + (hour * 3600 + min * 60 + sec).astype('timedelta64[s]')
+  result['time'][~valid] = numpy.datetime64('NaT')
+
+  result['latitude'], ok = _degrees(fields[:, 2], fields[:, 3], b'S')
+  valid &= ok
+  result['longitude'], ok = _degrees(fields[:, 4], fields[:, 5], b'W')
+  valid &= ok
+  result['speed'], ok = _float(fields[:, 6])
+  valid &= ok
+  result['heading'], ok = _float(fields[:, 7])
+  valid &= ok
+
+  result['valid'] = valid
+  return result
+
+def _gga(bodies: list[bytes]) -> numpy.ndarray:
+  result = numpy.zeros(len(bodies), dtype=GGA_DTYPE)
+  if not bodies:
+    return result
+  result['talker'], fields, valid = _table(bodies, 9)
+
+  time, _ = _float(fields[:, 0])
+  hhmmss = numpy.floor(numpy.nan_to_num(time))
+  result['time_of_day'] = hhmmss // 10000 * 3600 + hhmmss // 100 % 100 * 60 + hhmmss % 100 + (time - hhmmss)
+
+  result['latitude'], _ = _degrees(fields[:, 1], fields[:, 2], b'S')
+  result['longitude'], _ = _degrees(fields[:, 3], fields[:, 4], b'W')
+
+  quality, ok = _float(fields[:, 5])
+  valid &= ok & (quality != 0) # 0 = invalid, no position available
+  result['quality'] = numpy.nan_to_num(quality)
+  satellites, ok = _float(fields[:, 6])
+  result['numberOfSatellites'] = numpy.where(ok, numpy.nan_to_num(satellites), -1)
+  result['altitude'], ok = _float(fields[:, 8])
+  valid &= ok
+
+  result['valid'] = valid
+  return result
+
+def _gsa(bodies: list[bytes]) -> numpy.ndarray:
+  result = numpy.zeros(len(bodies), dtype=GSA_DTYPE)
+  if not bodies:
+    return result
+  result['talker'], fields, valid = _table(bodies, 17)
+
+  for i, name in enumerate(('dop', 'hdop', 'vdop')):
+    result[name], ok = _float(fields[:, 14 + i])
+    valid &= ok
+
+  result['valid'] = valid
+  return result
+
+_decoders = {
+  b'RMC': _rmc,
+  b'GGA': _gga,
+  b'GSA': _gsa}
@@ -0,0 +1,97 @@
+'''NMEA0183 bulk checksum validation'''
+
+import mmap
+from typing import Union
+
+from .Sentence import _xor
+
+# value of an upper-case hex digit, 0x100 marks anything else
+_HEX_VALUE = tuple(int(chr(c), 16) if chr(c) in '0123456789ABCDEF' else 0x100 for c in range(256))
+
+def validate_checksums(data: Union[bytes,bytearray,memoryview,mmap.mmap], required: bool = False) -> tuple[list[bool], list[int]]:
+  '''
+  Checks every line of a buffer in one call.
+
+  Returns a pass/fail mask with one entry per line and the byte offsets of
+  the lines that failed. A line passes if it is framed as "$...\\r\\n" and
+  its checksum matches. Lines without checksum pass unless required is set,
+  which is what bytes_to_sentence accepts.
+
+  The work is vectorised if numpy is installed.
+  '''
+  try:
+    import numpy
+  except ImportError:
+    return _validate_python(bytes(data), required)
+  return _validate_numpy(numpy, data, required)
+
+def validate_file(filename: str, required: bool = False) -> tuple[list[bool], list[int]]:
+  '''validate_checksums() over a memory-mapped capture file'''
+  with open(filename, 'rb') as f:
+    try:
+      buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError: # empty file
+      return list(), list()
+    with buffer:
+      return validate_checksums(buffer, required)
+
+def _validate_python(data: bytes, required: bool) -> tuple[list[bool], list[int]]:
+  mask = list()
+  bad = list()
+
+  start = 0
+  size = len(data)
+  while start < size:
+    end = data.find(b'\n', start)
+    end = size if end < 0 else end + 1
+    line = data[start:end]
+
+    if line[0] != 0x24 or line[-2:] != b'\r\n':
+      ok = False
+    elif len(line) >= 6 and line[-5] == 0x2A:
+      ok = _HEX_VALUE[line[-4]] << 4 | _HEX_VALUE[line[-3]] == _xor(line[1:-5])
+    else:
+      ok = not required
+
+    mask.append(ok)
+    if not ok:
+      bad.append(start)
+    start = end
+
+  return mask, bad
+
+def _validate_numpy(numpy, data, required: bool) -> tuple[list[bool], list[int]]:
+  buffer = numpy.frombuffer(data, dtype=numpy.uint8)
+  size = len(buffer)
+  if not size:
+    return list(), list()
+
+  # line boundaries; a trailing line without '\n' is still a line
+  ends = numpy.flatnonzero(buffer == 0x0A)
+  if not len(ends) or ends[-1] != size - 1:
+    ends = numpy.append(ends, size - 1)
+  starts = numpy.empty_like(ends)
+  starts[0] = 0
+  starts[1:] = ends[:-1] + 1
+  length = ends - starts + 1
+
+  framed = (buffer[starts] == 0x24) & (buffer[ends] == 0x0A) & (length >= 3)
+  framed[framed] &= buffer[ends[framed] - 1] == 0x0D
+
+  star = ends - 4
+  checked = framed & (length >= 6)
+  checked[checked] &= buffer[star[checked]] == 0x2A
+
+  # xor over "$"..."*" exclusive from prefix xors of the whole buffer
+  prefix = numpy.bitwise_xor.accumulate(buffer)
+  first = starts[checked]
+  last = star[checked] - 1
+  sum = prefix[last] ^ prefix[first]
+
+  table = numpy.array(_HEX_VALUE, dtype=numpy.uint16)
+  received = table[buffer[star[checked] + 1]] << 4 | table[buffer[star[checked] + 2]]
+
+  mask = framed & ~checked if not required else numpy.zeros_like(framed)
+  mask[checked] = received == sum
+
+  return mask.tolist(), starts[~mask].tolist()
@@ -1,44 +1,152 @@
 #!/usr/bin/env python3
 
-import datetime
-from math import cos
+import logging
+import os
+import tempfile
+import threading
+import time as mod_time
+from math import cos, pi
+from typing import Optional
 
-import matplotlib.pyplot
+import matplotlib.backends.backend_agg
+import matplotlib.figure
 import numpy
 
+class SkyplotRenderer:
+  '''
+  Renders satellites in view to an image file.
 
-def plot_gsv(data, time):
-  r = list()
-  theta = list()
-  label = list()
-  color = list()
-  for s in data:
-    id = s[0]
-    elevation = s[1]
-    azimuth = s[2]
-    snr = s[3]
-
-    if elevation and azimuth:
-      label.append(id)
-      r.append(cos(float(elevation) / 180.0 * 3.141))
-      theta.append(float(azimuth) / 180.0 * 3.141)
-      color.append(snr if snr else 0.0)
-
-  fig = matplotlib.pyplot.figure(figsize=(4, 5), dpi=300)
-  ax = matplotlib.pyplot.subplot(1, 1, 1, polar=True)
-  ax.set_theta_zero_location('N')
-  ax.set_theta_direction(1)
-
-  scatter = ax.scatter(theta, r, c=color)
-  for i,j,k in zip(theta, r, label):
-    ax.text(i, j, 'PRN%s' % k, fontsize=7)
-
-  ax.set_rmin(0.0)
-  ax.set_rmax(1.0)
-  ax.set_xticklabels([])
-  ax.set_yticklabels([])
-
-  ax.legend(*scatter.legend_elements(num=4), loc='upper center', bbox_to_anchor=(0.5, -0.05), fancybox=True, ncol=4, title="SNR - higher is better")
-
-  matplotlib.pyplot.title('%d satellites in view\n%s' % (len(data), time))
-  matplotlib.pyplot.savefig('satellites_in_view.png')
+  The figure is created once; every frame only replaces the scatter data and
+  the labels. With start() frames are rendered in a background thread:
+  submit() just stores the latest satellites and returns, and at most
+  max_fps frames per second are written, so a burst of GSV groups collapses
+  into one frame. The image is written to a temporary file and renamed, so a
+  reader never sees a half-written file.
+
+  data is a list of (prn, elevation, azimuth, snr) as in GSV.satellites.
+  '''
+
+  def __init__(self, filename: str = 'satellites_in_view.png', max_fps: float = 1.0, dpi: int = 100, max_labels: int = 64):
+    self._filename = filename
+    self._interval = 1.0 / max_fps if max_fps else 0.0
+    self._dpi = dpi
+    self._logger = logging.getLogger(type(self).__name__)
+
+    self._figure = matplotlib.figure.Figure(figsize=(4, 5))
+    matplotlib.backends.backend_agg.FigureCanvasAgg(self._figure)
+    ax = self._figure.add_subplot(1, 1, 1, polar=True)
+    ax.set_theta_zero_location('N')
+    ax.set_theta_direction(1)
+    ax.set_rmin(0.0)
+    ax.set_rmax(1.0)
+    ax.set_xticklabels([])
+    ax.set_yticklabels([])
+    self._scatter = ax.scatter(numpy.zeros(0), numpy.zeros(0), c=numpy.zeros(0), vmin=0.0, vmax=50.0)
+    self._labels = [ax.text(0.0, 0.0, '', fontsize=7, visible=False) for _ in range(max_labels)]
+    self._figure.colorbar(self._scatter, ax=ax, orientation='horizontal', pad=0.05, label='SNR - higher is better')
+    self._axes = ax
+
+    self._lock = threading.Lock()
+    self._pending = None
+    self._event = threading.Event()
+    self._stop = False
+    self._thread = None
+
+    self._frames = 0
+    self._submitted = 0
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def start(self) -> None:
+    self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+    self._thread.start()
+
+  def submit(self, data, time) -> None:
+    '''queue a frame; replaces a frame that was not rendered yet'''
+    with self._lock:
+      self._pending = (list(data), time)
+      self._submitted += 1
+    self._event.set()
+
+  def close(self, timeout: Optional[float] = None) -> None:
+    '''stop the thread after rendering the pending frame'''
+    if self._thread is not None:
+      self._stop = True
+      self._event.set()
+      self._thread.join(timeout)
+      self._thread = None
+
+  def _run(self) -> None:
+    last = -self._interval
+    while True:
+      self._event.wait()
+      delay = last + self._interval - mod_time.monotonic()
+      if delay > 0 and not self._stop:
+        mod_time.sleep(delay)
+
+      self._event.clear()
+      with self._lock:
+        pending, self._pending = self._pending, None
+      if pending is not None:
+        try:
+          self.render(*pending)
+        except Exception:
+          self._logger.exception('rendering %s failed', self._filename)
+        last = mod_time.monotonic()
+      if self._stop:
+        return
+
+  def render(self, data, time) -> None:
+    '''render one frame now, in the calling thread'''
+    offsets = list()
+    color = list()
+    labels = list()
+    for id, elevation, azimuth, snr in data:
+      if elevation and azimuth:
+        offsets.append((float(azimuth) / 180.0 * pi, cos(float(elevation) / 180.0 * pi)))
+        color.append(snr if snr else 0.0)
+        labels.append(id)
+
+    self._scatter.set_offsets(numpy.array(offsets).reshape(-1, 2))
+    self._scatter.set_array(numpy.array(color, dtype=float))
+    for i, text in enumerate(self._labels):
+      if i < len(labels):
+        text.set_position(offsets[i])
+        text.set_text('PRN%s' % labels[i])
+        text.set_visible(True)
+      else:
+        text.set_visible(False)
+    self._axes.set_title('%d satellites in view\n%s' % (len(data), time))
+
+    directory = os.path.dirname(os.path.abspath(self._filename))
+    extension = os.path.splitext(self._filename)[1]
+    fd, tmp = tempfile.mkstemp(suffix=extension, dir=directory)
+    try:
+      with os.fdopen(fd, 'wb') as f:
+        self._figure.savefig(f, dpi=self._dpi, format=extension[1:] or 'png')
+      os.replace(tmp, self._filename)
+    except BaseException:
+      os.unlink(tmp)
+      raise
+    self._frames += 1
+
+  @property
+  def filename(self) -> str:
+    return self._filename
+
+  @property
+  def frames(self) -> int:
+    '''number of frames written'''
+    return self._frames
+
+  @property
+  def submitted(self) -> int:
+    '''number of submitted frames, including the coalesced ones'''
+    return self._submitted
+
+def plot_gsv(data, time, filename: str = 'satellites_in_view.png'):
+  SkyplotRenderer(filename, dpi=300).render(data, time)
@@ -0,0 +1,86 @@
+'''
+NMEA0183 decoder registry
+
+Maps topics to decoders, classes or functions that take a Sentence. A
+decoder can be registered as "module:attribute" and is then only imported
+when its topic is first looked up:
+
+  NMEA0183.register_decoder(b'HDT', 'mypackage.hdt:HDT')
+  decoder = NMEA0183.find_decoder(sentence.topic)  # None if there is none
+
+Installed packages register decoders with an entry point in the
+"nmea0183.decoders" group, named after the topic:
+
+  [project.entry-points."nmea0183.decoders"]
+  HDT = "mypackage.hdt:HDT"
+
+Entry points are read on the first lookup of a topic that is not
+registered otherwise. They do not replace the decoders of this package or
+ones passed to register_decoder().
+'''
+
+import importlib
+import logging
+import threading
+from typing import Callable, Optional, Union
+
+from .Sentence import Sentence
+
+ENTRY_POINT_GROUP = 'nmea0183.decoders'
+
+_lock = threading.Lock()
+_decoders = { # topic -> decoder or "module:attribute"
+  b'GGA': '.GGA:GGA',
+  b'GSA': '.GSA:GSA',
+  b'GSV': '.GSV:GSV',
+  b'RMC': '.RMC:RMC',
+  b'VTG': '.VTG:VTG',
+  b'XDR': '.XDR:XDR',
+}
+_entry_points = False # read yet
+
+def _topic(topic: Union[str,bytes]) -> bytes:
+  return topic.encode('ascii') if isinstance(topic, str) else topic
+
+def register_decoder(topic: Union[str,bytes], decoder: Union[Callable[[Sentence], object], str]) -> None:
+  '''decoder for topic, replaces the current one'''
+  with _lock:
+    _decoders[_topic(topic)] = decoder
+
+def _load_entry_points() -> None:
+  global _entry_points
+  import importlib.metadata # slow, only if needed
+  for entry_point in importlib.metadata.entry_points(group=ENTRY_POINT_GROUP):
+    topic = _topic(entry_point.name)
+    if topic in _decoders:
+      logging.getLogger(__name__).warning('Decoder for %s from %s ignored, already registered', entry_point.name, entry_point.value)
+    else:
+      _decoders[topic] = entry_point.value
+  _entry_points = True
+
+def find_decoder(topic: Union[str,bytes]) -> Optional[Callable[[Sentence], object]]:
+  '''the decoder for topic, imported if needed; None if there is none'''
+  topic = _topic(topic)
+  with _lock:
+    decoder = _decoders.get(topic)
+    if decoder is None and not _entry_points:
+      _load_entry_points()
+      decoder = _decoders.get(topic)
+    if isinstance(decoder, str):
+      module, _, attribute = decoder.partition(':')
+      decoder = _decoders[topic] = getattr(importlib.import_module(module, __package__), attribute)
+  return decoder
+
+def decoder_topics() -> list[bytes]:
+  '''topics with a decoder, without importing them'''
+  with _lock:
+    if not _entry_points:
+      _load_entry_points()
+    return sorted(_decoders)
+
+def decode(sentence: Sentence) -> object:
+  '''the sentence decoded by the decoder of its topic'''
+  decoder = find_decoder(sentence.topic)
+  if decoder is None:
+    raise Exception('No decoder', sentence.topic)
+  return decoder(sentence)
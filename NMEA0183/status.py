@@ -0,0 +1,141 @@
+'''
+NMEA0183 parsing and decoding without exceptions
+
+try_parse() and try_decode() return a Result with a Status instead of
+raising, so a receiver that is still acquiring a fix or a noisy serial line
+costs a comparison per sentence instead of an exception and a traceback:
+
+  result = NMEA0183.try_decode(sentence, b'RMC')
+  if result.status:
+    errors.report(result.status, sentence) # StatusLog
+  else:
+    rmc = result.value
+'''
+
+import enum
+import logging
+import time
+from typing import Callable, NamedTuple, Optional
+
+from .Sentence import Sentence, calculate_checksum
+
+class Status(enum.IntEnum):
+  OK = 0
+  MALFORMED = 1    # not framed as "$...\r\n"
+  TRUNCATED = 2    # end of line missing or fewer fields than the topic has
+  BAD_CHECKSUM = 3
+  VOID = 4         # no valid fix
+  WRONG_TOPIC = 5
+  NO_DECODER = 6
+  INVALID = 7      # a field the decoder cannot parse
+
+class Result(NamedTuple):
+  status: Status
+  value: object = None # the sentence or the decoded object if status is OK
+
+  @property
+  def ok(self) -> bool:
+    return self.status == Status.OK
+
+# members are slow to look up on the enum and results slow to construct, both
+# add up per sentence: OK for the checks, one shared result per failure
+OK = Status.OK
+_FAILED = {status: Result(status) for status in Status}
+_new = tuple.__new__
+
+def try_parse(raw: bytes) -> Result:
+  '''bytes_to_sentence() with the Sentence or the reason as Result'''
+  if len(raw) < 6 or raw[0] != 0x24:
+    return _FAILED[Status.MALFORMED]
+  if raw[-2:] != b'\r\n':
+    return _FAILED[Status.TRUNCATED]
+
+  if raw[-5] == 0x2A: # optional checksum
+    msg = raw[1:-5]
+    checksum = raw[-4:-2]
+    if checksum != calculate_checksum(msg):
+      return _FAILED[Status.BAD_CHECKSUM]
+  else:
+    msg = raw[1:-2]
+    checksum = None
+
+  sentence = Sentence(raw[1:3], raw[3:6], msg.split(b',')[1:])
+  if checksum:
+    sentence._checksum = checksum
+  return _new(Result, (OK, sentence))
+
+def try_decode(sentence: Sentence, topic: Optional[bytes] = None, decoder: Optional[Callable[[Sentence], object]] = None) -> Result:
+  '''
+  The sentence decoded by decoder, or by the registered decoder of its
+  topic, as Result. If topic is given other topics are WRONG_TOPIC. A
+  decoder can have a check(fields) function that returns a Status without
+  decoding; the decoder itself is only called if it returns OK.
+  '''
+  if topic is not None and sentence.topic != topic:
+    return _FAILED[Status.WRONG_TOPIC]
+  if decoder is None:
+    from .registry import find_decoder
+    decoder = find_decoder(sentence.topic)
+    if decoder is None:
+      return _FAILED[Status.NO_DECODER]
+
+  try:
+    fields = sentence.fields # a LazySentence validates its checksum here
+  except Exception:
+    return _FAILED[Status.BAD_CHECKSUM]
+
+  check = getattr(decoder, 'check', None)
+  if check is not None:
+    status = check(fields)
+    if status:
+      return _FAILED[status]
+
+  try:
+    return _new(Result, (OK, decoder(sentence)))
+  except (IndexError, ValueError):
+    return _FAILED[Status.INVALID]
+  except Exception as e:
+    if e.args and e.args[0] == 'Void':
+      return _FAILED[Status.VOID]
+    return _FAILED[Status.INVALID]
+
+class StatusLog:
+  '''
+  Rate-limited log of rejected sentences. The first sentence of a reason is
+  logged at once, later ones are counted and summed up in one record per
+  interval and reason (with the last example), when the next one arrives or
+  on flush().
+  '''
+
+  def __init__(self, logger: Optional[logging.Logger] = None, interval: float = 60.0, level: int = logging.WARNING):
+    self._logger = logger or logging.getLogger(__name__)
+    self._interval = interval
+    self._level = level
+    self._reasons = dict() # reason -> [count since the last record, time of the next record, last example]
+
+  def report(self, reason, example=None) -> None:
+    now = time.monotonic()
+    entry = self._reasons.get(reason)
+    if entry is None:
+      self._reasons[reason] = [0, now + self._interval, None]
+      self._logger.log(self._level, '%s: %s', _name(reason), example)
+      return
+    entry[0] += 1
+    entry[2] = example
+    if now >= entry[1]:
+      self._summary(reason, entry)
+      entry[1] = now + self._interval
+
+  def _summary(self, reason, entry: list) -> None:
+    self._logger.log(self._level, '%s: %d more in the last %.0f s, last: %s', _name(reason), entry[0], self._interval, entry[2])
+    entry[0] = 0
+    entry[2] = None
+
+  def flush(self) -> None:
+    '''log the counts that are not logged yet'''
+    for reason, entry in self._reasons.items():
+      if entry[0]:
+        self._summary(reason, entry)
+
+def _name(reason) -> str:
+  return reason.name.lower().replace('_', ' ') if isinstance(reason, Status) else str(reason)
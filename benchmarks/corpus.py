@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+'''Synthetic NMEA0183 corpora: a receiver on a moving boat, deterministic per seed'''
+
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from simulator import CONSTELLATIONS, Receiver
+
+def _epochs(receiver: Receiver, seconds: float, rate: int) -> list[bytes]:
+  lines = list()
+  for i in range(int(seconds * rate)):
+    lines += [receiver.rmc(), receiver.gga(), receiver.vtg()]
+    if i % rate == 0:
+      lines += receiver.gsa()
+      lines += receiver.gsv()
+      lines.append(receiver.xdr())
+    receiver.step(1.0 / rate)
+  return lines
+
+def _noise(lines: list[bytes], rng: random.Random, ratio: float) -> list[bytes]:
+  '''damage a share of the lines the way a serial line does'''
+  noisy = list()
+  for line in lines:
+    if rng.random() >= ratio:
+      noisy.append(line)
+      continue
+    kind = rng.randrange(5)
+    if kind == 0: # flipped character, wrong checksum
+      i = rng.randrange(1, len(line) - 5)
+      noisy.append(line[:i] + bytes([line[i] ^ 0x01]) + line[i + 1:])
+    elif kind == 1: # truncated, the rest is lost
+      noisy.append(line[:rng.randrange(1, len(line) - 2)] + b'\r\n')
+    elif kind == 2: # garbage before the sentence
+      noisy.append(bytes(rng.randrange(32, 127) for _ in range(rng.randrange(1, 16))) + line)
+    elif kind == 3: # line ending lost, two sentences on one line
+      noisy.append(line[:-2])
+    else: # binary noise
+      noisy.append(bytes(rng.randrange(256) for _ in range(rng.randrange(8, 64))) + b'\r\n')
+  return noisy
+
+PROFILES = {
+  '1hz': 'GPS only, all topics once per second',
+  '10hz': 'GPS only, RMC/GGA/VTG ten times per second',
+  'multi': 'GPS, GLONASS, Galileo and BeiDou, GN talker, GSA with system id',
+  'noisy': '1hz with 5% damaged lines',
+}
+
+def generate(profile: str, seconds: float = 600.0, seed: int = 0) -> list[bytes]:
+  '''lines of a corpus; every line ends with \\r\\n except where noise removed it'''
+  if profile == '1hz':
+    return _epochs(Receiver(seed), seconds, 1)
+  if profile == '10hz':
+    return _epochs(Receiver(seed), seconds, 10)
+  if profile == 'multi':
+    return _epochs(Receiver(seed, talkers=tuple(CONSTELLATIONS)), seconds, 1)
+  if profile == 'noisy':
+    return _noise(_epochs(Receiver(seed), seconds, 1), random.Random(seed), 0.05)
+  raise Exception('Unknown profile', profile)
+
+if __name__ == '__main__':
+  PARSER = argparse.ArgumentParser(description=__doc__, allow_abbrev=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+  PARSER.add_argument('profile', choices=list(PROFILES))
+  PARSER.add_argument('--seconds', type=float, default=600.0, help='length of the capture')
+  PARSER.add_argument('--seed', type=int, default=0)
+  ARGS = PARSER.parse_args()
+
+  sys.stdout.buffer.write(b''.join(generate(ARGS.profile, ARGS.seconds, ARGS.seed)))
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+'''Peak RSS and time: gpxpy.parse() vs. the streaming GPXReader on a large GPX file'''
+
+import argparse
+import datetime
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gpxwriter import GPXWriter
+
+def generate(filename: str, n: int) -> None:
+  start = datetime.datetime(2021, 7, 1, tzinfo=datetime.timezone.utc)
+  with GPXWriter(filename, sync_interval=None) as writer:
+    for i in range(n):
+      writer.append(54.3 + i * 1e-6, 10.1 + i * 2e-6, 1.5, start + datetime.timedelta(seconds=i))
+
+def gpxpy_parse(filename: str) -> int:
+  import gpxpy
+  with open(filename) as f:
+    gpx = gpxpy.parse(f)
+  return gpx.get_track_points_no()
+
+def reader_points(filename: str) -> int:
+  from gpxreader import GPXReader
+  with GPXReader(filename) as reader:
+    return sum(1 for _ in reader.points())
+
+def reader_segments(filename: str) -> int:
+  from gpxreader import GPXReader
+  with GPXReader(filename) as reader:
+    return sum(len(points.latitude) for _, _, points in reader.segments())
+
+def measure(function, filename: str, queue) -> None:
+  '''runs in a fresh process, so ru_maxrss is the peak of this function alone'''
+  baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  t = time.perf_counter()
+  points = function(filename)
+  elapsed = time.perf_counter() - t
+  queue.put((points, elapsed, baseline, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+def main(n: int):
+  context = multiprocessing.get_context('spawn')
+  with tempfile.TemporaryDirectory() as tmp:
+    filename = os.path.join(tmp, 'large.gpx')
+    generate(filename, n)
+    print('%d points, %.1f MB' % (n, os.path.getsize(filename) / 1e6))
+    print('%-16s %10s %12s %12s' % ('', 'time', 'peak RSS', 'baseline'))
+
+    for name, function in (('gpxpy.parse', gpxpy_parse), ('reader.points', reader_points), ('reader.segments', reader_segments)):
+      queue = context.Queue()
+      process = context.Process(target=measure, args=(function, filename, queue))
+      process.start()
+      points, elapsed, baseline, peak = queue.get()
+      process.join()
+      assert points == n, (name, points)
+      # ru_maxrss is in kilobytes on Linux
+      print('%-16s %9.2fs %9.0f MB %9.0f MB' % (name, elapsed, peak / 1024, baseline / 1024))
+
+if __name__ == '__main__':
+  PARSER = argparse.ArgumentParser(description=__doc__, allow_abbrev=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+  PARSER.add_argument('-n', type=int, default=1000000, help='number of track points')
+  ARGS = PARSER.parse_args()
+
+  main(ARGS.n)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+'''
+Throughput and late sentences of the time-ordered merge of several sources
+
+Every source is a 10hz corpus of its own, received with a random delay and
+an occasional stall that holds back the following sentences of that source
+as well (like a TCP connection does).
+'''
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import corpus
+import NMEA0183
+
+def _received(lines: list[bytes], rng: random.Random, jitter: float, stalls: float, stall: float) -> list[tuple[float, bytes]]:
+  '''(receive time, sentence) in receive order'''
+  start = 1_625_140_800.0 # the corpus starts at 2021-07-01 12:00 UTC
+  items = list()
+  epoch = start
+  received = start
+  for line in lines:
+    seconds = NMEA0183.time_of_day(line)
+    if seconds is not None:
+      epoch = start - 12 * 3600 + seconds
+    delay = rng.expovariate(1 / jitter) + (stall if rng.random() < stalls else 0.0)
+    received = max(received, epoch + 0.01 + delay)
+    items.append((received, line))
+  return items
+
+def main(args):
+  sources = dict()
+  for i in range(args.sources):
+    rng = random.Random(i)
+    sources['gps%d' % i] = _received(corpus.generate('10hz', args.seconds, seed=i), rng, args.jitter, args.stalls, args.stall)
+  n = sum(len(items) for items in sources.values())
+
+  late = list()
+  t = time.perf_counter()
+  merged = list(NMEA0183.merge(sources, window=args.window, on_late=late.append))
+  elapsed = time.perf_counter() - t
+
+  disorder = sum(1 for a, b in zip(merged, merged[1:]) if b.time < a.time)
+  print('%d sources, %d sentences: %.3f s, %.0f sentences/s' % (args.sources, n, elapsed, n / elapsed))
+  print('late %d (%.3f%%), out of order %d' % (len(late), 100.0 * len(late) / n, disorder))
+
+if __name__ == '__main__':
+  PARSER = argparse.ArgumentParser(description=__doc__, allow_abbrev=False, formatter_class=argparse.RawDescriptionHelpFormatter)
+  PARSER.add_argument('--sources', type=int, default=4)
+  PARSER.add_argument('--seconds', type=float, default=600.0, help='length of every source (default: %(default)s)')
+  PARSER.add_argument('--window', type=float, default=0.5, help='reorder window in seconds (default: %(default)s)')
+  PARSER.add_argument('--jitter', type=float, default=0.02, help='mean receive delay in seconds (default: %(default)s)')
+  PARSER.add_argument('--stalls', type=float, default=0.001, help='share of sentences delayed by a stall (default: %(default)s)')
+  PARSER.add_argument('--stall', type=float, default=1.0, help='length of a stall in seconds (default: %(default)s)')
+  ARGS = PARSER.parse_args()
+
+  main(ARGS)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+'''
+Size, write and scan speed of a binary recording against a text log
+
+The text log is what the recording replaces: one line per sentence with the
+receive time in nanoseconds and the source in front. The recording is much
+smaller and seeks to a time in a few chunks, but a full scan is slower than
+splitting the text log.
+'''
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import corpus
+import NMEA0183
+
+def _text(filename: str, records: list[tuple[int, str, bytes]]):
+  with open(filename, 'wb') as f:
+    for t, source, raw in records:
+      f.write(b'%d %s %s' % (t, source.encode('ascii'), raw))
+
+def _scan_text(filename: str, start: int = 0) -> int:
+  n = 0
+  with open(filename, 'rb') as f:
+    for line in f:
+      t, source, raw = line.split(b' ', 2)
+      if int(t) >= start:
+        n += 1
+  return n
+
+def _record(filename: str, records: list[tuple[int, str, bytes]]):
+  with NMEA0183.Recorder(filename) as recorder:
+    for t, source, raw in records:
+      recorder.append(raw, source, t)
+
+def _scan_recording(filename: str, start: int = 0) -> int:
+  with NMEA0183.Recording(filename) as recording:
+    return sum(1 for _ in recording.records(start=start or None))
+
+def _timed(function, *args) -> tuple[float, object]:
+  t = time.perf_counter()
+  result = function(*args)
+  return time.perf_counter() - t, result
+
+def main(args):
+  lines = corpus.generate(args.profile, args.seconds)
+  start = 1_600_000_000_000_000_000
+  step = int(1e9 * args.seconds / len(lines))
+  records = [(start + i * step, 'serial0', line) for i, line in enumerate(lines)]
+  last_minute = start + len(lines) * step - 60 * 10 ** 9
+
+  directory = tempfile.mkdtemp(prefix='nmea-rec-')
+  text = os.path.join(directory, 'capture.txt')
+  binary = os.path.join(directory, 'capture.rec')
+  try:
+    for name, filename, write, scan in (('text', text, _text, _scan_text), ('recording', binary, _record, _scan_recording)):
+      write_time, _ = _timed(write, filename, records)
+      scan_time, n = _timed(scan, filename)
+      seek_time, m = _timed(scan, filename, last_minute)
+      print('%-10s %8.1f KiB %7.3f s write %7.3f s scan (%d) %7.3f s last minute (%d)' % (name, os.path.getsize(filename) / 1024, write_time, scan_time, n, seek_time, m))
+  finally:
+    for filename in (text, binary):
+      if os.path.exists(filename):
+        os.remove(filename)
+    os.rmdir(directory)
+
+if __name__ == '__main__':
+  PARSER = argparse.ArgumentParser(description=__doc__, allow_abbrev=False, formatter_class=argparse.RawDescriptionHelpFormatter)
+  PARSER.add_argument('--profile', choices=list(corpus.PROFILES), default='10hz')
+  PARSER.add_argument('--seconds', type=float, default=3600.0, help='length of the corpus (default: %(default)s)')
+  ARGS = PARSER.parse_args()
+
+  main(ARGS)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+'''Memory footprint of decoded sentences: decoder objects vs. records'''
+
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import NMEA0183
+
+SENTENCES = {
+  'RMC': b'$GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W,A*07\r\n',
+  'GGA': b'$GPGGA,115739.00,4158.8441367,N,09147.4416929,W,4,13,0.9,255.747,M,-32.00,M,01,0000*6E\r\n',
+  'GSA': b'$GPGSA,A,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1*39\r\n',
+  'GSV': b'$GPGSV,2,1,08,01,40,083,46,02,17,308,41,12,07,344,39,14,22,228,45*75\r\n',
+}
+
+def footprint(factory, n: int) -> float:
+  '''bytes per object retained after creating n objects'''
+  tracemalloc.start()
+  before = tracemalloc.get_traced_memory()[0]
+  objects = [factory() for _ in range(n)]
+  after = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+  del objects
+  return (after - before) / n
+
+def main(n: int):
+  print('%-4s %12s %12s %12s' % ('', 'decoder', 'record+sen', 'record'))
+  for topic, raw in SENTENCES.items():
+    decoder = getattr(NMEA0183, topic)
+    full = footprint(lambda: decoder(NMEA0183.bytes_to_sentence(raw)), n)
+    keep = footprint(lambda: decoder(NMEA0183.bytes_to_sentence(raw)).record(keep_sentence=True), n)
+    compact = footprint(lambda: decoder(NMEA0183.bytes_to_sentence(raw)).record(), n)
+    print('%-4s %10.0f B %10.0f B %10.0f B' % (topic, full, keep, compact))
+
+if __name__ == '__main__':
+  PARSER = argparse.ArgumentParser(description=__doc__, allow_abbrev=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+  PARSER.add_argument('-n', type=int, default=10000, help='number of objects per measurement')
+  ARGS = PARSER.parse_args()
+
+  main(ARGS.n)
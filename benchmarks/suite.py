@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+'''
+Throughput and allocations of the parse, decode and dispatch hot paths
+
+Every case runs over the synthetic corpora of corpus.py. Throughput is the
+best of --repeat runs with the garbage collector off; allocations are traced
+with tracemalloc in one extra run (peak bytes above the start of the run, and
+the number of blocks allocated per item that are still alive at its end).
+
+  ./suite.py --save baseline.json     # before the change
+  ./suite.py --compare baseline.json  # after; exits 1 on a regression
+'''
+
+import argparse
+import contextlib
+import gc
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import corpus
+import NMEA0183
+
+DECODERS = (b'RMC', b'GGA', b'GSA', b'GSV')
+
+def _sentences(lines: list[bytes]) -> list[NMEA0183.Sentence]:
+  sentences = list()
+  for line in lines:
+    try:
+      sentences.append(NMEA0183.bytes_to_sentence(line))
+    except Exception:
+      pass
+  return sentences
+
+# a case prepares the corpus and returns (run, number of items[, close])
+
+def parse_bytes_to_sentence(lines: list[bytes]):
+  def run():
+    for line in lines:
+      try:
+        NMEA0183.bytes_to_sentence(line)
+      except Exception:
+        pass
+  return run, len(lines)
+
+def parse_stream(lines: list[bytes]):
+  data = b''.join(lines)
+  chunks = [data[i:i + 64] for i in range(0, len(data), 64)] # serial reads
+  def run():
+    parser = NMEA0183.StreamParser()
+    for chunk in chunks:
+      parser.feed(chunk)
+  return run, len(lines)
+
+def checksum(lines: list[bytes]):
+  bodies = [line[1:line.rfind(b'*')] for line in lines if line.startswith(b'$') and b'*' in line]
+  def run():
+    for body in bodies:
+      NMEA0183.calculate_checksum(body)
+  return run, len(bodies)
+
+def decode(topic: bytes):
+  decoder = getattr(NMEA0183, topic.decode('ascii'))
+  def prepare(lines: list[bytes]):
+    sentences = list()
+    for sentence in _sentences(lines):
+      if sentence.topic == topic:
+        try:
+          decoder(sentence)
+        except Exception:
+          continue # void fixes and the like are not the decoder's hot path
+        sentences.append(sentence)
+    def run():
+      for sentence in sentences:
+        decoder(sentence)
+    return run, len(sentences)
+  return prepare
+
+# RMC as a publisher sends it, from values of the corpus
+_RMC_FIELDS = ['%s', 'A', '%09.4f', '%s', '%010.4f', '%s', '%.1f', '%.1f', '%s', '', '', 'A']
+
+def _rmc_values(lines: list[bytes]) -> list[tuple]:
+  values = list()
+  for sentence in _sentences(lines):
+    if sentence.topic == b'RMC':
+      f = sentence.fields
+      try:
+        values.append((f[0], float(f[2]), f[3], float(f[4]), f[5], float(f[6]), float(f[7]), f[8]))
+      except ValueError:
+        pass
+  return values
+
+def encode_sentence(lines: list[bytes]):
+  values = _rmc_values(lines)
+  def run():
+    for t, lat, ns, lon, ew, speed, heading, date in values:
+      NMEA0183.Sentence(b'GP', b'RMC', [t, b'A', b'%09.4f' % lat, ns, b'%010.4f' % lon, ew, b'%.1f' % speed, b'%.1f' % heading, date, b'', b'', b'A']).raw
+  return run, len(values)
+
+def encode_template(lines: list[bytes]):
+  values = _rmc_values(lines)
+  template = NMEA0183.SentenceTemplate('GP', 'RMC', _RMC_FIELDS)
+  def run():
+    encode = template.encode
+    for v in values:
+      encode(*v)
+  return run, len(values)
+
+def encode_many(lines: list[bytes]):
+  values = _rmc_values(lines)
+  template = NMEA0183.SentenceTemplate('GP', 'RMC', _RMC_FIELDS)
+  def run():
+    for i in range(0, len(values), 64):
+      template.encode_many(values[i:i + 64])
+  return run, len(values)
+
+def server_handle(lines: list[bytes]):
+  import server
+  srv = server.Server(output=lambda line: None)
+  def run():
+    handle = srv.handle
+    for line in lines:
+      try:
+        handle(line)
+      except Exception:
+        pass
+  return run, len(lines), srv.close
+
+def client_gps_handle(lines: list[bytes]):
+  import client_gps
+  sentences = [sentence for sentence in _sentences(lines) if sentence.topic in (b'RMC', b'GGA')]
+  directory = tempfile.mkdtemp(prefix='nmea-bench-')
+  def run():
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+      for name in os.listdir('pending') if os.path.isdir('pending') else ():
+        os.remove(os.path.join('pending', name))
+      gps = client_gps.NMEA_GPS()
+      gps.upload = lambda position: None # no network
+      opened = list()
+      new_file = gps.new_file
+      def counted():
+        new_file()
+        opened.append(os.path.basename(gps.gpx.filename))
+      gps.new_file = counted
+      # the points are written and the tracks finished on the worker thread
+      gps._worker.start()
+      for sentence in sentences:
+        gps.handle(sentence)
+      gps.close()
+      written = sorted(os.listdir('pending'))
+      if written != sorted(opened):
+        raise Exception('Tracks not written', len(opened), written)
+    finally:
+      os.chdir(cwd)
+  return run, len(sentences), lambda: shutil.rmtree(directory)
+
+CASES = {
+  'parse.bytes_to_sentence': parse_bytes_to_sentence,
+  'parse.stream': parse_stream,
+  'checksum': checksum,
+  **{'decode.%s' % topic.decode('ascii'): decode(topic) for topic in DECODERS},
+  'encode.Sentence': encode_sentence,
+  'encode.template': encode_template,
+  'encode.many': encode_many,
+  'server.handle': server_handle,
+  'client_gps.handle': client_gps_handle,
+}
+
+@contextlib.contextmanager
+def _no_gc():
+  enabled = gc.isenabled()
+  gc.disable()
+  try:
+    yield
+  finally:
+    if enabled:
+      gc.enable()
+
+def measure(run, n: int, repeat: int) -> dict:
+  best = float('inf')
+  with _no_gc():
+    for _ in range(repeat):
+      t = time.perf_counter()
+      run()
+      best = min(best, time.perf_counter() - t)
+
+  gc.collect()
+  tracemalloc.start()
+  start, _ = tracemalloc.get_traced_memory()
+  blocks = sys.getallocatedblocks()
+  run()
+  blocks = sys.getallocatedblocks() - blocks
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+
+  return {
+    'items': n,
+    'seconds': best,
+    'per_second': n / best if best > 0 else 0.0,
+    'peak_bytes': peak - start,
+    'retained_blocks_per_item': blocks / n if n else 0.0,
+  }
+
+def run_suite(profiles: list[str], cases: list[str], seconds: float, repeat: int) -> dict:
+  results = dict()
+  for profile in profiles:
+    lines = corpus.generate(profile, seconds)
+    for name in cases:
+      run, n, *close = CASES[name](lines)
+      if n:
+        key = '%s/%s' % (profile, name)
+        r = results[key] = measure(run, n, repeat)
+        print('%-32s %10.0f items/s %9.1f KiB peak %6.2f blocks/item' % (key, r['per_second'], r['peak_bytes'] / 1024, r['retained_blocks_per_item']), flush=True)
+      for function in close:
+        function()
+  return results
+
+def compare(results: dict, baseline: dict, tolerance: float) -> int:
+  '''print the change against the baseline; returns the number of regressions'''
+  regressions = 0
+  print()
+  print('%-32s %12s %12s %8s' % ('', 'baseline', 'now', 'change'))
+  for key, r in results.items():
+    b = baseline.get(key)
+    if b is None or not b['per_second']:
+      print('%-32s %12s %12.0f' % (key, 'n/a', r['per_second']))
+      continue
+    change = r['per_second'] / b['per_second'] - 1.0
+    flag = ''
+    if change < -tolerance:
+      flag = ' slower'
+      regressions += 1
+    elif change > tolerance:
+      flag = ' faster'
+    print('%-32s %12.0f %12.0f %+7.1f%%%s' % (key, b['per_second'], r['per_second'], 100.0 * change, flag))
+  return regressions
+
+def main(args) -> int:
+  logging.disable(logging.CRITICAL) # noisy corpora make the clients log every bad line
+  profiles = args.profile or list(corpus.PROFILES)
+  cases = [name for name in CASES if not args.case or any(pattern in name for pattern in args.case)]
+  results = run_suite(profiles, cases, args.seconds, args.repeat)
+
+  if args.save:
+    meta = {'python': platform.python_version(), 'machine': platform.machine(), 'platform': platform.platform(), 'seconds': args.seconds, 'repeat': args.repeat}
+    with open(args.save, 'w') as f:
+      json.dump({'meta': meta, 'results': results}, f, indent=2, sort_keys=True)
+
+  if args.compare:
+    with open(args.compare) as f:
+      baseline = json.load(f)
+    if baseline['meta']['python'] != platform.python_version():
+      print('note: baseline was taken with Python %s' % baseline['meta']['python'])
+    if compare(results, baseline['results'], args.tolerance):
+      return 1
+  return 0
+
+if __name__ == '__main__':
+  PARSER = argparse.ArgumentParser(description=__doc__, allow_abbrev=False, formatter_class=argparse.RawDescriptionHelpFormatter)
+  PARSER.add_argument('--profile', choices=list(corpus.PROFILES), action='append', help='corpus profile (default: all)')
+  PARSER.add_argument('--case', type=str, action='append', help='only run cases containing this string')
+  PARSER.add_argument('--seconds', type=float, default=600.0, help='length of each corpus (default: %(default)s)')
+  PARSER.add_argument('--repeat', type=int, default=5, help='timed runs per case (default: %(default)s)')
+  PARSER.add_argument('--save', type=str, help='write the results to this JSON file')
+  PARSER.add_argument('--compare', type=str, help='compare against the results in this JSON file')
+  PARSER.add_argument('--tolerance', type=float, default=0.10, help='relative change reported as a regression (default: %(default)s)')
+  ARGS = PARSER.parse_args()
+
+  sys.exit(main(ARGS))
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+'''
+Query latency of the track index against a brute-force scan
+
+The archive is a season of synthetic 10-minute tracks (one point per
+second) of a boat cruising a 2 by 4 degree area. The brute force is a numpy
+scan over all points held in memory, the fastest a scan can be; reparsing
+the GPX files, as it was done before the index, is measured on a sample of
+files and scaled to the archive.
+'''
+
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gpxreader import GPXReader
+from gpxwriter import GPXWriter
+import trackindex
+
+def _tracks(files: int, points: int, seed: int):
+  '''(name, latitude, longitude, elevation, time) of every file'''
+  rng = numpy.random.default_rng(seed)
+  latitude, longitude = 55.0, 11.0
+  heading = 0.0
+  t = datetime.datetime(2021, 5, 1, 8, tzinfo=datetime.timezone.utc).timestamp()
+  for i in range(files):
+    if i % 60 == 59: # ten hours a day
+      t += 14 * 3600
+    heading += numpy.cumsum(rng.normal(0, 0.02, points))
+    step = 2.5 / trackindex.ONE_DEGREE # 2.5 m/s
+    lat = latitude + numpy.cumsum(numpy.cos(heading)) * step
+    lon = longitude + numpy.cumsum(numpy.sin(heading)) * step / numpy.cos(numpy.radians(lat))
+    # turn back into the area
+    lat = numpy.clip(lat, 54.0, 56.0)
+    lon = numpy.clip(lon, 9.0, 13.0)
+    if lat[-1] in (54.0, 56.0) or lon[-1] in (9.0, 13.0):
+      heading = heading + numpy.pi
+    latitude, longitude, heading = float(lat[-1]), float(lon[-1]), heading[-1]
+    times = t + numpy.arange(points, dtype=numpy.float64)
+    t += points
+    yield '%s.gpx' % datetime.datetime.fromtimestamp(times[0], datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S'), lat, lon, numpy.full(points, 2.0), times
+
+def _timed(function, *args, repeat: int = 5):
+  best = None
+  for _ in range(repeat):
+    t = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - t
+    best = elapsed if best is None else min(best, elapsed)
+  return best, result
+
+def main(args):
+  directory = tempfile.mkdtemp(prefix='nmea-index-')
+  database = os.path.join(directory, 'tracks.db')
+  try:
+    columns = [list() for _ in range(4)]
+    t = time.perf_counter()
+    with trackindex.TrackIndex(database, block=args.block) as index:
+      for name, lat, lon, ele, times in _tracks(args.files, args.points, args.seed):
+        index.add_points(name, [(0, 0, lat, lon, ele, times)])
+        for column, values in zip(columns, (lat, lon, ele, times)):
+          column.append(values)
+      build = time.perf_counter() - t
+      lat, lon, ele, times = (numpy.concatenate(column) for column in columns)
+      print('%d points in %d files, index built in %.1f s (%.0f points/s), %.1f MiB' % (len(lat), args.files, build, len(lat) / build, os.path.getsize(database) / 2 ** 20))
+
+      rng = random.Random(args.seed)
+      harbour = rng.randrange(len(lat))
+      day = times[harbour] - 3 * 86400 # the week around the visit
+      queries = (
+        ('near 500 m', lambda: index.near(lat[harbour], lon[harbour], 500),
+          lambda: numpy.flatnonzero(trackindex._haversine(lat, lon, lat[harbour], lon[harbour]) <= 500)),
+        ('near 5 km, 1 week', lambda: index.near(lat[harbour], lon[harbour], 5000, day, day + 7 * 86400),
+          lambda: numpy.flatnonzero((trackindex._haversine(lat, lon, lat[harbour], lon[harbour]) <= 5000) & (times >= day) & (times <= day + 7 * 86400))),
+        ('box 0.1 deg', lambda: index.box(55.0, 11.0, 55.1, 11.1),
+          lambda: numpy.flatnonzero((lat >= 55.0) & (lat <= 55.1) & (lon >= 11.0) & (lon <= 11.1))),
+        ('1 hour', lambda: index.during(day, day + 3600),
+          lambda: numpy.flatnonzero((times >= day) & (times <= day + 3600))),
+      )
+      for name, query, scan in queries:
+        indexed, matches = _timed(query)
+        brute, expected = _timed(scan)
+        if len(matches) != len(expected):
+          raise Exception('Different results', name, len(matches), len(expected))
+        print('%-18s %8d points  index %8.2f ms  numpy scan %8.2f ms' % (name, len(matches), indexed * 1000, brute * 1000))
+
+    # reparsing GPX files, on a sample
+    sample = list()
+    for name, lat, lon, ele, times in _tracks(args.sample, args.points, args.seed):
+      filename = os.path.join(directory, name)
+      with GPXWriter(filename, sync_interval=None) as writer:
+        for i in range(len(lat)):
+          writer.append(float(lat[i]), float(lon[i]), float(ele[i]), datetime.datetime.fromtimestamp(times[i], datetime.timezone.utc))
+      sample.append(filename)
+    t = time.perf_counter()
+    for filename in sample:
+      with GPXReader(filename) as reader:
+        for _ in reader.segments():
+          pass
+    parse = (time.perf_counter() - t) / (args.sample * args.points)
+    print('reparsing the GPX files: %.1f us per point, %.1f s for the archive' % (parse * 1e6, parse * args.files * args.points))
+  finally:
+    for name in os.listdir(directory):
+      os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+if __name__ == '__main__':
+  PARSER = argparse.ArgumentParser(description=__doc__, allow_abbrev=False, formatter_class=argparse.RawDescriptionHelpFormatter)
+  PARSER.add_argument('--files', type=int, default=5000, help='number of 10-minute tracks (default: %(default)s)')
+  PARSER.add_argument('--points', type=int, default=600, help='points per track (default: %(default)s)')
+  PARSER.add_argument('--block', type=int, default=64, help='points per index block (default: %(default)s)')
+  PARSER.add_argument('--sample', type=int, default=20, help='files written and reparsed for the GPX scan (default: %(default)s)')
+  PARSER.add_argument('--seed', type=int, default=0)
+  ARGS = PARSER.parse_args()
+
+  main(ARGS)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+'''Bytes and connections on the wire: per-file uploads vs. the Uploader'''
+
+import argparse
+import datetime
+import gzip
+import http.server
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import gpxpy.gpx
+import requests
+
+from uploader import Uploader
+
+class StandIn(http.server.ThreadingHTTPServer):
+  '''local stand-in for the upload server; counts what arrives'''
+
+  daemon_threads = True
+
+  def __init__(self):
+    super().__init__(('127.0.0.1', 0), Handler)
+    self.reset()
+
+  def reset(self):
+    self.requests = 0
+    self.connections = 0
+    self.bytes = 0
+    self.tracks = 0
+
+class Handler(http.server.BaseHTTPRequestHandler):
+  protocol_version = 'HTTP/1.1'
+
+  def setup(self):
+    super().setup()
+    self.server.connections += 1
+
+  def _reply(self):
+    self.server.requests += 1
+    self.send_response(200)
+    self.send_header('Content-Length', '0')
+    self.end_headers()
+
+  def do_GET(self):
+    self._reply()
+
+  def do_POST(self):
+    body = self.rfile.read(int(self.headers['Content-Length']))
+    self.server.bytes += len(body)
+    if self.headers.get('Content-Encoding') == 'gzip':
+      body = gzip.decompress(body)
+    self.server.tracks += body.count(b'<trk>')
+    self._reply()
+
+  def log_message(self, *args):
+    pass
+
+def make_pending(directory: str, files: int, points: int):
+  os.makedirs(os.path.join(directory, 'pending'))
+  os.makedirs(os.path.join(directory, 'uploaded'))
+  t = datetime.datetime(2021, 7, 1, 12, 0, 0)
+  for i in range(files):
+    gpx = gpxpy.gpx.GPX()
+    track = gpxpy.gpx.GPXTrack()
+    gpx.tracks.append(track)
+    segment = gpxpy.gpx.GPXTrackSegment()
+    track.segments.append(segment)
+    for j in range(points):
+      t += datetime.timedelta(seconds=1)
+      segment.points.append(gpxpy.gpx.GPXTrackPoint(54.3 + j * 1e-5, 10.1 + i * 1e-3, elevation=12.5, time=t))
+    with open(os.path.join(directory, 'pending', f'{i:04d}.gpx'), 'w') as f:
+      f.write(gpx.to_xml())
+
+def per_file(url: str, directory: str):
+  '''what client_gps did before: new connection and plain body per file'''
+  pending = os.path.join(directory, 'pending')
+  for name in sorted(os.listdir(pending)):
+    requests.get(f'{url}/gps', params={'date': 'now'})
+    with open(os.path.join(pending, name)) as f:
+      requests.post(f'{url}/gpx', data=f.read(), headers={'Content-Type': 'application/xml'})
+
+def engine(url: str, directory: str, batch_size: int, compress: bool):
+  uploader = Uploader(url, os.path.join(directory, 'pending'), os.path.join(directory, 'uploaded'), batch_size=batch_size, compress=compress)
+  uploader.position('now', 0, 0, 0, 0)
+  uploader.upload()
+  uploader.close()
+
+def main(files: int, points: int, batch_size: int):
+  server = StandIn()
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  url = 'http://127.0.0.1:%d/nmea' % server.server_address[1]
+
+  runs = [
+    ('per file', lambda d: per_file(url, d)),
+    ('pooled', lambda d: engine(url, d, 1, False)),
+    ('pooled+gzip', lambda d: engine(url, d, 1, True)),
+    ('pooled+gzip+batch%d' % batch_size, lambda d: engine(url, d, batch_size, True))]
+
+  print('%d files with %d points each' % (files, points))
+  print('%-24s %10s %12s %10s %8s %10s' % ('', 'requests', 'connections', 'bytes', 'tracks', 'time'))
+  for name, run in runs:
+    with tempfile.TemporaryDirectory() as directory:
+      make_pending(directory, files, points)
+      server.reset()
+      start = time.perf_counter()
+      run(directory)
+      elapsed = time.perf_counter() - start
+      print('%-24s %10d %12d %10d %8d %9.3fs' % (name, server.requests, server.connections, server.bytes, server.tracks, elapsed))
+
+  server.shutdown()
+
+if __name__ == '__main__':
+  PARSER = argparse.ArgumentParser(description=__doc__, allow_abbrev=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+  PARSER.add_argument('--files', type=int, default=24, help='number of pending files')
+  PARSER.add_argument('--points', type=int, default=600, help='points per file')
+  PARSER.add_argument('--batch', type=int, default=8, help='tracks per request')
+  ARGS = PARSER.parse_args()
+
+  main(ARGS.files, ARGS.points, ARGS.batch)
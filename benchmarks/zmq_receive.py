@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+'''Messages per second through Server: the original recv loop vs. batched drains'''
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import zmq
+
+import NMEA0183
+import server
+
+SENTENCES = [
+  b'$GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W,A*07\r\n',
+  b'$GPGGA,115739.00,4158.8441367,N,09147.4416929,W,4,13,0.9,255.747,M,-32.00,M,01,0000*6E\r\n',
+  b'$GPGSA,A,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1*39\r\n',
+  b'$GPGSV,2,1,08,01,40,083,46,02,17,308,41,12,07,344,39,14,22,228,45*75\r\n',
+  b'$GPGSV,2,2,08,01,40,083,46,02,17,308,41,12,07,344,39,14,22,228,45*76\r\n',
+  b'$GPVTG,054.7,T,034.4,M,005.5,N,010.2,K*48\r\n',
+]
+
+def publish(addr: str, count: int, sent):
+  context = zmq.Context()
+  #pylint: disable=no-member
+  socket = context.socket(zmq.PUB)
+  socket.setsockopt(zmq.SNDHWM, 0)
+  socket.bind(addr)
+  time.sleep(1.0) # let the subscriber connect
+  n = len(SENTENCES)
+  for i in range(count):
+    socket.send(SENTENCES[i % n])
+  sent.set()
+  time.sleep(600.0) # keep the queue alive until terminated
+
+def legacy(srv: server.Server, count: int):
+  '''the loop before: blocking recv(), eager decode, then dispatch'''
+  socket = srv._socket
+  for _ in range(count):
+    sen = NMEA0183.bytes_to_sentence(socket.recv())
+    if srv._topics is not None and sen.topic not in srv._topics:
+      continue
+    if sen.talker not in srv._talkers:
+      srv._talkers.add(sen.talker)
+    decoder = NMEA0183.find_decoder(sen.topic)
+    if decoder is not None:
+      report = getattr(srv, sen.topic.decode('ascii')) if sen.topic in srv.handlers else srv._report
+      report(sen, decoder(sen))
+
+def batched(srv: server.Server, count: int):
+  poller = zmq.Poller()
+  poller.register(srv._socket, zmq.POLLIN)
+  received = 0
+  while received < count:
+    for socket, _ in poller.poll():
+      received += srv.drain(socket)
+
+def measure(name: str, loop, copy: bool, dispatch: bool, count: int, port: int) -> float:
+  addr = 'tcp://127.0.0.1:%d' % port
+  # forking a process that holds a zmq context is not safe
+  context = multiprocessing.get_context('spawn')
+  sent = context.Event()
+  publisher = context.Process(target=publish, args=(addr, count, sent), daemon=True)
+  publisher.start()
+
+  # without dispatch every sentence is dropped after a look at its topic
+  srv = server.Server(output=lambda text: None, topics=None if dispatch else [], unsupported=dispatch, copy=copy)
+  srv._socket.setsockopt(zmq.RCVHWM, 0)
+  srv._socket.connect(addr)
+  # measure the consumer alone: let everything arrive in the receive queue first
+  srv.handle(SENTENCES[0])
+  sent.wait()
+  time.sleep(0.5)
+  start = time.perf_counter()
+  loop(srv, count)
+  elapsed = time.perf_counter() - start
+  publisher.terminate()
+  srv._context.destroy(linger=0)
+  return count / elapsed
+
+def main(count: int, port: int):
+  loops = [
+    ('before: recv() + decode', legacy, True),
+    ('batched, copy', batched, True),
+    ('batched, zero-copy', batched, False)]
+
+  print('%-24s %16s %16s' % ('', 'receive only', 'full dispatch'))
+  for name, loop, copy in loops:
+    receive = measure(name, loop, copy, False, count, port)
+    dispatch = measure(name, loop, copy, True, count, port + 1)
+    port += 2
+    print('%-24s %10.0f msg/s %10.0f msg/s' % (name, receive, dispatch))
+
+if __name__ == '__main__':
+  PARSER = argparse.ArgumentParser(description=__doc__, allow_abbrev=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+  PARSER.add_argument('-n', type=int, default=100000, help='number of messages')
+  PARSER.add_argument('--port', type=int, default=5590, help='first local port to use')
+  ARGS = PARSER.parse_args()
+
+  main(ARGS.n, ARGS.port)
@@ -3,18 +3,22 @@
 import argparse
 import logging
 import os
-import shutil
+import queue
 import sys
+import threading
+import time
 import traceback
 from logging.handlers import RotatingFileHandler
+from typing import Callable, Optional
 
-import gpxpy
-import gpxpy.gpx
-import requests
 import serial
 from serial.serialutil import EIGHTBITS, PARITY_NONE, STOPBITS_ONE
 
+import gpxwriter
+import metrics
 import NMEA0183
+from gpxwriter import GPXWriter, RotationPolicy
+from uploader import Uploader
 
 
 def configure(stdout: bool = True, rotating = False, loglevel: str = 'INFO') -> None:
@@ -59,9 +63,89 @@ def configure(stdout: bool = True, rotating = False, loglevel: str = 'INFO') ->
   # always log version and command line arguments
   logging.getLogger().info(f'arguments: {sys.argv[1:]}')
 
+class Worker(threading.Thread):
+  '''
+  Runs file and network jobs off the serial read loop.
+
+  Jobs are queued with submit(), which never blocks: if the bounded queue is
+  full the job is dropped and counted. shutdown() stops accepting new jobs,
+  lets the queued ones finish and waits for the thread.
+  '''
+
+  def __init__(self, maxsize: int = 16):
+    super().__init__(name='worker', daemon=True)
+    self._queue = queue.Queue(maxsize)
+    self._closed = False
+
+    self._submitted = 0
+    self._dropped = 0
+    self._failed = 0
+
+  def submit(self, job, *args) -> bool:
+    if self._closed:
+      self._dropped += 1
+      return False
+
+    try:
+      self._queue.put_nowait((job, args))
+    except queue.Full:
+      self._dropped += 1
+      logging.warning(f'worker queue full; dropped {job.__name__} ({self._dropped} dropped so far)')
+      return False
+
+    self._submitted += 1
+    return True
+
+  def run(self):
+    while True:
+      item = self._queue.get()
+      if item is None:
+        return
+
+      job, args = item
+      try:
+        job(*args)
+      except Exception:
+        self._failed += 1
+        logging.error(traceback.format_exc())
+
+  def shutdown(self, timeout: Optional[float] = None) -> bool:
+    '''drain the queue and stop; returns False if the timeout expired first'''
+    self._closed = True
+    if self.is_alive():
+      try:
+        self._queue.put(None, timeout=timeout)
+      except queue.Full:
+        return False
+      self.join(timeout)
+    logging.info(f'worker stopped: {self._submitted} submitted, {self._dropped} dropped, {self._failed} failed, {self.depth} left')
+    return not self.is_alive()
+
+  @property
+  def depth(self) -> int:
+    '''number of queued jobs'''
+    return self._queue.qsize()
+
+  @property
+  def submitted(self) -> int:
+    return self._submitted
+
+  @property
+  def dropped(self) -> int:
+    return self._dropped
+
+  @property
+  def failed(self) -> int:
+    return self._failed
+
 class NMEA_GPS:
-  def __init__(self):
+  def __init__(self, batch_size: int = 8, compress: bool = True, rotation: RotationPolicy = RotationPolicy(), registry: Optional[metrics.Registry] = None, recorder: Optional[NMEA0183.Recorder] = None, index: Optional['trackindex.TrackIndex'] = None):
     self._alive = True
+    self._recorder = recorder
+    self._index = index
+    self._worker = Worker()
+    self._uploader = Uploader(batch_size=batch_size, compress=compress)
+    self._rotation = rotation
 
     self._time = None
     self._speed = None
@@ -69,8 +153,13 @@ class NMEA_GPS:
     self._latitude = None
     self._longitude = None
     self._altitude = None
+    try:
+      self._fixes = NMEA0183.FixBuffer(capacity=3600) # one hour at 1 Hz
+    except ImportError:
+      self._fixes = None # numpy is not installed
 
     self.gpx = None
+    self._flushed = 0.0 # time of the last flush job
 
     if not os.path.exists('pending'):
       os.makedirs('pending')
@@ -78,51 +167,75 @@ class NMEA_GPS:
     if not os.path.exists('uploaded'):
       os.makedirs('uploaded')
 
-  def upload_position(self):
+    for filename in gpxwriter.recover('pending'):
+      logging.warning(f'recovered unfinished track {filename}')
+
+    registry = registry or metrics.REGISTRY
+    self._registry = registry
+    self._received = registry.counter('gps_sentences_total', 'sentences read from the serial port', ('talker', 'topic'))
+    self._decode_failures = registry.counter('gps_decode_failures_total', 'sentences that could not be decoded', ('topic', 'reason'))
+    self._rejected = NMEA0183.StatusLog(logging.getLogger(), interval=60.0) # one record per reason and minute while there is no fix or noise
+    self._serial_bytes = registry.counter('gps_serial_bytes_total', 'bytes read from the serial port')
+    self._upload_latency = registry.histogram('gps_upload_seconds', 'duration of one upload job (position and pending tracks)')
+    self._gauges = list() # computed by this client, unregistered by close()
+    self._gauge('gps_upload_backlog_files', 'tracks waiting for upload', lambda: len(self._uploader.pending()))
+    self._gauge('gps_upload_failures', 'consecutive failed upload requests', lambda: self._uploader.failures)
+    self._gauge('gps_upload_rejected_files', 'tracks the server rejected, moved to rejected/', lambda: self._uploader.rejected)
+    self._gauge('gps_worker_queue_depth', 'jobs waiting for the upload worker', lambda: self._worker.depth)
+    self._gauge('gps_worker_dropped_jobs', 'jobs dropped because the worker queue was full', lambda: self._worker.dropped)
+    if self._fixes is not None:
+      self._gauge('gps_speed_knots_10m', 'mean speed over ground of the last ten minutes', self._mean_speed)
+
+  def _gauge(self, name: str, help: str, function: Callable[[], float]):
+    gauge = self._registry.gauge(name, help)
+    gauge.set_function(function)
+    self._gauges.append(gauge)
+
+  def upload(self, position):
+    '''runs on the worker thread; position is a snapshot taken by the serial loop'''
+    start = time.monotonic()
+    self._uploader.position(*position)
+    self._uploader.upload()
+    self._upload_latency.observe(time.monotonic() - start)
+
+  @property
+  def fixes(self) -> Optional['NMEA0183.FixBuffer']: # a string, the module needs numpy
+    '''the last hour of fixes, for windowed queries; None without numpy'''
+    return self._fixes
+
+  def _mean_speed(self) -> float:
+    speed = self._fixes.mean('speed', seconds=600)
+    if speed is None:
+      raise Exception('No fix yet') # no sample
+    return speed
+
+  def index(self, filename: str):
+    '''runs on the worker thread, before the upload that moves the file'''
     try:
-      r = requests.get(f'https://sailingjackpot.ddns.net/nmea/gps?date={self._time}&lat={self._latitude}&lon={self._longitude}&sog={self._speed}&cog={self._heading}')
-      logging.info(f'{r.status_code}: {r.url}')
+      self._index.add(filename)
     except Exception:
-      logging.info(f'Something went wrong; we\'ll try later again')
-      logging.error(traceback.format_exc())
-
-  def upload(self):
-    self.upload_position()
+      # e.g. already uploaded and moved; trackindex.py --update catches up
+      logging.exception(f'cannot index {filename}')
 
-    files = sorted([os.path.join('pending', f) for f in os.listdir('pending') if os.path.isfile(os.path.join('pending', f))])
-
-    try:
-      for file in files:
-        with open(file) as f:
-          data = f.read()
+  def finish(self, gpx: GPXWriter):
+    '''runs on the worker thread: finalises a track and indexes it'''
+    filename = gpx.close()
+    if self._index is not None:
+      self.index(filename)
 
-        r = requests.post('https://sailingjackpot.ddns.net/nmea/gpx', data=data, headers={'Content-Type': 'application/xml'})
-        logging.info(f'{r.status_code}: {file}')
-
-        if r.status_code == 200:
-          #os.remove(file)
-          shutil.move(file, 'uploaded')
-    except Exception:
-      logging.info(f'Something went wrong; we\'ll try later again')
-      logging.error(traceback.format_exc())
+  def _close_file(self):
+    gpx, self.gpx = self.gpx, None
+    if not self._worker.submit(self.finish, gpx):
+      logging.warning(f'finishing {gpx.filename} on the serial loop')
+      self.finish(gpx)
 
   def new_file(self):
     if self.gpx:
-      data = self.gpx.to_xml()
-      with open(os.path.join('pending', self.filename), 'w') as f:
-        f.write(data)
-
-    self.filename = f'{self._time}.gpx'
-
-    self.gpx = gpxpy.gpx.GPX()
-
-    # Create first track in our GPX:
-    self.gpx_track = gpxpy.gpx.GPXTrack()
-    self.gpx.tracks.append(self.gpx_track)
+      self._close_file()
 
-    # Create first segment in our GPX track:
-    self.gpx_segment = gpxpy.gpx.GPXTrackSegment()
-    self.gpx_track.segments.append(self.gpx_segment)
+    # the points are written by the worker (flush, finish), never by the serial loop
+    self.gpx = GPXWriter(os.path.join('pending', f'{self._time}.gpx'), buffered=True)
+    self._flushed = time.monotonic()
 
   def update(self):
     if not self._altitude:
@@ -130,58 +243,122 @@ class NMEA_GPS:
 
     if not self.gpx:
       self.new_file()
-      self.upload()
-
-    self.gpx_segment.points.append(gpxpy.gpx.GPXTrackPoint(self._latitude, self._longitude, elevation=self._altitude, time=self._time))
-    if len(self.gpx_segment.points) >= 60*10:
+      self._worker.submit(self.upload, self.position)
+
+    self.gpx.append(self._latitude, self._longitude, elevation=self._altitude, time=self._time)
+    now = time.monotonic()
+    if now - self._flushed >= 1.0:
+      self._worker.submit(self.gpx.flush)
+      self._flushed = now
+    if self._rotation.due(self.gpx):
       self.new_file()
-      self.upload()
+      self._worker.submit(self.upload, self.position)
+
+  @property
+  def position(self):
+    return (self._time, self._latitude, self._longitude, self._speed, self._heading)
+
+  def close(self, timeout: float = 30.0):
+    '''
+    Shutdown path: finalises the current track and drains the worker queue,
+    so no fix that was already received is lost on a clean stop.
+    '''
+    if self.gpx:
+      self._close_file()
+    self._registry.unregister(*self._gauges)
+    self._rejected.flush()
+    if self._recorder:
+      self._recorder.close()
+    if not self._worker.shutdown(timeout):
+      logging.warning(f'worker did not finish within {timeout}s; {self._worker.depth} jobs left')
+    else:
+      self._uploader.close()
+      if self._index is not None:
+        self._index.close()
 
   def main(self):
+    self._worker.start()
+    parser = NMEA0183.StreamParser(on_error=self._rejected.report)
+    self._gauge('gps_parser_errors', 'lines dropped by the stream parser', lambda: parser.errors)
+    self._gauge('gps_parser_discarded_bytes', 'bytes skipped while resynchronising', lambda: parser.discarded)
     with serial.Serial('/dev/serial0', baudrate=9600, parity=PARITY_NONE, bytesize=EIGHTBITS, stopbits=STOPBITS_ONE) as ser:
-      ser.readline() # trash first line
       while self._alive:
         try:
-          sentence = NMEA0183.bytes_to_sentence(ser.readline())
+          data = ser.read(ser.in_waiting or 1)
+          self._serial_bytes.inc(len(data))
+          sentences = parser.feed(data)
         except Exception as e:
-          logging.error(e)
-          logging.error(traceback.format_exc())
+          logging.exception(e)
         except KeyboardInterrupt:
           self._alive = False
           print('\r', end='')
           logging.warning('shutdown due to keyboard interrupt')
         else:
-          if sentence.topic == b'RMC':
-            try:
-              rmc = NMEA0183.RMC(sentence)
-            except Exception:
-              logging.error(traceback.format_exc())
-            else:
-              self._time = rmc.time
-              self._speed = rmc.speed
-              self._heading = rmc.heading
-              self._latitude = rmc.latitude
-              self._longitude = rmc.longitude
-              self.update()
-          elif sentence.topic == b'GGA':
-            try:
-              gga = NMEA0183.GGA(sentence)
-            except Exception:
-              logging.error(traceback.format_exc())
-            else:
-              self._altitude = gga.altitude
+          if self._recorder:
+            for sentence in sentences:
+              self._recorder.append(sentence.raw, 'serial0')
+          for sentence in sentences:
+            self.handle(sentence)
+
+  def _reject(self, status: NMEA0183.Status, sentence: NMEA0183.Sentence):
+    self._decode_failures.labels(sentence.topic, status.name).inc()
+    self._rejected.report(status, sentence)
+
+  def handle(self, sentence: NMEA0183.Sentence):
+    self._received.labels(sentence.talker, sentence.topic).inc()
+    if sentence.topic == b'RMC':
+      status, rmc = NMEA0183.try_decode(sentence, decoder=NMEA0183.RMC)
+      if status:
+        self._reject(status, sentence)
+      else:
+        self._time = rmc.time
+        self._speed = rmc.speed
+        self._heading = rmc.heading
+        self._latitude = rmc.latitude
+        self._longitude = rmc.longitude
+        if self._fixes is not None:
+          self._fixes.update_rmc(rmc)
+        self.update()
+    elif sentence.topic == b'GGA':
+      status, gga = NMEA0183.try_decode(sentence, decoder=NMEA0183.GGA)
+      if status:
+        self._reject(status, sentence)
+      else:
+        self._altitude = gga.altitude
+        if self._fixes is not None:
+          self._fixes.update_gga(gga)
 
 if __name__ == '__main__':
   PARSER = argparse.ArgumentParser(description='NMEA0183 GPS client', allow_abbrev=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
   PARSER.add_argument('--stdout', action='store_true', help='enables logging to stdout')
+  PARSER.add_argument('--batch', type=int, default=8, help='number of pending tracks per upload request')
+  PARSER.add_argument('--no-gzip', action='store_true', help='upload uncompressed GPX')
+  PARSER.add_argument('--rotate-points', type=int, default=600, help='start a new GPX file after this many points (0 = no limit)')
+  PARSER.add_argument('--rotate-seconds', type=float, default=0, help='start a new GPX file after this many seconds of track (0 = no limit)')
+  PARSER.add_argument('--rotate-bytes', type=int, default=0, help='start a new GPX file once it reaches this size (0 = no limit)')
+  PARSER.add_argument('--index', metavar='FILE', help='add the finished tracks to this track index (see trackindex.py)')
+  PARSER.add_argument('--record', metavar='FILE', help='append the received sentences to this recording (see NMEA0183.Recorder)')
+  PARSER.add_argument('--metrics-port', type=int, help='serve Prometheus metrics on this local port')
+  PARSER.add_argument('--metrics-dump', type=float, help='log the metrics every this many seconds')
   ARGS = PARSER.parse_args()
 
   configure(ARGS.stdout, rotating=True)
-
-  gps_client = NMEA_GPS()
+  if ARGS.metrics_port:
+    metrics.serve(ARGS.metrics_port)
+  if ARGS.metrics_dump:
+    metrics.dump(ARGS.metrics_dump)
+
+  rotation = RotationPolicy(points=ARGS.rotate_points, seconds=ARGS.rotate_seconds, size=ARGS.rotate_bytes)
+  index = None
+  if ARGS.index:
+    import trackindex # needs numpy
+    index = trackindex.TrackIndex(ARGS.index)
+  gps_client = NMEA_GPS(batch_size=ARGS.batch, compress=not ARGS.no_gzip, rotation=rotation, recorder=NMEA0183.Recorder(ARGS.record) if ARGS.record else None, index=index)
   try:
     gps_client.main()
   except:
     logging.error(traceback.format_exc())
     raise
+  finally:
+    gps_client.close()
   logging.warning('stop')
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+'''
+NMEA0183 load generator
+
+Publishes simulated traffic of N vessels (RMC, GGA and VTG at --rate, GSA,
+GSV and XDR once per second) or replays capture files, timed by their RMC
+sentences, in real time, k times faster or as fast as possible.
+
+Messages go out on a PUB socket (server.py --connect) or, with --push, to a
+PULL socket (server.py --pull). PUB drops messages once a subscriber's queue
+is full, so the publisher never sees a slow consumer; PUSH blocks instead,
+and the lag reported is then how far the consumer has fallen behind the
+schedule.
+'''
+
+import argparse
+import datetime
+import logging
+import math
+import time
+from typing import Iterable, Iterator, Optional
+
+import zmq
+
+import NMEA0183
+from simulator import CONSTELLATIONS, Receiver
+
+
+class Stats:
+  '''messages, bytes and lateness against the schedule, reported every interval seconds'''
+
+  def __init__(self, interval: float = 5.0):
+    self._interval = interval
+    self._start = time.monotonic()
+    self._next = self._start + interval
+    self._reset()
+    self.total = 0
+
+  def _reset(self):
+    self._window = time.monotonic()
+    self._messages = 0
+    self._bytes = 0
+    self._blocked = 0
+    self._late = list()
+    self._lag = 0.0
+
+  def sent(self, size: int, blocked: bool = False):
+    self._messages += 1
+    self._bytes += size
+    self._blocked += blocked
+    self.total += 1
+
+  def scheduled(self, lateness: float):
+    '''seconds between the scheduled and the actual start of a burst'''
+    self._late.append(lateness)
+    self._lag = lateness
+    now = time.monotonic()
+    if now >= self._next:
+      self.report(now)
+      self._next = now + self._interval
+
+  def report(self, now: Optional[float] = None):
+    now = now or time.monotonic()
+    elapsed = max(now - self._window, 1e-9)
+    late = sorted(self._late) or [0.0]
+    p99 = late[min(len(late) - 1, int(len(late) * 0.99))]
+    logging.info('%.0f msg/s, %.1f kB/s, jitter mean %.2f ms p99 %.2f ms max %.2f ms, lag %.3f s, %d blocked sends' % (
+      self._messages / elapsed, self._bytes / elapsed / 1000.0,
+      1000.0 * sum(late) / len(late), 1000.0 * p99, 1000.0 * late[-1], self._lag, self._blocked))
+    self._reset()
+
+
+def send(socket: zmq.Socket, message: bytes, stats: Stats):
+  try:
+    socket.send(message, zmq.NOBLOCK)
+  except zmq.Again:
+    # PUSH: the consumer's queue is full
+    socket.send(message)
+    stats.sent(len(message), blocked=True)
+  else:
+    stats.sent(len(message))
+
+
+def publish(socket: zmq.Socket, schedule: Iterable[tuple[float, list[bytes]]], speed: float, stats: Stats):
+  '''
+  schedule yields (seconds since the start, messages); the messages of one
+  entry go out as one burst at start + seconds / speed. speed 0 = no pauses.
+  '''
+  start = time.perf_counter()
+  for offset, messages in schedule:
+    if speed:
+      target = start + offset / speed
+      delay = target - time.perf_counter()
+      if delay > 0:
+        time.sleep(delay)
+      stats.scheduled(max(0.0, time.perf_counter() - target))
+    else:
+      stats.scheduled(0.0)
+    for message in messages:
+      send(socket, message, stats)
+
+
+def simulate(vessels: int, rate: float, constellations: tuple, duration: float, seed: int) -> Iterator[tuple[float, list[bytes]]]:
+  now = datetime.datetime.utcnow().replace(microsecond=0)
+  receivers = [Receiver(seed + i, constellations, start=now) for i in range(vessels)]
+  per_second = max(1, round(rate))
+  epochs = math.inf if not duration else int(duration * rate)
+  i = 0
+  while i < epochs:
+    messages = list()
+    for receiver in receivers:
+      messages += [receiver.rmc(), receiver.gga(), receiver.vtg()]
+      if i % per_second == 0:
+        messages += receiver.gsa()
+        messages += receiver.gsv()
+        messages.append(receiver.xdr())
+      receiver.step(1.0 / rate)
+    yield i / rate, messages
+    i += 1
+
+
+def replay(filenames: list[str], loop: bool) -> Iterator[tuple[float, list[bytes]]]:
+  '''captures as bursts, one per RMC time; lines before the first RMC go out at once. Recordings (NMEA0183.Recorder) are replayed at their receive times'''
+  offset = 0.0 # end of the previous pass
+  while True:
+    first = None
+    last = 0.0
+    for filename in filenames:
+      burst = list()
+      with open(filename, 'rb') as f:
+        recording = f.read(7) == b'NMEAREC' # any version
+      if recording:
+        # recordings carry the receive time of every sentence
+        with NMEA0183.Recording(filename) as f:
+          for record in f.records():
+            t = record.time / 1e9
+            if first is None:
+              first = t
+            last = max(last, t - first)
+            yield offset + last, [record.raw]
+        continue
+      with open(filename, 'rb') as f:
+        for line in f:
+          if line[3:6] == b'RMC':
+            try:
+              t = NMEA0183.RMC(NMEA0183.bytes_to_sentence(line)).time.timestamp()
+            except Exception:
+              pass
+            else:
+              if first is None:
+                first = t
+              yield offset + last, burst
+              burst = list()
+              last = max(last, t - first) # never go back in time
+          burst.append(line)
+      yield offset + last, burst
+    if not loop:
+      return
+    offset += last + 1.0
+
+
+def main(args):
+  context = zmq.Context()
+  #pylint: disable=no-member
+  if args.push:
+    socket = context.socket(zmq.PUSH)
+    socket.setsockopt(zmq.SNDHWM, args.hwm)
+    socket.connect(args.push)
+  else:
+    socket = context.socket(zmq.PUB)
+    socket.setsockopt(zmq.SNDHWM, args.hwm)
+    socket.bind('tcp://*:%s' % args.port)
+    time.sleep(0.5) # let subscribers connect
+
+  if args.replay:
+    schedule = replay(args.replay, args.loop)
+  else:
+    constellations = tuple(talker.encode('ascii') for talker in args.constellation) if args.constellation else (b'GP',)
+    schedule = simulate(args.vessels, args.rate, constellations, args.duration, args.seed)
+
+  stats = Stats(args.report)
+  try:
+    publish(socket, schedule, args.speed, stats)
+  except KeyboardInterrupt:
+    pass
+  stats.report()
+  logging.info('%d messages sent' % stats.total)
+  socket.close(linger=1000)
+  context.term()
+
+
+if __name__ == '__main__':
+  logging.basicConfig(level=logging.INFO, format='%(asctime)s: %(levelname)s [%(name)s] %(message)s')
+
+  PARSER = argparse.ArgumentParser(description='NMEA0183 load generator', allow_abbrev=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+  PARSER.add_argument('--port', type=int, default=5557, help='PUB: bind to this port')
+  PARSER.add_argument('--push', type=str, help='PUSH to this address instead (server.py --pull)')
+  PARSER.add_argument('--hwm', type=int, default=1000, help='send high water mark (messages)')
+  PARSER.add_argument('--vessels', type=int, default=1, help='number of simulated vessels')
+  PARSER.add_argument('--rate', type=float, default=1.0, help='RMC/GGA/VTG per second and vessel')
+  PARSER.add_argument('--constellation', choices=[talker.decode('ascii') for talker in CONSTELLATIONS], action='append', help='simulated constellations (default: GP); more than one uses the GN talker')
+  PARSER.add_argument('--duration', type=float, default=0, help='seconds of simulated traffic (0 = until interrupted)')
+  PARSER.add_argument('--seed', type=int, default=0)
+  PARSER.add_argument('--replay', type=str, nargs='+', help='capture files or recordings to replay instead of simulating')
+  PARSER.add_argument('--loop', action='store_true', help='replay the captures over and over')
+  PARSER.add_argument('--speed', type=float, default=1.0, help='speed factor (0 = as fast as possible)')
+  PARSER.add_argument('--report', type=float, default=5.0, help='seconds between reports')
+  ARGS = PARSER.parse_args()
+
+  main(ARGS)
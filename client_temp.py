@@ -8,6 +8,8 @@ import zmq
 
 import NMEA0183
 
+XDR = NMEA0183.SentenceTemplate('II', 'XDR', ['C', '%.2f', 'C', 'TempAir'])
+
 
 def main(port: int, status: bool):
   context = zmq.Context()
@@ -16,11 +18,11 @@ def main(port: int, status: bool):
   socket.bind('tcp://*:%s' % port)
 
   while True:
-    sentence = NMEA0183.Sentence('II', 'XDR', ['C','19.52','C','TempAir'], None)
-    socket.send(sentence.raw)
+    raw = XDR.encode(19.52)
+    socket.send(raw)
 
     if status:
-      logging.info(sentence)
+      logging.info(raw[:-2].decode('ascii'))
 
     time.sleep(60)
 
@@ -6,12 +6,14 @@ source: https://github.com/tkrajina/gpxpy/blob/dev/gpxinfo
 """
 
 import argparse as mod_argparse
+import concurrent.futures as mod_futures
 import logging as mod_logging
 import sys as mod_sys
+import traceback as mod_traceback
 from typing import *
 
-import gpxpy as mod_gpxpy
-import gpxpy.gpx as mod_gpx
+import gpxreader as mod_gpxreader
+import gpxstats as mod_gpxstats
 
 
 KM_TO_MILES = 0.621371
@@ -52,84 +54,108 @@ def format_speed(speed: float) -> str:
         return f'{speed:.2f}m/s = {speed * 3600. / 1000.:.2f}km/h'
 
 
-def print_gpx_part_info(gpx_part: Union[mod_gpx.GPX, mod_gpx.GPXTrack, mod_gpx.GPXTrackSegment], indentation: str='    ') -> None:
+def print_gpx_part_info(stats: mod_gpxstats.Statistics, indentation: str='    ') -> None:
     """
-    gpx_part may be a track or segment.
+    stats of a whole file, a track or a segment.
     """
-    length_2d = gpx_part.length_2d()
-    length_3d = gpx_part.length_3d()
-    print(f'{indentation}Length 2D: {format_long_length(length_2d or 0)}')
-    print(f'{indentation}Length 3D: {format_long_length(length_3d)}')
-
-    moving_data = gpx_part.get_moving_data()
-    raw_moving_data = gpx_part.get_moving_data(raw=True)
-    if moving_data:
-        print(f'{indentation}Moving time: {format_time(moving_data.moving_time)}')
-        print(f'{indentation}Stopped time: {format_time(moving_data.stopped_time)}')
-        print(f'{indentation}Max speed: {format_speed(moving_data.max_speed)} (raw: {format_speed(raw_moving_data.max_speed) if raw_moving_data else "?"})')
-        print(f'{indentation}Avg speed: {format_speed(moving_data.moving_distance / moving_data.moving_time) if moving_data.moving_time > 0 else "?"}')
-
-    uphill, downhill = gpx_part.get_uphill_downhill()
-    print(f'{indentation}Total uphill: {format_short_length(uphill)}')
-    print(f'{indentation}Total downhill: {format_short_length(downhill)}')
-
-    start_time, end_time = gpx_part.get_time_bounds()
-    print(f'{indentation}Started: {start_time}')
-    print(f'{indentation}Ended: {end_time}')
-
-    points_no = len(list(gpx_part.walk(only_points=True)))
-    print(f'{indentation}Points: {points_no}')
-
-    if points_no > 0:
-        distances: List[float] = []
-        previous_point = None
-        for point in gpx_part.walk(only_points=True):
-            if previous_point:
-                distance = point.distance_2d(previous_point)
-                distances.append(distance)
-            previous_point = point
-        print(f'{indentation}Avg distance between points: {format_short_length(sum(distances) / len(list(gpx_part.walk())))}')
+    print(f'{indentation}Length 2D: {format_long_length(stats.length_2d or 0)}')
+    print(f'{indentation}Length 3D: {format_long_length(stats.length_3d)}')
+
+    print(f'{indentation}Moving time: {format_time(stats.moving_time)}')
+    print(f'{indentation}Stopped time: {format_time(stats.stopped_time)}')
+    print(f'{indentation}Max speed: {format_speed(stats.max_speed)} (raw: {format_speed(stats.raw_max_speed)})')
+    print(f'{indentation}Avg speed: {format_speed(stats.moving_distance / stats.moving_time) if stats.moving_time > 0 else "?"}')
+
+    print(f'{indentation}Total uphill: {format_short_length(stats.uphill)}')
+    print(f'{indentation}Total downhill: {format_short_length(stats.downhill)}')
+
+    print(f'{indentation}Started: {stats.start_time}')
+    print(f'{indentation}Ended: {stats.end_time}')
+
+    print(f'{indentation}Points: {stats.points}')
+
+    if stats.points > 0:
+        print(f'{indentation}Avg distance between points: {format_short_length(stats.average_distance)}')
 
     print('')
 
 
-def print_gpx_info(gpx: mod_gpx.GPX, gpx_file: str) -> None:
+class FileInfo(NamedTuple):
+    name: Optional[str]
+    description: Optional[str]
+    author_name: Optional[str]
+    author_email: Optional[str]
+    stats: mod_gpxstats.Statistics
+    segments: List[Tuple[int, int, mod_gpxstats.Statistics]]
+
+
+def load_gpx_info(gpx_file: str) -> FileInfo:
+    """
+    Reads a file and computes the statistics of the file and all of its
+    segments; runs in the worker processes.
+    """
+    stats = []
+    segments = []
+    with mod_gpxreader.GPXReader(gpx_file) as reader:
+        for track_no, segment_no, segment_points in reader.segments():
+            segment_stats = mod_gpxstats.segment_statistics(segment_points)
+            stats.append(segment_stats)
+            segments.append((track_no, segment_no, segment_stats))
+
+    return FileInfo(reader.name, reader.description, reader.author_name, reader.author_email,
+                    mod_gpxstats.combine(stats), segments)
+
+
+def print_gpx_info(info: FileInfo, gpx_file: str) -> None:
     print(f'File: {gpx_file}')
 
-    if gpx.name:
-        print(f'  GPX name: {gpx.name}')
-    if gpx.description:
-        print(f'  GPX description: {gpx.description}')
-    if gpx.author_name:
-        print(f'  Author: {gpx.author_name}')
-    if gpx.author_email:
-        print(f'  Email: {gpx.author_email}')
+    if info.name:
+        print(f'  GPX name: {info.name}')
+    if info.description:
+        print(f'  GPX description: {info.description}')
+    if info.author_name:
+        print(f'  Author: {info.author_name}')
+    if info.author_email:
+        print(f'  Email: {info.author_email}')
 
-    print_gpx_part_info(gpx)
+    print_gpx_part_info(info.stats)
 
-    for track_no, track in enumerate(gpx.tracks):
-        for segment_no, segment in enumerate(track.segments):
-            print(f'    Track #{track_no}, Segment #{segment_no}')
-            print_gpx_part_info(segment, indentation='        ')
+    for track_no, segment_no, stats in info.segments:
+        print(f'    Track #{track_no}, Segment #{segment_no}')
+        print_gpx_part_info(stats, indentation='        ')
 
 
-def run(gpx_files: List[str]) -> None:
+def run(gpx_files: List[str], jobs: Optional[int] = None) -> None:
     if not gpx_files:
         print('No GPX files given')
         mod_sys.exit(1)
 
-    for gpx_file in gpx_files:
-        try:
-            gpx = mod_gpxpy.parse(open(gpx_file))
-            print_gpx_info(gpx, gpx_file)
-        except Exception as e:
-            mod_logging.exception(e)
+    if jobs == 1 or len(gpx_files) == 1:
+        print_results(gpx_files, map(_try_load_gpx_info, gpx_files))
+    else:
+        with mod_futures.ProcessPoolExecutor(jobs) as pool:
+            print_results(gpx_files, pool.map(_try_load_gpx_info, gpx_files, chunksize=8))
+
+
+def print_results(gpx_files: List[str], results: Iterable[Tuple[Optional[FileInfo], Optional[str]]]) -> None:
+    # printed in the order of the arguments as the results come in
+    for gpx_file, (info, error) in zip(gpx_files, results):
+        if error is not None:
+            mod_logging.error(error)
             print(f'Error processing {gpx_file}')
             mod_sys.exit(1)
+        print_gpx_info(info, gpx_file)
+
+
+def _try_load_gpx_info(gpx_file: str) -> Tuple[Optional[FileInfo], Optional[str]]:
+    try:
+        return load_gpx_info(gpx_file), None
+    except Exception:
+        return None, mod_traceback.format_exc()
 
 
 def make_parser() -> mod_argparse.ArgumentParser:
-    parser = mod_argparse.ArgumentParser(usage='%(prog)s [-s] [-m] [-d] [file ...]',
+    parser = mod_argparse.ArgumentParser(usage='%(prog)s [-s] [-m] [-d] [-j N] [file ...]',
         description='Command line utility to extract basic statistics from gpx file(s)')
     parser.add_argument('-s', '--seconds', action='store_true',
                         help='print times as N seconds, rather than HH:MM:SS')
@@ -137,6 +163,8 @@ def make_parser() -> mod_argparse.ArgumentParser:
                         help='print distances and speeds using miles and feet')
     parser.add_argument('-d', '--debug', action='store_true',
                         help='show detailed logging')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of worker processes (default: one per CPU)')
     return parser
 
 if __name__ == '__main__':
@@ -144,4 +172,4 @@ if __name__ == '__main__':
     if args.debug:
         mod_logging.basicConfig(level=mod_logging.DEBUG,
                                 format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s')
-    run(gpx_files)
+    run(gpx_files, args.jobs)
@@ -0,0 +1,158 @@
+'''
+Streaming GPX reader
+
+Reads the track points of a GPX file incrementally with iterparse; every
+element is dropped once it has been read, so memory does not grow with the
+file (the DOM gpxpy.parse() builds takes about a kilobyte per point):
+
+  with GPXReader('voyage.gpx') as reader:
+    for point in reader.points():
+      ...
+
+segments() collects one segment at a time into the numpy arrays gpxstats
+works on (32 bytes per point). Routes and waypoints are skipped.
+'''
+
+import array
+import datetime
+import xml.etree.ElementTree
+from typing import Iterator, NamedTuple, Optional
+
+import numpy
+
+from gpxstats import Points
+
+class TrackPoint(NamedTuple):
+  track: int
+  segment: int
+  latitude: float
+  longitude: float
+  elevation: Optional[float]
+  time: Optional[datetime.datetime]
+
+def _tag(element) -> str:
+  '''tag without namespace'''
+  return element.tag.rpartition('}')[2]
+
+def _time(text: Optional[str]) -> Optional[datetime.datetime]:
+  if not text:
+    return None
+  try:
+    return datetime.datetime.fromisoformat(text.strip())
+  except ValueError:
+    raise Exception('Invalid time', text)
+
+class GPXReader:
+  '''
+  Iterates the track points of a GPX file. The file metadata (name,
+  description, author_name, author_email) is filled in as it is read; it
+  usually precedes the tracks, but is only complete after the iteration.
+  '''
+
+  def __init__(self, filename: str):
+    self._file = open(filename, 'rb')
+    self.name = None
+    self.description = None
+    self.author_name = None
+    self.author_email = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def close(self) -> None:
+    self._file.close()
+
+  def _metadata(self, tag: str, element, path: list) -> None:
+    # GPX 1.1: gpx/metadata/..., GPX 1.0: gpx/...
+    parent = path[-1] if path else None
+    if parent in ('metadata', 'gpx') and len(path) <= 2:
+      if tag == 'name':
+        self.name = element.text
+      elif tag == 'desc':
+        self.description = element.text
+      elif tag == 'author' and parent == 'gpx':
+        self.author_name = element.text
+      elif tag == 'email' and parent == 'gpx':
+        self.author_email = element.text
+    elif parent == 'author' and path[-2:-1] == ['metadata']:
+      if tag == 'name':
+        self.author_name = element.text
+      elif tag == 'email':
+        self.author_email = '%s@%s' % (element.get('id'), element.get('domain'))
+
+  def points(self) -> Iterator[TrackPoint]:
+    '''all track points in document order'''
+    for track, segment, point in self._points():
+      if point is not None:
+        yield TrackPoint(track, segment, *point)
+
+  def _points(self) -> Iterator[tuple[int, int, Optional[tuple]]]:
+    '''points; None at the end of every segment, so empty segments are seen too'''
+    track = -1
+    segment = -1
+    tags = dict() # tag with namespace -> tag
+    path = list() # tags of the open parents
+    parents = list()
+    for event, element in xml.etree.ElementTree.iterparse(self._file, events=('start', 'end')):
+      tag = tags.get(element.tag)
+      if tag is None:
+        tag = tags[element.tag] = _tag(element)
+
+      if event == 'start':
+        if tag == 'trk':
+          track += 1
+          segment = -1
+        elif tag == 'trkseg':
+          segment += 1
+        path.append(tag)
+        parents.append(element)
+        continue
+
+      path.pop()
+      parents.pop()
+      parent = path[-1] if path else None
+      if tag == 'trkpt' and parent == 'trkseg':
+        elevation = None
+        time = None
+        for child in element:
+          name = tags.get(child.tag) or _tag(child)
+          if name == 'ele' and child.text:
+            elevation = float(child.text)
+          elif name == 'time':
+            time = _time(child.text)
+        yield track, segment, (float(element.get('lat')), float(element.get('lon')), elevation, time)
+      elif tag == 'trkseg' and parent == 'trk':
+        yield track, segment, None
+      elif parent in ('gpx', 'metadata', 'author'):
+        self._metadata(tag, element, path)
+
+      # drop finished elements from the containers that grow with the file
+      if parent in ('gpx', 'trk', 'trkseg', 'rte'):
+        element.clear()
+        parents[-1].remove(element)
+
+  def segments(self) -> Iterator[tuple[int, int, Points]]:
+    '''(track number, segment number, points) for every track segment'''
+    nan = float('nan')
+    columns = [array.array('d') for _ in range(4)]
+    first = last = None
+    for track, segment, point in self._points():
+      if point is None:
+        latitude, longitude, elevation, time = (numpy.frombuffer(column, dtype=numpy.float64) for column in columns)
+        yield track, segment, Points(latitude, longitude, elevation, time, first, last)
+        columns = [array.array('d') for _ in range(4)]
+        first = last = None
+        continue
+
+      latitude, longitude, elevation, time = point
+      columns[0].append(latitude)
+      columns[1].append(longitude)
+      columns[2].append(nan if elevation is None else elevation)
+      columns[3].append(time.timestamp() if time else nan)
+      if time:
+        if first is None:
+          first = time
+        last = time
@@ -0,0 +1,199 @@
+''''''
+
+import datetime
+import os
+import threading
+import time
+from typing import Optional
+
+HEADER = b'''<?xml version="1.0" encoding="UTF-8"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="NMEA0183">
+  <trk>
+    <trkseg>
+'''
+FOOTER = b'''    </trkseg>
+  </trk>
+</gpx>
+'''
+POINT_END = b'</trkpt>\n'
+
+def _format_time(t: datetime.datetime) -> str:
+  if t.tzinfo is not None:
+    t = t.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+  return t.isoformat() + 'Z'
+
+def repair(filename: str) -> bool:
+  '''
+  Closes a GPX file that was not finalised (crash, power loss): a partially
+  written point is dropped and the closing tags are appended. Returns whether
+  the file had to be changed.
+  '''
+  with open(filename, 'r+b') as f:
+    data = f.read()
+    if data.endswith(FOOTER):
+      return False
+
+    end = data.rfind(POINT_END)
+    end = len(HEADER) if end < 0 else end + len(POINT_END)
+    f.seek(0)
+    if end == len(HEADER):
+      f.write(HEADER)
+    f.truncate(end)
+    f.seek(end)
+    f.write(FOOTER)
+  return True
+
+class RotationPolicy:
+  '''when to start a new file; any limit that is set and reached triggers'''
+
+  def __init__(self, points: Optional[int] = 600, seconds: Optional[float] = None, size: Optional[int] = None):
+    self._points = points
+    self._seconds = seconds
+    self._size = size
+
+  def __repr__(self):
+    return '%s(points=%s, seconds=%s, size=%s)' % (type(self).__name__, self._points, self._seconds, self._size)
+
+  def due(self, writer: 'GPXWriter') -> bool:
+    if self._points and writer.points >= self._points:
+      return True
+    if self._seconds and writer.duration >= self._seconds:
+      return True
+    if self._size and writer.size >= self._size:
+      return True
+    return False
+
+class GPXWriter:
+  '''
+  Writes a GPX track point by point.
+
+  Each point is appended to the open file as one line and flushed, so memory
+  does not grow with the segment and a crash loses at most the point being
+  written; the file is fsync'ed at most every sync_interval seconds. close()
+  writes the closing tags. While open the file is named filename + '.part'
+  and only renamed to filename once complete; repair() recovers a '.part'
+  file left behind.
+
+  With buffered=True append() only collects the points in memory and does
+  no file I/O at all, not even opening the file; flush() writes them and
+  close() finalises the file. Both may be called from another thread than
+  append(), so a reader loop never waits for the disk. A crash then loses
+  the points since the last flush().
+  '''
+
+  def __init__(self, filename: str, sync_interval: Optional[float] = 10.0, buffered: bool = False):
+    self._filename = filename
+    self._partname = filename + '.part'
+    self._sync_interval = sync_interval
+    self._buffered = buffered
+
+    self._file = None
+    self._lock = threading.Lock() # the points collected by append() and the file
+    self._pending = list() # encoded points not written yet
+    self._size = len(HEADER)
+    self._synced = time.monotonic()
+
+    self._points = 0
+    self._first = None
+    self._last = None
+
+    if not buffered:
+      self._open()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def _open(self) -> None:
+    self._file = open(self._partname, 'wb')
+    self._file.write(HEADER)
+    self._file.flush()
+
+  def append(self, latitude: float, longitude: float, elevation: Optional[float] = None, time: Optional[datetime.datetime] = None) -> None:
+    point = '      <trkpt lat="%s" lon="%s">' % (latitude, longitude)
+    if elevation is not None:
+      point += '<ele>%s</ele>' % elevation
+    if time is not None:
+      point += '<time>%s</time>' % _format_time(time)
+      if self._first is None:
+        self._first = time
+      self._last = time
+    data = point.encode('ascii') + POINT_END
+
+    self._size += len(data)
+    self._points += 1
+    if self._buffered:
+      with self._lock:
+        self._pending.append(data)
+      return
+
+    self._file.write(data)
+    self._file.flush()
+    self._sync()
+
+  def flush(self) -> None:
+    '''write the points collected by a buffered writer'''
+    with self._lock:
+      if self._file is None:
+        self._open()
+      elif self._file.closed:
+        return
+      pending, self._pending = self._pending, list()
+      if pending:
+        self._file.write(b''.join(pending))
+        self._file.flush()
+      self._sync()
+
+  def _sync(self, force: bool = False) -> None:
+    if self._sync_interval is None and not force:
+      return
+    now = time.monotonic()
+    if force or now - self._synced >= self._sync_interval:
+      os.fsync(self._file.fileno())
+      self._synced = now
+
+  def close(self) -> str:
+    '''finalise the file; returns its name'''
+    self.flush()
+    with self._lock:
+      if not self._file.closed:
+        self._file.write(FOOTER)
+        self._file.flush()
+        self._sync(force=True)
+        self._file.close()
+        os.replace(self._partname, self._filename)
+    return self._filename
+
+  @property
+  def filename(self) -> str:
+    return self._filename
+
+  @property
+  def points(self) -> int:
+    return self._points
+
+  @property
+  def duration(self) -> float:
+    '''seconds between the first and the last point'''
+    if self._first is None:
+      return 0.0
+    return (self._last - self._first).total_seconds()
+
+  @property
+  def size(self) -> int:
+    '''bytes written so far, or collected by a buffered writer'''
+    return self._size
+
+def recover(directory: str) -> list[str]:
+  '''repair and finalise all '.part' files in directory; returns the recovered files'''
+  recovered = list()
+  for name in sorted(os.listdir(directory)):
+    if name.endswith('.gpx.part'):
+      partname = os.path.join(directory, name)
+      repair(partname)
+      filename = partname[:-len('.part')]
+      os.replace(partname, filename)
+      recovered.append(filename)
+  return recovered
@@ -0,0 +1,261 @@
+'''
+Runtime metrics
+
+Counters, gauges and histograms with labels, rendered in the Prometheus
+text format. serve() exposes them on a local HTTP endpoint (GET /metrics),
+dump() logs them periodically for setups without a scraper:
+
+  sentences = metrics.REGISTRY.counter('nmea_sentences_total', 'received sentences', ('talker', 'topic'))
+  sentences.labels(b'GP', b'RMC').inc()
+
+Updates are plain attribute arithmetic on a child looked up once, so the cost
+on a hot path is a dictionary lookup and an addition; keep the child if the
+labels do not change. Gauges can also be computed when they are collected
+(set_function()), which costs nothing between scrapes. Each metric is meant
+to be updated from one thread; the values are read without locking.
+'''
+
+import abc
+import bisect
+import http.server
+import logging
+import math
+import threading
+from typing import Callable, Iterable, Optional, Union
+
+LabelValue = Union[str, bytes, int]
+
+def _label(value: LabelValue) -> str:
+  if isinstance(value, bytes):
+    value = value.decode('ascii', 'replace')
+  return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+def _value(value: float) -> str:
+  if value == math.inf:
+    return '+Inf'
+  if value == int(value) and abs(value) < 1e15:
+    return str(int(value))
+  return repr(float(value))
+
+class _CounterChild:
+  __slots__ = ('value',)
+
+  def __init__(self):
+    self.value = 0 # an int until a fractional amount is added
+
+  def inc(self, amount: float = 1):
+    self.value += amount
+
+class _GaugeChild:
+  __slots__ = ('value', '_function')
+
+  def __init__(self):
+    self.value = 0.0
+    self._function = None
+
+  def set(self, value: float):
+    self.value = value
+
+  def inc(self, amount: float = 1.0):
+    self.value += amount
+
+  def dec(self, amount: float = 1.0):
+    self.value -= amount
+
+  def set_function(self, function: Callable[[], float]):
+    '''the value is function() at collection time'''
+    self._function = function
+
+  def get(self) -> float:
+    return self._function() if self._function else self.value
+
+class _HistogramChild:
+  __slots__ = ('_bounds', 'counts', 'sum', 'count')
+
+  def __init__(self, bounds: list[float]):
+    self._bounds = bounds
+    self.counts = [0] * (len(bounds) + 1) # the last one is +Inf
+    self.sum = 0.0
+    self.count = 0
+
+  def observe(self, value: float):
+    self.counts[bisect.bisect_left(self._bounds, value)] += 1
+    self.sum += value
+    self.count += 1
+
+class _Metric(abc.ABC):
+  kind = ''
+  child = None
+
+  def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+    self.name = name
+    self.help = help
+    self.labelnames = tuple(labelnames)
+    self._children = dict()
+    if not self.labelnames:
+      self._children[()] = self._new()
+
+  def _new(self):
+    return self.child()
+
+  def labels(self, *values: LabelValue):
+    '''the child for these label values, created on first use'''
+    child = self._children.get(values)
+    if child is None:
+      if len(values) != len(self.labelnames):
+        raise Exception('Wrong number of labels - got {} expected {}'.format(len(values), len(self.labelnames)), self.name)
+      child = self._children[values] = self._new()
+    return child
+
+  def _labels(self, values: tuple, extra: str = '') -> str:
+    pairs = ['%s="%s"' % (name, _label(value)) for name, value in zip(self.labelnames, values)]
+    if extra:
+      pairs.append(extra)
+    return '{%s}' % ','.join(pairs) if pairs else ''
+
+  @abc.abstractmethod
+  def samples(self) -> Iterable[str]:
+    '''the sample lines of all children'''
+
+  def render(self) -> str:
+    lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s %s' % (self.name, self.kind)]
+    lines.extend(self.samples())
+    return '\n'.join(lines)
+
+class Counter(_Metric):
+  kind = 'counter'
+  child = _CounterChild
+
+  def inc(self, amount: float = 1):
+    self._children[()].inc(amount)
+
+  def samples(self):
+    for values, child in list(self._children.items()):
+      yield '%s%s %s' % (self.name, self._labels(values), _value(child.value))
+
+class Gauge(_Metric):
+  kind = 'gauge'
+  child = _GaugeChild
+
+  def set(self, value: float):
+    self._children[()].set(value)
+
+  def set_function(self, function: Callable[[], float]):
+    self._children[()].set_function(function)
+
+  def samples(self):
+    for values, child in list(self._children.items()):
+      try:
+        value = child.get()
+      except Exception:
+        continue # a broken callback must not break the scrape
+      yield '%s%s %s' % (self.name, self._labels(values), _value(value))
+
+# seconds, from a fast handler to a slow upload
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram(_Metric):
+  kind = 'histogram'
+
+  def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+    self._bounds = sorted(buckets)
+    super().__init__(name, help, labelnames)
+
+  def _new(self):
+    return _HistogramChild(self._bounds)
+
+  def observe(self, value: float):
+    self._children[()].observe(value)
+
+  def samples(self):
+    for values, child in list(self._children.items()):
+      cumulative = 0
+      for bound, count in zip(self._bounds + [math.inf], list(child.counts)):
+        cumulative += count
+        yield '%s_bucket%s %d' % (self.name, self._labels(values, 'le="%s"' % _value(bound)), cumulative)
+      yield '%s_sum%s %s' % (self.name, self._labels(values), _value(child.sum))
+      yield '%s_count%s %d' % (self.name, self._labels(values), child.count)
+
+class Registry:
+  def __init__(self):
+    self._metrics = dict()
+    self._lock = threading.Lock()
+
+  def _register(self, metric: _Metric) -> _Metric:
+    with self._lock:
+      existing = self._metrics.get(metric.name)
+      if existing is not None:
+        if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+          raise Exception('Metric registered twice with different types or labels', metric.name)
+        return existing
+      self._metrics[metric.name] = metric
+      return metric
+
+  def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+    return self._register(Counter(name, help, labelnames))
+
+  def gauge(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Gauge:
+    return self._register(Gauge(name, help, labelnames))
+
+  def histogram(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+    return self._register(Histogram(name, help, labelnames, buckets))
+
+  def unregister(self, *metrics: _Metric) -> None:
+    '''
+    Remove metrics, e.g. gauges with a set_function() that refers to an
+    object being closed, so the registry does not keep it alive.
+    '''
+    with self._lock:
+      for metric in metrics:
+        if self._metrics.get(metric.name) is metric:
+          del self._metrics[metric.name]
+
+  def render(self) -> str:
+    '''all metrics in the Prometheus text format'''
+    with self._lock:
+      metrics = list(self._metrics.values())
+    return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+REGISTRY = Registry()
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+  registry = REGISTRY
+
+  def do_GET(self):
+    if self.path.split('?')[0] not in ('/', '/metrics'):
+      self.send_error(404)
+      return
+    body = self.registry.render().encode('utf-8')
+    self.send_response(200)
+    self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, format, *args):
+    pass # one line per scrape is noise
+
+def serve(port: int, addr: str = '127.0.0.1', registry: Registry = REGISTRY) -> http.server.ThreadingHTTPServer:
+  '''serve GET /metrics from a daemon thread; returns the server (shutdown() stops it)'''
+  handler = type('Handler', (_Handler,), {'registry': registry})
+  server = http.server.ThreadingHTTPServer((addr, port), handler)
+  server.daemon_threads = True
+  threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+  logging.info('metrics on http://%s:%d/metrics' % (addr, server.server_address[1]))
+  return server
+
+def dump(interval: float, output: Optional[Callable[[str], None]] = None, registry: Registry = REGISTRY) -> threading.Event:
+  '''
+  Write the samples (without the HELP and TYPE lines) every interval
+  seconds from a daemon thread, to the log unless output is given. Set the
+  returned event to stop.
+  '''
+  output = output or logging.getLogger('metrics').info
+  stop = threading.Event()
+
+  def run():
+    while not stop.wait(interval):
+      output('\n'.join(line for line in registry.render().splitlines() if not line.startswith('#')))
+
+  threading.Thread(target=run, name='metrics-dump', daemon=True).start()
+  return stop
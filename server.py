@@ -2,10 +2,15 @@
 ''''''
 
 import argparse
+import datetime
 import logging
+import multiprocessing
+import time
+from typing import Callable, Iterable, Optional, Union
 
 import zmq
 
+import metrics
 import NMEA0183
 
 # Talker ID's
@@ -52,103 +57,465 @@ talker_id = { b'AG': '(General) Heading Track Controller (Autopilot)',
 
 
 class Server:
-  def __init__(self):
+  handlers = (b'RMC', b'GGA', b'GSA', b'GSV', b'VTG', b'XDR') # topics with a method of their own, other decoded topics (plugins) are reported as they are
+
+  def __init__(self, output: Callable[[str], None] = print, topics: Optional[Iterable[bytes]] = None, unsupported: bool = True, copy: bool = True, batch_size: int = 1024, skyplot=None, registry: Optional[metrics.Registry] = None, recorder: Optional[NMEA0183.Recorder] = None, history: int = 3600, merge: Optional[float] = None):
+    '''
+    output receives every line the handlers report. Sentences are decoded by
+    the decoder NMEA0183.find_decoder() returns for their topic. If topics is
+    given only those topics are decoded, plus topics without a decoder if
+    unsupported is set; ShardedServer uses this to split topics between
+    processes.
+
+    run() drains up to batch_size messages per socket and wakeup; with
+    copy=False the sentences are backed by the zmq frames instead of copies.
+
+    skyplot is an optional started NMEA0183.plot_gsv.SkyplotRenderer that
+    receives the satellites in view after every complete GSV group; close()
+    stops it.
+
+    Metrics go to registry (default metrics.REGISTRY).
+
+    recorder is an optional NMEA0183.Recorder that receives every message as
+    it arrives, with the address it came from as source; every connect()
+    address then gets a socket of its own. A failing recorder is logged and
+    does not stop the server.
+
+    The last history fixes of RMC, GGA and GSA are kept in fixes for
+    windowed queries if numpy is installed (fixes is None otherwise).
+
+    With merge (seconds), the sentences of all sources are handled in the
+    order of their time through an NMEA0183.Merge with that reorder window.
+    Every connect() address then gets a socket of its own, so the source of
+    a message is known; a pull() address is one source. Late sentences are
+    counted and handled at once.
+    '''
     self._logger = logging.getLogger(__name__)
+    self._output = output
+    self._topics = set(topics) if topics is not None else None # None = all topics
+    self._unsupported_topics = unsupported
+    self._copy = copy
+    self._batch_size = batch_size
+    self._skyplot = skyplot
+    self._recorder = recorder
+    self._record_failures = 0
+    self._record_logged = float('-inf')
+    try:
+      self._fixes = NMEA0183.FixBuffer(capacity=history)
+    except ImportError:
+      self._fixes = None # numpy is not installed
     self._context = zmq.Context()
     #pylint: disable=no-member
     self._socket = self._context.socket(zmq.SUB)
     self._socket.setsockopt(zmq.SUBSCRIBE, b'')
+    self._subscribers = [self._socket]
+    self._subscriptions = [b'']
+    self._sockets = [self._socket]
+    self._sources = {self._socket: ''} # socket -> its address (all of them if it is shared), the source of recorded and merged messages
 
     self._talkers = set()
-    self._unsupported = set()
-    self._supported = {
-      b'RMC': self.RMC,
-      b'GSA': self.GSA,
-      b'VTG': self.VTG,
-      b'GGA': self.GGA,
-      b'GSV': self.GSV,
-      b'XDR': self.XDR}
-
-    self._satellites = list()
-    self._satellites_tmp = list()
+    self._handlers = dict() # topic -> handler, False if there is no decoder; filled as topics are seen
+    self._supported = set(NMEA0183.decoder_topics()) if topics is not None else None
+
+    self._store = NMEA0183.SatelliteStore()
 
     self._time = None
 
+    registry = registry or metrics.REGISTRY
+    self._received = registry.counter('nmea_sentences_total', 'received sentences', ('talker', 'topic'))
+    self._invalid = registry.counter('nmea_invalid_total', 'messages that are not framed as a sentence')
+    self._checksum_failures = registry.counter('nmea_checksum_failures_total', 'sentences with a wrong checksum', ('topic',))
+    self._decode_failures = registry.counter('nmea_decode_failures_total', 'sentences the handler could not decode', ('topic', 'reason'))
+    self._rejected = NMEA0183.StatusLog(self._logger, interval=60.0)
+    self._latency_seconds = registry.histogram('nmea_handler_seconds', 'time spent in the handler of a topic', ('topic',))
+    self._latency = dict()
+    self._batch = registry.histogram('nmea_drain_batch_messages', 'messages handled per wakeup; batch_size means more were waiting', buckets=[2 ** i for i in range(batch_size.bit_length())] + [batch_size])
+    self._counts = dict() # (talker, topic) -> counter child, saves the labels() call per sentence
+    self._registry = registry
+    self._gauges = list() # computed by this server, unregistered by close()
+    self._gauge('nmea_receive_lag_seconds', 'wall clock minus the time of the last RMC fix', self._receive_lag)
+
+    self._merge = None
+    if merge is not None:
+      self._late = registry.counter('nmea_merge_late_total', 'sentences that arrived after the reorder window', ('source',))
+      self._merge = NMEA0183.Merge(window=merge, on_late=self._on_late)
+      self._gauge('nmea_merge_pending', 'sentences held in the reorder window', lambda: len(self._merge))
+
+  def _gauge(self, name: str, help: str, function: Callable[[], float]):
+    gauge = self._registry.gauge(name, help)
+    gauge.set_function(function)
+    self._gauges.append(gauge)
+
   def connect(self, addr: str):
-    self._socket.connect(addr)
+    socket = self._socket
+    if (self._merge is not None or self._recorder is not None) and self._sources[socket]:
+      # one socket per source, so the source of a message is known
+      #pylint: disable=no-member
+      socket = self._context.socket(zmq.SUB)
+      for prefix in self._subscriptions:
+        socket.setsockopt(zmq.SUBSCRIBE, prefix)
+      self._subscribers.append(socket)
+      self._sockets.append(socket)
+      self._sources[socket] = ''
+    socket.connect(addr)
+    self._sources[socket] = ' '.join(filter(None, (self._sources[socket], addr)))
     print('Collecting updates from %s...' % addr)
 
+  def pull(self, addr: str):
+    '''receive from PUSH sockets on an address this server binds to'''
+    #pylint: disable=no-member
+    socket = self._context.socket(zmq.PULL)
+    socket.bind(addr)
+    self._sockets.append(socket)
+    self._sources[socket] = addr
+    print('Pulling updates on %s...' % addr)
+
   def subscribe(self, topic: str):
     topic = '$' + topic
-    self._socket.setsockopt(zmq.UNSUBSCRIBE, b'')
-    self._socket.setsockopt(zmq.SUBSCRIBE, topic.encode('ascii'))
+    prefix = topic.encode('ascii')
+    for socket in self._subscribers:
+      socket.setsockopt(zmq.UNSUBSCRIBE, b'')
+      socket.setsockopt(zmq.SUBSCRIBE, prefix)
+    if b'' in self._subscriptions:
+      self._subscriptions.remove(b'')
+    self._subscriptions.append(prefix)
     print('Subscribing to "{}"'.format(topic))
 
+  def close(self, timeout: Optional[float] = 5.0):
+    '''close the sockets without waiting for unsent messages and stop the skyplot thread'''
+    self._registry.unregister(*self._gauges)
+    self._context.destroy(linger=0)
+    if self._skyplot is not None:
+      self._skyplot.close(timeout)
+
   def run(self):
+    poller = zmq.Poller()
+    for socket in self._sockets:
+      poller.register(socket, zmq.POLLIN)
+
+    if self._merge is None:
+      while True:
+        for socket, _ in poller.poll():
+          self.drain(socket)
+
+    # wake up in time to release the merged sentences
+    timeout = max(1, int(self._merge.window * 500))
     while True:
-      raw = self._socket.recv()
-      sen = NMEA0183.bytes_to_sentence(raw)
-
-      if sen.talker not in self._talkers:
-        self._talkers.add(sen.talker)
-        self._logger.info('New talker: %s: %s', sen.talker, talker_id[sen.talker])
-        print(self._talkers)
-
-      if sen.topic in self._supported:
-        self._supported[sen.topic](sen)
-      elif sen.topic not in self._unsupported:
-        self._unsupported.add(sen.topic)
-        self._logger.warning('Unsupported topic: %s', sen.topic)
-
-  def RMC(self, sen: NMEA0183.Sentence):
-    rmc = NMEA0183.RMC(sen)
+      for socket, _ in poller.poll(timeout):
+        self.drain(socket)
+      for item in self._merge.pop(time.time()):
+        self.handle(item.raw)
+
+  def _on_late(self, item: NMEA0183.Merged):
+    self._late.labels(item.source).inc()
+    self.handle(item.raw)
+
+  def drain(self, socket: zmq.Socket) -> int:
+    '''handle the messages available on socket without blocking; returns their number'''
+    recv = socket.recv
+    handle = self.handle
+    copy = self._copy
+    recorder = self._recorder
+    source = self._sources.get(socket, '')
+    if self._merge is not None:
+      push = self._merge.push
+      received = time.time()
+      handle = lambda raw: push(source, raw, received)
+    count = 0
+    try:
+      while count < self._batch_size:
+        frame = recv(zmq.NOBLOCK, copy=copy)
+        raw = frame if copy else frame.buffer
+        if recorder is not None:
+          try:
+            recorder.append(raw, source)
+          except Exception:
+            self._record_failed()
+        handle(raw)
+        count += 1
+    except zmq.Again:
+      pass
+    self._batch.observe(count)
+    return count
+
+  def _record_failed(self):
+    self._record_failures += 1
+    now = time.monotonic()
+    if now - self._record_logged >= 60.0: # once a minute while the disk is full
+      self._record_logged = now
+      self._logger.exception('Recording failed (%d messages not recorded so far)', self._record_failures)
+
+  def handle(self, raw: Union[bytes,memoryview]):
+    if len(raw) > 82: # longer than a sentence may be, several sentences in one message (SentenceTemplate.encode_many)
+      data = bytes(raw)
+      if data.find(b'\n', 0, -1) >= 0:
+        for line in data.splitlines(keepends=True):
+          self.handle(line)
+        return
+
+    if self._topics is not None:
+      # drop filtered topics before building a sentence
+      topic = bytes(raw[3:6])
+      if topic not in self._topics and (topic in self._supported or not self._unsupported_topics):
+        return
+
+    try:
+      sen = NMEA0183.LazySentence(raw)
+    except Exception:
+      self._invalid.inc()
+      self._rejected.report(NMEA0183.Status.MALFORMED, bytes(raw[:80]))
+      return
+    topic = sen.topic
+
+    talker = sen.talker
+    if talker not in self._talkers:
+      self._talkers.add(talker)
+      self._logger.info('New talker: %s: %s', talker, talker_id.get(talker, 'unknown'))
+      self._output(str(self._talkers))
+    count = self._counts.get((talker, topic))
+    if count is None:
+      count = self._counts[talker, topic] = self._received.labels(talker, topic)
+    count.inc()
+
+    handler = self._handlers.get(topic)
+    if handler is None:
+      handler = self._handler(topic)
+      if topic.isalnum(): # not noise
+        self._handlers[topic] = handler
+    if handler:
+      # time every 16th sentence of a talker and topic, timing all of them costs more than the counters
+      start = time.perf_counter() if not count.value & 15 else None
+      try:
+        status = handler(sen)
+      except Exception:
+        self._logger.debug('Cannot report %s', sen.raw, exc_info=True)
+        status = NMEA0183.Status.INVALID
+      if status:
+        if status == NMEA0183.Status.BAD_CHECKSUM:
+          self._checksum_failures.labels(topic).inc()
+        else:
+          self._decode_failures.labels(topic, status.name).inc()
+        self._rejected.report(status, sen.raw)
+      if start is not None:
+        self._latency[topic].observe(time.perf_counter() - start)
+
+  def _handler(self, topic: bytes) -> Union[Callable[[NMEA0183.Sentence], NMEA0183.Status], bool]:
+    '''decodes through the registry and reports, returns the status; False if the topic has no decoder'''
+    try:
+      decoder = NMEA0183.find_decoder(topic)
+    except Exception:
+      self._logger.exception('Cannot load the decoder of %s', topic)
+      decoder = None
+    if decoder is None:
+      self._rejected.report(NMEA0183.Status.NO_DECODER, topic)
+      return False
+
+    report = getattr(self, topic.decode('ascii')) if topic in self.handlers else self._report
+    self._latency[topic] = self._latency_seconds.labels(topic)
+
+    def handler(sen: NMEA0183.Sentence) -> NMEA0183.Status:
+      status, decoded = NMEA0183.try_decode(sen, decoder=decoder)
+      if not status:
+        report(sen, decoded)
+      return status
+    return handler
+
+  def _report(self, sen: NMEA0183.Sentence, decoded):
+    self._output('%s: %s' % (sen.topic.decode('ascii'), decoded))
+
+  def _receive_lag(self) -> float:
+    if self._time is None:
+      raise Exception('No fix yet') # no sample
+    return (datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) - self._time).total_seconds()
+
+  @property
+  def fixes(self) -> Optional['NMEA0183.FixBuffer']: # a string, the module needs numpy
+    return self._fixes
+
+  def RMC(self, sen: NMEA0183.Sentence, rmc: NMEA0183.RMC):
     self._time = rmc.time
-    print('RMC: Time %s, Lon %s, Lat %s, Speed %s, Heading %s' % (rmc.time, rmc.longitude, rmc.latitude, rmc.speed, rmc.heading))
+    if self._fixes is not None:
+      self._fixes.update_rmc(rmc)
+    self._output('RMC: Time %s, Lon %s, Lat %s, Speed %s, Heading %s' % (rmc.time, rmc.longitude, rmc.latitude, rmc.speed, rmc.heading))
+
+  def GGA(self, sen: NMEA0183.Sentence, gga: NMEA0183.GGA):
+    if self._fixes is not None:
+      self._fixes.update_gga(gga)
+    self._output('GGA: Altitude %s, Quality %s, Satellites %s' % (gga.altitude, gga.quality, gga.numberOfSatellites))
 
-  def GSA(self, sen: NMEA0183.Sentence):
-    gsa = NMEA0183.GSA(sen)
-    print('GSA: dop %s, hdop %s, vdop %s' % (gsa.dop, gsa.hdop, gsa.vdop))
+  def GSA(self, sen: NMEA0183.Sentence, gsa: NMEA0183.GSA):
+    if self._fixes is not None:
+      self._fixes.update_gsa(gsa)
+    self._output('GSA: dop %s, hdop %s, vdop %s' % (gsa.dop, gsa.hdop, gsa.vdop))
+    self._deltas(self._store.update_gsa(sen.talker, gsa))
 
-  def VTG(self, sen: NMEA0183.Sentence):
-    #print(sen)
-    pass
+  def GSV(self, sen: NMEA0183.Sentence, gsv: NMEA0183.GSV):
+    self._deltas(self._store.update_gsv(sen.talker, gsv))
+    if self._skyplot is not None and gsv.index == gsv.numberOfSentences:
+      self._skyplot.submit([(s.prn, s.elevation, s.azimuth, s.snr) for s in self._store.snapshot().values()], self._time)
 
-  def GGA(self, sen: NMEA0183.Sentence):
-    #print(sen)
-    pass
+  def VTG(self, sen: NMEA0183.Sentence, vtg: NMEA0183.VTG):
+    self._output('VTG: Heading %s, Speed %s' % (vtg.heading, vtg.speed))
+
+  def XDR(self, sen: NMEA0183.Sentence, xdr: NMEA0183.XDR):
+    self._output('XDR: %s' % ', '.join('%s %s %s' % (m.name.decode('ascii', 'replace'), m.value, m.unit.decode('ascii', 'replace')) for m in xdr.measurements))
+
+  def _deltas(self, deltas: list[NMEA0183.Delta]):
+    for talker, prn, state in deltas:
+      if state is None:
+        self._output('GSV: %s %d lost' % (talker.decode('ascii'), prn))
+      else:
+        self._output('GSV: %s %d elevation %s, azimuth %s, snr %s%s' % (talker.decode('ascii'), prn, state.elevation, state.azimuth, state.snr, ', used' if state.used else ''))
+
+def _worker(addrs: list[str], subscriptions: list[str], topics: Optional[list[bytes]], unsupported: bool, copy: bool, sink: str):
+  logging.basicConfig(level=logging.INFO, format='%(levelname)s [%(name)s] %(processName)s %(message)s')
+
+  context = zmq.Context()
+  #pylint: disable=no-member
+  push = context.socket(zmq.PUSH)
+  push.connect(sink)
+
+  server = Server(output=push.send_string, topics=topics, unsupported=unsupported, copy=copy)
+  for addr in addrs:
+    server.connect(addr)
+  for topic in subscriptions:
+    server.subscribe(topic)
+  try:
+    server.run()
+  except KeyboardInterrupt:
+    pass # the aggregator reports the shutdown
 
-  def GSV(self, sen: NMEA0183.Sentence):
-    gsv = NMEA0183.GSV(sen)
+class ShardedServer:
+  '''
+  Runs Server decode loops in a pool of worker processes.
 
-    if gsv.index == 1:
-      self._satellites_tmp = list()
+  With shard_by='source' the --connect addresses are distributed over the
+  workers, so each source is decoded by exactly one process. With
+  shard_by='topic' every worker connects to all sources but only decodes its
+  share of the topics (the others are dropped after a look at the topic),
+  which spreads a single busy source over several cores. The workers push
+  their output to one aggregator socket in this process, which prints it.
 
-    self._satellites_tmp.extend(gsv._satellites)
+  Each worker has a SatelliteStore and a FixBuffer of its own, which join
+  RMC, GGA, GSA and GSV (in-use flags, altitude and DOP of a fix). These
+  topics (STATEFUL) therefore always stay together on the first worker;
+  topic sharding only spreads the other topics. A source with mostly
+  stateful sentences is better sharded by source.
+  '''
 
-    if gsv.index == gsv.numberOfSentences:
-      self._satellites = self._satellites_tmp
-      print('GSV: %d satellites: %s' % (gsv.numberOfSatellites, self._satellites))
-      #NMEA0183.plot_gsv(self._satellites, self._time)
+  STATEFUL = (b'RMC', b'GGA', b'GSA', b'GSV') # share the store and fix buffer of a Server
 
-  def XDR(self, sen: NMEA0183.Sentence):
-    #print(sen)
-    pass
+  def __init__(self, workers: int, shard_by: str = 'source', copy: bool = True):
+    if shard_by not in ('source', 'topic'):
+      raise Exception('Unknown sharding', shard_by)
+    self._workers = max(1, workers)
+    self._shard_by = shard_by
+    self._copy = copy
+    self._addrs = list()
+    self._subscriptions = list()
+
+  def connect(self, addr: str):
+    self._addrs.append(addr)
+
+  def subscribe(self, topic: str):
+    self._subscriptions.append(topic)
+
+  def _shards(self) -> list[tuple[list[str], Optional[list[bytes]], bool]]:
+    '''(addresses, topics, unsupported topics) per worker'''
+    if self._shard_by == 'source':
+      workers = min(self._workers, len(self._addrs))
+      return [(self._addrs[i::workers], None, True) for i in range(workers)]
+
+    # the stateful topics and topics without a handler stay with the first worker, which reports them
+    topics = [topic for topic in NMEA0183.decoder_topics() if topic not in self.STATEFUL]
+    workers = min(self._workers, len(topics) + 1)
+    shards = [list(self.STATEFUL)] + [list() for _ in range(workers - 1)]
+    for i, topic in enumerate(topics):
+      shards[(i + 1) % workers].append(topic)
+    return [(self._addrs, shard, i == 0) for i, shard in enumerate(shards)]
+
+  def run(self):
+    context = zmq.Context()
+    #pylint: disable=no-member
+    pull = context.socket(zmq.PULL)
+    port = pull.bind_to_random_port('tcp://127.0.0.1')
+    sink = 'tcp://127.0.0.1:%d' % port
+
+    processes = list()
+    for i, (addrs, topics, unsupported) in enumerate(self._shards()):
+      process = multiprocessing.Process(target=_worker, args=(addrs, self._subscriptions, topics, unsupported, self._copy, sink), name='worker-%d' % i, daemon=True)
+      process.start()
+      processes.append(process)
+      print('Worker %d: %s, topics %s' % (i, addrs, 'all' if topics is None else topics))
+
+    try:
+      while True:
+        print(pull.recv_string())
+    finally:
+      for process in processes:
+        process.terminate()
 
 def _main():
   logging.basicConfig(level=logging.INFO, format='%(levelname)s [%(name)s] %(message)s')
 
   parser = argparse.ArgumentParser(description='NMEA0183 server', allow_abbrev=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
-  parser.add_argument('--connect', type=str, action='append', required=True)
+  parser.add_argument('--connect', type=str, action='append', default=[], help='SUB: connect to a publisher')
+  parser.add_argument('--pull', type=str, action='append', default=[], help='PULL: bind and receive from pushers')
   parser.add_argument('--topic', type=str, action='append')
+  parser.add_argument('--zero-copy', action='store_true', help='receive without copying the zmq frames')
+  parser.add_argument('--workers', type=int, default=1, help='number of decoding processes')
+  parser.add_argument('--shard-by', choices=('source', 'topic'), default='source', help='how to split the work between the workers; with topic, RMC, GGA, GSA and GSV stay on one worker')
+  parser.add_argument('--skyplot', type=str, help='render the satellites in view to this image file')
+  parser.add_argument('--skyplot-fps', type=float, default=0.2, help='maximum skyplot frame rate')
+  parser.add_argument('--metrics-port', type=int, help='serve Prometheus metrics on this local port')
+  parser.add_argument('--metrics-dump', type=float, help='log the metrics every this many seconds')
+  parser.add_argument('--merge', type=float, metavar='SECONDS', help='handle the sentences of all sources in time order, with this reorder window')
+  parser.add_argument('--record', type=str, help='append every received message to this recording (NMEA0183.Recorder)')
   args = parser.parse_args()
+  if not args.connect and not args.pull:
+    parser.error('at least one --connect or --pull address is required')
+  if args.pull and args.workers > 1:
+    parser.error('--pull is not supported with --workers')
+  if args.skyplot and args.workers > 1:
+    parser.error('--skyplot is not supported with --workers')
+  if (args.metrics_port or args.metrics_dump) and args.workers > 1:
+    parser.error('metrics are not supported with --workers')
+  if args.record and args.workers > 1:
+    parser.error('--record is not supported with --workers')
+  if args.merge is not None and args.workers > 1:
+    parser.error('--merge is not supported with --workers')
+
+  if args.metrics_port:
+    metrics.serve(args.metrics_port)
+  if args.metrics_dump:
+    metrics.dump(args.metrics_dump)
 
-  server = Server()
+  recorder = None
+  if args.workers > 1:
+    server = ShardedServer(args.workers, args.shard_by, copy=not args.zero_copy)
+  else:
+    skyplot = None
+    if args.skyplot:
+      import NMEA0183.plot_gsv
+      skyplot = NMEA0183.plot_gsv.SkyplotRenderer(args.skyplot, max_fps=args.skyplot_fps)
+      skyplot.start()
+    if args.record:
+      recorder = NMEA0183.Recorder(args.record)
+    server = Server(copy=not args.zero_copy, skyplot=skyplot, recorder=recorder, merge=args.merge)
   for addr in args.connect:
     server.connect(addr)
+  for addr in args.pull:
+    server.pull(addr)
   if args.topic:
     for topic in args.topic:
       server.subscribe(topic)
-  server.run()
+  try:
+    server.run()
+  finally:
+    if isinstance(server, Server):
+      server.close()
+    if recorder is not None:
+      recorder.close()
 
 if __name__ == '__main__':
   _main()
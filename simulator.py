@@ -0,0 +1,101 @@
+'''Simulated GNSS receiver on a moving boat'''
+
+import datetime
+import math
+import random
+
+import NMEA0183
+
+# talker -> PRN range of the constellation
+CONSTELLATIONS = {
+  b'GP': range(1, 33),
+  b'GL': range(65, 97),
+  b'GA': range(301, 337),
+  b'GB': range(401, 464),
+}
+
+# NMEA 4.1 GSA system id
+SYSTEM_ID = {b'GP': '1', b'GL': '2', b'GA': '3', b'GB': '4'}
+
+def _degrees(value: float, width: int) -> str:
+  value = abs(value)
+  degrees = int(value)
+  return '%0*d%07.4f' % (width, degrees, (value - degrees) * 60.0)
+
+class Receiver:
+  '''state of the simulated receiver; sentences() returns one epoch'''
+
+  def __init__(self, seed: int = 0, talkers: tuple = (b'GP',), start: datetime.datetime = datetime.datetime(2021, 7, 1, 12, 0, 0)):
+    self._random = random.Random(seed)
+    self._talkers = talkers
+    self._time = start
+    self._latitude = 54.3 + self._random.random()
+    self._longitude = 10.1 + self._random.random()
+    self._speed = 5.0 # knots
+    self._heading = self._random.uniform(0.0, 360.0)
+    self._altitude = 12.0
+    self._satellites = {talker: [[prn, self._random.randint(5, 85), self._random.randint(0, 359), self._random.randint(20, 48)] for prn in self._random.sample(CONSTELLATIONS[talker], 10)] for talker in talkers}
+
+  @property
+  def time(self) -> datetime.datetime:
+    return self._time
+
+  def step(self, seconds: float) -> None:
+    self._time += datetime.timedelta(seconds=seconds)
+    self._heading = (self._heading + self._random.gauss(0.0, 1.0)) % 360.0
+    self._speed = max(0.0, self._speed + self._random.gauss(0.0, 0.1))
+    distance = self._speed * 1852.0 / 3600.0 * seconds / 111319.5
+    self._latitude += distance * math.cos(math.radians(self._heading))
+    self._longitude += distance * math.sin(math.radians(self._heading)) / math.cos(math.radians(self._latitude))
+    self._altitude += self._random.gauss(0.0, 0.2)
+    for satellites in self._satellites.values():
+      for satellite in satellites:
+        satellite[3] = min(55, max(0, satellite[3] + self._random.randint(-1, 1)))
+
+  def _talker(self) -> bytes:
+    return b'GN' if len(self._talkers) > 1 else self._talkers[0]
+
+  def _position(self) -> list[str]:
+    return [
+      _degrees(self._latitude, 2), 'N' if self._latitude >= 0 else 'S',
+      _degrees(self._longitude, 3), 'E' if self._longitude >= 0 else 'W']
+
+  def rmc(self) -> bytes:
+    t = self._time
+    fields = ['%02d%02d%05.2f' % (t.hour, t.minute, t.second + t.microsecond / 1e6), 'A', *self._position(),
+      '%.1f' % self._speed, '%.1f' % self._heading, t.strftime('%d%m%y'), '', '', 'A']
+    return NMEA0183.Sentence(self._talker(), 'RMC', fields).raw
+
+  def gga(self) -> bytes:
+    t = self._time
+    fields = ['%02d%02d%05.2f' % (t.hour, t.minute, t.second + t.microsecond / 1e6), *self._position(),
+      '1', '%02d' % min(12, sum(len(s) for s in self._satellites.values())), '0.9', '%.1f' % self._altitude, 'M', '45.0', 'M', '', '']
+    return NMEA0183.Sentence(self._talker(), 'GGA', fields).raw
+
+  def vtg(self) -> bytes:
+    fields = ['%.1f' % self._heading, 'T', '', 'M', '%.1f' % self._speed, 'N', '%.1f' % (self._speed * 1.852), 'K', 'A']
+    return NMEA0183.Sentence(self._talker(), 'VTG', fields).raw
+
+  def gsa(self) -> list[bytes]:
+    sentences = list()
+    for talker, satellites in self._satellites.items():
+      prns = ['%02d' % s[0] for s in satellites if s[3] > 25][:12]
+      fields = ['A', '3', *(prns + [''] * (12 - len(prns))), '1.8', '0.9', '1.5']
+      if len(self._talkers) > 1:
+        fields.append(SYSTEM_ID[talker])
+      sentences.append(NMEA0183.Sentence(self._talker(), 'GSA', fields).raw)
+    return sentences
+
+  def gsv(self) -> list[bytes]:
+    sentences = list()
+    for talker, satellites in self._satellites.items():
+      count = (len(satellites) + 3) // 4
+      for i in range(count):
+        fields = [str(count), str(i + 1), '%02d' % len(satellites)]
+        for prn, elevation, azimuth, snr in satellites[4 * i:4 * i + 4]:
+          fields += ['%02d' % prn, '%02d' % elevation, '%03d' % azimuth, '%02d' % snr if snr else '']
+        sentences.append(NMEA0183.Sentence(talker, 'GSV', fields).raw)
+    return sentences
+
+  def xdr(self) -> bytes:
+    return NMEA0183.Sentence('II', 'XDR', ['C', '%.1f' % self._random.gauss(21.0, 0.5), 'C', 'ENV_OUTSIDE_T']).raw
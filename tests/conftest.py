@@ -0,0 +1,6 @@
+'''the tests import the package and the scripts from the repository root'''
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
@@ -0,0 +1,109 @@
+'''batch decoder: columns agree with the decoder classes row by row'''
+
+import datetime
+import functools
+import math
+
+import pytest
+
+numpy = pytest.importorskip('numpy')
+
+import NMEA0183.batch
+from NMEA0183 import GGA, GSA, RMC, Status, try_decode, try_parse
+
+def _sentence(body: bytes) -> bytes:
+  return b'$%s*%02X\r\n' % (body, functools.reduce(lambda a, b: a ^ b, body, 0))
+
+BODIES = [
+  b'GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W,A',
+  b'GNRMC,235959,A,3345.120,S,15112.500,W,000.0,359.9,311299,,,D',
+  b'GPRMC,123520,V,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W,A', # void
+  b'GPRMC,123521,A,4807.038,N,01131.000,E,,084.4,230394,003.1,W,A', # no speed
+  b'GPRMC,123522,A,4807.038,N,01131.000,E,022.4,084.4,310294,003.1,W,A', # 31 February
+  b'GPGGA,115739.00,4158.8441367,N,09147.4416929,W,4,13,0.9,255.747,M,-32.00,M,01,0000',
+  b'GPGGA,115740.50,4158.8441367,S,09147.4416929,E,1,,0.9,12.5,M,-32.00,M,,',
+  b'GPGGA,115741.00,4158.8441367,N,09147.4416929,W,0,00,99.9,255.747,M,-32.00,M,,', # void
+  b'GPGSA,A,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1',
+  b'GNGSA,A,3,65,66,,,,,,,,,,,1.0,0.8,0.6,2',
+  b'GPGSA,A,1,,,,,,,,,,,,,,,', # no DOP
+]
+
+def _expected(body: bytes, decoder):
+  status, sentence = try_parse(_sentence(body))
+  assert not status
+  status, value = try_decode(sentence, decoder=decoder)
+  return sentence.talker, (value if not status else None)
+
+def _tables(bodies=BODIES) -> dict:
+  return NMEA0183.batch.decode_buffer(b''.join(_sentence(body) for body in bodies))
+
+def _rows(topic: bytes, decoder) -> list:
+  return [_expected(body, decoder) for body in BODIES if body[2:5] == topic]
+
+def test_rmc_matches_decoder():
+  table = _tables()[b'RMC']
+  expected = _rows(b'RMC', RMC)
+  assert len(table) == len(expected)
+  for row, (talker, rmc) in zip(table, expected):
+    assert row['talker'] == talker
+    assert bool(row['valid']) == (rmc is not None)
+    if rmc is not None:
+      assert row['time'].astype(datetime.datetime) == rmc.time.replace(tzinfo=None)
+      assert row['latitude'] == pytest.approx(rmc.latitude)
+      assert row['longitude'] == pytest.approx(rmc.longitude)
+      assert row['speed'] == pytest.approx(rmc.speed)
+      assert row['heading'] == pytest.approx(rmc.heading)
+  assert numpy.isnat(table['time'][2:5:2]).all() # void fix and 31 February
+  assert math.isnan(table['speed'][3])
+
+def test_gga_matches_decoder():
+  table = _tables()[b'GGA']
+  expected = _rows(b'GGA', GGA)
+  assert len(table) == len(expected)
+  for row, (talker, gga) in zip(table, expected):
+    assert row['talker'] == talker
+    assert bool(row['valid']) == (gga is not None)
+    if gga is not None:
+      assert row['quality'] == gga.quality
+      assert row['numberOfSatellites'] == (-1 if gga.numberOfSatellites is None else gga.numberOfSatellites)
+      assert row['altitude'] == pytest.approx(gga.altitude)
+  assert table['time_of_day'][:2].tolist() == pytest.approx([11 * 3600 + 57 * 60 + 39, 11 * 3600 + 57 * 60 + 40.5])
+  assert table['latitude'][1] < 0 < table['longitude'][1]
+
+def test_gga_quality_zero_is_void():
+  status, sentence = try_parse(_sentence(BODIES[7]))
+  assert not status
+  with pytest.raises(Exception, match='Void'):
+    GGA(sentence)
+  assert try_decode(sentence, decoder=GGA)[0] == Status.VOID
+  assert not _tables([BODIES[7]])[b'GGA']['valid'][0]
+
+def test_gsa_matches_decoder():
+  table = _tables()[b'GSA']
+  expected = _rows(b'GSA', GSA)
+  assert len(table) == len(expected)
+  for row, (talker, gsa) in zip(table, expected):
+    assert row['talker'] == talker
+    assert bool(row['valid']) == (gsa is not None)
+    if gsa is not None:
+      assert (row['dop'], row['hdop'], row['vdop']) == pytest.approx((gsa.dop, gsa.hdop, gsa.vdop))
+    else:
+      assert math.isnan(row['dop'])
+
+def test_corrupt_lines_are_skipped():
+  good = _sentence(BODIES[0])
+  bad = bytearray(good)
+  bad[10] ^= 1 # checksum mismatch
+  tables = NMEA0183.batch.decode_buffer(good + bytes(bad) + b'garbage\r\n' + good)
+  assert len(tables[b'RMC']) == 2
+  assert tables[b'RMC']['valid'].all()
+
+def test_empty_buffer():
+  tables = NMEA0183.batch.decode_buffer(b'')
+  assert {topic: len(table) for topic, table in tables.items()} == {b'RMC': 0, b'GGA': 0, b'GSA': 0}
+
+def test_decode_file(tmp_path):
+  path = tmp_path / 'capture.nmea'
+  path.write_bytes(b''.join(_sentence(body) for body in BODIES))
+  tables = NMEA0183.batch.decode_file(str(path))
+  assert {topic: len(table) for topic, table in tables.items()} == {b'RMC': 5, b'GGA': 3, b'GSA': 3}
@@ -0,0 +1,67 @@
+'''CaptureFile index: incremental updates, stale indexes and corrupt lines'''
+
+import datetime
+import functools
+
+from NMEA0183 import CaptureFile
+
+def _sentence(body: bytes) -> bytes:
+  return b'$%s*%02X\r\n' % (body, functools.reduce(lambda a, b: a ^ b, body, 0))
+
+def _epoch(second: int, talker: bytes = b'GP') -> bytes:
+  rmc = _sentence(b'%sRMC,1200%02d,A,4807.038,N,01131.000,E,022.4,084.4,010721,003.1,W,A' % (talker, second))
+  gga = _sentence(b'%sGGA,1200%02d,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,' % (talker, second))
+  return rmc + gga
+
+def _at(second: int) -> datetime.datetime:
+  return datetime.datetime(2021, 7, 1, 12, 0, second)
+
+def test_select(tmp_path):
+  path = tmp_path / 'a.nmea'
+  path.write_bytes(b''.join(_epoch(i) for i in range(10)))
+  with CaptureFile(str(path)) as capture:
+    assert len(capture) == 20
+    assert capture.topics == {b'RMC', b'GGA'}
+    assert [s.fields[0] for s in capture.select(topic=b'GGA', start=_at(3), end=_at(6))] == [b'120003', b'120004', b'120005']
+    assert len(list(capture.select(talker=b'GN'))) == 0
+
+def test_update_indexes_the_appended_lines(tmp_path):
+  path = tmp_path / 'a.nmea'
+  path.write_bytes(_epoch(0) + _epoch(1)[:20]) # the last line is incomplete
+  with CaptureFile(str(path)) as capture:
+    assert len(capture) == 2
+    with open(str(path), 'ab') as f:
+      f.write(_epoch(1)[20:] + _epoch(2))
+    assert capture.update() == 4
+    assert len(capture) == 6
+  with CaptureFile(str(path)) as capture: # from the saved index
+    assert len(capture) == 6
+    assert capture.update() == 0
+
+def test_replaced_by_a_larger_capture(tmp_path):
+  path = tmp_path / 'a.nmea'
+  path.write_bytes(_epoch(0))
+  CaptureFile(str(path)).close()
+  path.write_bytes(b'$GPTXT,other\r\n' + b''.join(_epoch(i, b'GN') for i in range(5)))
+  with CaptureFile(str(path)) as capture:
+    assert len(capture) == 11
+    assert capture.talkers == {b'GP', b'GN'}
+    assert len(list(capture.select(talker=b'GN'))) == 10
+    assert capture.corrupt == 0
+
+def test_truncated_capture(tmp_path):
+  path = tmp_path / 'a.nmea'
+  path.write_bytes(b''.join(_epoch(i) for i in range(5)))
+  CaptureFile(str(path)).close()
+  path.write_bytes(_epoch(0))
+  with CaptureFile(str(path)) as capture:
+    assert len(capture) == 2
+
+def test_corrupt_line_is_skipped(tmp_path):
+  path = tmp_path / 'a.nmea'
+  data = bytearray(b''.join(_epoch(i) for i in range(3)))
+  data[len(_epoch(0)) + 20] ^= 0x01 # a flipped bit in the second RMC
+  path.write_bytes(bytes(data))
+  with CaptureFile(str(path)) as capture:
+    assert len(list(capture.select(topic=b'RMC'))) == 2
+    assert capture.corrupt == 1
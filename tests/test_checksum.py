@@ -0,0 +1,69 @@
+'''validate_checksums: the numpy path against the pure-Python path'''
+
+import functools
+import random
+
+import pytest
+
+import NMEA0183.checksum as checksum
+
+numpy = pytest.importorskip('numpy')
+
+def _sentence(body: bytes) -> bytes:
+  return b'$%s*%02X\r\n' % (body, functools.reduce(lambda a, b: a ^ b, body, 0))
+
+GOOD = _sentence(b'GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,')
+
+def _lines(rng: random.Random, count: int) -> bytes:
+  lines = list()
+  for _ in range(count):
+    body = bytes(rng.choice(b'GPRMCA0123456789.,NSEW') for _ in range(rng.randrange(0, 70)))
+    line = _sentence(body)
+    kind = rng.randrange(8)
+    if kind == 1: # wrong checksum
+      line = line[:-4] + b'%02X' % (int(line[-4:-2], 16) ^ 0x5A) + b'\r\n'
+    elif kind == 2: # lower-case hex
+      line = line[:-4] + line[-4:-2].lower() + b'\r\n'
+    elif kind == 3: # no checksum
+      line = b'$' + body + b'\r\n'
+    elif kind == 4: # no '\r'
+      line = line[:-2] + b'\n'
+    elif kind == 5: # no '$'
+      line = line[1:]
+    elif kind == 6: # empty line
+      line = b'\n'
+    lines.append(line)
+  return b''.join(lines)
+
+def _offsets(data: bytes) -> list[int]:
+  offsets = [0]
+  for i, c in enumerate(data[:-1]):
+    if c == 0x0A:
+      offsets.append(i + 1)
+  return offsets
+
+def _both(data: bytes, required: bool):
+  expected = checksum._validate_python(data, required)
+  assert checksum._validate_numpy(numpy, data, required) == expected
+  assert checksum.validate_checksums(data, required) == expected
+  return expected
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('required', (False, True))
+def test_paths_agree(seed, required):
+  data = _lines(random.Random(seed), 200)
+  mask, bad = _both(data, required)
+  assert len(mask) == data.count(b'\n')
+  assert bad == [offset for offset, ok in zip(_offsets(data), mask) if not ok]
+
+@pytest.mark.parametrize('data', (b'', b'\n', GOOD, GOOD[:-2], GOOD[:-1], b'$', b'$*', b'$\r\n', b'$*00\r\n', GOOD + GOOD[:-2]))
+@pytest.mark.parametrize('required', (False, True))
+def test_edge_cases_agree(data, required):
+  _both(data, required)
+
+def test_results():
+  wrong = GOOD[:-4] + b'%02X' % (int(GOOD[-4:-2], 16) ^ 1) + b'\r\n'
+  unchecked = b'$GPTXT,hello\r\n'
+  data = GOOD + wrong + unchecked + b'noise\r\n' + GOOD[:-2]
+  assert _both(data, False) == ([True, False, True, False, False], [len(GOOD), len(GOOD) * 2 + len(unchecked), len(GOOD) * 2 + len(unchecked) + len(b'noise\r\n')])
+  assert _both(data, True)[0] == [True, False, False, False, False]
@@ -0,0 +1,87 @@
+'''FixBuffer wraparound and windowed queries'''
+
+import datetime
+import math
+
+import pytest
+
+numpy = pytest.importorskip('numpy')
+
+from NMEA0183 import GGA, FixBuffer, try_parse
+
+def _filled(capacity: int, count: int) -> FixBuffer:
+  fixes = FixBuffer(capacity)
+  for i in range(count):
+    fixes.append(1000.0 + i, 55.0 + i * 1e-4, 11.0, speed=float(i), heading=None if i % 3 == 0 else 90.0)
+  return fixes
+
+@pytest.mark.parametrize('count', (0, 1, 4, 5, 6, 12, 23))
+def test_wraparound(count):
+  fixes = _filled(5, count)
+  assert len(fixes) == min(count, 5)
+  expected = [1000.0 + i for i in range(max(0, count - 5), count)]
+  assert fixes.column('time').tolist() == expected
+  assert fixes.column('speed').tolist() == [t - 1000.0 for t in expected]
+  if count:
+    assert fixes.latest().time == expected[-1]
+  else:
+    assert fixes.latest() is None
+
+def test_column_is_a_read_only_view():
+  fixes = _filled(5, 7)
+  column = fixes.column('speed')
+  assert not column.flags.writeable
+  assert not column.flags.owndata
+  with pytest.raises(ValueError):
+    column[0] = 1.0
+
+@pytest.mark.parametrize('seconds', (0, 1, 3, 10, 100))
+def test_windowed_mean(seconds):
+  fixes = _filled(10, 37)
+  speeds = numpy.arange(37.0)[-10:]
+  times = 1000.0 + speeds
+  expected = speeds[times >= times[-1] - seconds]
+  assert fixes.mean('speed', seconds=seconds) == pytest.approx(expected.mean())
+  assert fixes.max('speed', seconds=seconds) == expected.max()
+  assert fixes.min('speed', seconds=seconds) == expected.min()
+
+def test_start_and_end_are_inclusive():
+  fixes = _filled(10, 37)
+  assert fixes.column('time', start=1030.0, end=1032.0).tolist() == [1030.0, 1031.0, 1032.0]
+  assert fixes.column('time', start=2000.0).tolist() == []
+  assert fixes.mean('speed', start=2000.0) is None
+  epoch = datetime.datetime(1970, 1, 1)
+  assert fixes.column('time', start=epoch + datetime.timedelta(seconds=1035)).tolist() == [1035.0, 1036.0]
+
+def test_missing_values_are_ignored():
+  fixes = _filled(10, 12)
+  headings = fixes.column('heading')
+  assert numpy.isnan(headings).sum() == 3 # 3, 6, 9
+  assert fixes.mean('heading') == 90.0
+  assert fixes.mean('altitude') is None
+  assert fixes.percentile('heading', 50) == 90.0
+
+def test_gga_carries_over():
+  fixes = FixBuffer(4)
+  fixes.append(1.0, 55.0, 11.0)
+  status, sentence = try_parse(b'$GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,\r\n')
+  fixes.update_gga(GGA(sentence))
+  fixes.append(2.0, 55.0, 11.0)
+  fixes.append(3.0, 55.0, 11.0)
+  assert fixes.column('altitude').tolist()[1:] == [545.4, 545.4]
+  assert math.isnan(fixes.column('altitude')[0])
+  assert fixes.latest().satellites == 8
+  assert math.isnan(fixes.latest().speed)
+
+def test_distance():
+  fixes = FixBuffer(100)
+  for i in range(11):
+    fixes.append(float(i), 55.0 + i / 60.0, 11.0) # one minute of latitude per fix
+  nautical_mile = 1852.0
+  assert fixes.distance() == pytest.approx(10 * nautical_mile, rel=0.01)
+  assert fixes.distance(seconds=2) == pytest.approx(2 * nautical_mile, rel=0.01)
+  assert FixBuffer(3).distance() == 0.0
+
+def test_capacity_must_be_positive():
+  with pytest.raises(Exception):
+    FixBuffer(0)
@@ -0,0 +1,70 @@
+'''GPXWriter in both modes and the repair of unfinished files'''
+
+import datetime
+import os
+import threading
+
+import pytest
+
+import gpxwriter
+from gpxwriter import GPXWriter
+
+START = datetime.datetime(2021, 7, 1, 12, tzinfo=datetime.timezone.utc)
+
+def _points(filename: str) -> int:
+  with open(filename, 'rb') as f:
+    return f.read().count(b'<trkpt ')
+
+@pytest.mark.parametrize('buffered', (False, True))
+def test_close_renames(tmp_path, buffered):
+  filename = str(tmp_path / 'a.gpx')
+  writer = GPXWriter(filename, sync_interval=None, buffered=buffered)
+  for i in range(10):
+    writer.append(55.0, 11.0 + i * 1e-4, 2.0, START + datetime.timedelta(seconds=i))
+  assert writer.points == 10
+  assert writer.duration == 9.0
+  assert writer.close() == filename
+  assert writer.close() == filename # closing twice is harmless
+  assert os.listdir(str(tmp_path)) == ['a.gpx']
+  assert _points(filename) == 10
+  assert os.path.getsize(filename) == writer.size + len(gpxwriter.FOOTER)
+
+def test_buffered_append_does_no_io(tmp_path):
+  filename = str(tmp_path / 'a.gpx')
+  writer = GPXWriter(filename, buffered=True)
+  writer.append(55.0, 11.0)
+  assert os.listdir(str(tmp_path)) == []
+  writer.flush()
+  assert _points(filename + '.part') == 1
+  writer.append(55.0, 11.0)
+  assert _points(filename + '.part') == 1
+  writer.close()
+  assert _points(filename) == 2
+
+def test_buffered_flush_from_another_thread(tmp_path):
+  filename = str(tmp_path / 'a.gpx')
+  writer = GPXWriter(filename, sync_interval=0.0, buffered=True)
+  stop = threading.Event()
+
+  def flush():
+    while not stop.is_set():
+      writer.flush()
+
+  thread = threading.Thread(target=flush)
+  thread.start()
+  for i in range(5000):
+    writer.append(55.0, 11.0, time=START + datetime.timedelta(seconds=i))
+  stop.set()
+  thread.join()
+  writer.close()
+  assert _points(filename) == 5000
+
+def test_repair(tmp_path):
+  filename = str(tmp_path / 'a.gpx')
+  writer = GPXWriter(filename, buffered=True)
+  for i in range(3):
+    writer.append(55.0, 11.0)
+  writer.flush() # and crash
+  writer._file.close()
+  assert gpxwriter.recover(str(tmp_path)) == [filename]
+  assert _points(filename) == 3
@@ -0,0 +1,40 @@
+'''LazySentence: same view of a line as bytes_to_sentence, decoded on demand'''
+
+import functools
+
+import pytest
+
+from NMEA0183 import RMC, LazySentence, bytes_to_sentence
+
+def _sentence(body: bytes) -> bytes:
+  return b'$%s*%02X\r\n' % (body, functools.reduce(lambda a, b: a ^ b, body, 0))
+
+RAW = _sentence(b'GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W,A')
+
+@pytest.mark.parametrize('buffer', [RAW, bytearray(RAW), memoryview(RAW)])
+def test_matches_bytes_to_sentence(buffer):
+  lazy = LazySentence(buffer)
+  eager = bytes_to_sentence(RAW)
+  assert (lazy.talker, lazy.topic, lazy.msg, lazy.fields, lazy.checksum) == (eager.talker, eager.topic, eager.msg, eager.fields, eager.checksum)
+  assert lazy.raw == RAW and isinstance(lazy.raw, bytes)
+  assert str(lazy) == str(eager)
+  assert RMC(lazy).latitude == RMC(eager).latitude
+
+def test_without_checksum():
+  lazy = LazySentence(b'$GPVTG,054.7,T,034.4,M,005.5,N,010.2,K\r\n')
+  assert not lazy.has_checksum
+  assert lazy.fields[0] == b'054.7'
+  assert lazy.checksum == bytes_to_sentence(b'$GPVTG,054.7,T,034.4,M,005.5,N,010.2,K\r\n').checksum
+
+def test_checksum_is_checked_with_the_fields():
+  raw = bytearray(RAW)
+  raw[10] ^= 1
+  lazy = LazySentence(bytes(raw)) # only the framing is checked here
+  assert (lazy.talker, lazy.topic) == (b'GP', b'RMC')
+  with pytest.raises(Exception, match='Wrong checksum'):
+    lazy.fields
+
+@pytest.mark.parametrize('raw, message', [(RAW[1:], 'Invalid prefix'), (RAW[:-2], 'Invalid suffix')])
+def test_invalid_framing(raw, message):
+  with pytest.raises(Exception, match=message):
+    LazySentence(raw)
@@ -0,0 +1,97 @@
+'''Merge ordering, late sentences and midnight'''
+
+import functools
+import random
+
+from NMEA0183 import Merge, merge, time_of_day
+
+def _sentence(body: bytes) -> bytes:
+  return b'$%s*%02X\r\n' % (body, functools.reduce(lambda a, b: a ^ b, body, 0))
+
+def _rmc(seconds: float) -> bytes:
+  seconds %= 86400
+  hhmmss = b'%02d%02d%05.2f' % (seconds // 3600, seconds % 3600 // 60, seconds % 60)
+  return _sentence(b'GPRMC,%s,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W,A' % hhmmss)
+
+def _txt(text: bytes) -> bytes:
+  return _sentence(b'GPTXT,' + text)
+
+def test_time_of_day():
+  assert time_of_day(_rmc(12 * 3600 + 34 * 60 + 56.5)) == 12 * 3600 + 34 * 60 + 56.5
+  assert time_of_day(_txt(b'x')) is None
+  assert time_of_day(b'$GPRMC,garbage\r\n') is None
+
+def test_jitter_does_not_reorder():
+  rng = random.Random(0)
+  start = 1_000_000.0
+  sources = dict()
+  for name in ('a', 'b', 'c'):
+    offset = rng.random()
+    sources[name] = [(start + offset + i * 0.1 + 0.05 + rng.random() * 0.1, _rmc(3600 + offset + i * 0.1)) for i in range(200)]
+    for i in range(1, len(sources[name])): # a connection keeps the order
+      sources[name][i] = (max(sources[name][i][0], sources[name][i - 1][0]), sources[name][i][1])
+
+  late = list()
+  merged = list(merge(sources, window=0.5, on_late=late.append))
+  assert late == []
+  assert len(merged) == 600
+  assert [item.time for item in merged] == sorted(item.time for item in merged)
+  for name in sources: # in the order of their time within a source
+    seconds = [time_of_day(item.raw) for item in merged if item.source == name]
+    assert seconds == sorted(seconds)
+  # across sources up to the receive jitter, the offsets of the clocks are estimated from it
+  seconds = [time_of_day(item.raw) for item in merged]
+  assert all(b > a - 0.1 for a, b in zip(seconds, seconds[1:]))
+
+def test_late_sentence():
+  late = list()
+  m = Merge(window=0.5, on_late=late.append)
+  m.push('a', _rmc(100.0), 1000.0)
+  m.push('b', _rmc(100.0), 1000.0)
+  m.push('a', _rmc(101.0), 1001.0)
+  assert [item.source for item in m.pop(1001.6)] == ['a', 'b', 'a']
+  m.push('b', _rmc(100.5), 1001.7) # after a later sentence was released
+  assert [item.source for item in late] == ['b']
+  assert m.late == {'a': 0, 'b': 1}
+  assert len(m) == 0
+
+def test_sentences_without_time_follow_their_source():
+  m = Merge(window=0.5)
+  m.push('a', _rmc(100.0), 1000.0)
+  m.push('a', _txt(b'after a'), 1000.05)
+  m.push('b', _rmc(100.02), 1000.02)
+  assert [item.raw for item in m.flush()] == [_rmc(100.0), _txt(b'after a'), _rmc(100.02)]
+
+def test_midnight():
+  m = Merge(window=0.5)
+  received = 1_000_000.0
+  expected = list()
+  for i in range(20): # 23:59:59.0 to 00:00:00.9
+    seconds = 86399.0 + i * 0.1
+    m.push('a', _rmc(seconds), received + i * 0.1)
+    expected.append(_rmc(seconds))
+  items = m.flush()
+  assert [item.raw for item in items] == expected
+  assert abs(items[-1].time - items[0].time - 1.9) < 1e-6
+
+def test_midnight_between_sources():
+  m = Merge(window=0.5)
+  m.push('a', _rmc(86399.9), 1000.0)
+  m.push('b', _rmc(0.1), 1000.25)
+  m.push('a', _rmc(0.0), 1000.1)
+  assert [(item.source, time_of_day(item.raw)) for item in m.flush()] == [('a', 86399.9), ('a', 0.0), ('b', 0.1)]
+
+def test_pop_holds_the_window():
+  m = Merge(window=0.5)
+  m.push('a', _rmc(10.0), 100.0)
+  m.push('a', _rmc(10.4), 100.4)
+  assert m.pop(100.3) == []
+  assert len(m.pop(100.5)) == 1
+  assert len(m) == 1
+
+def test_limit_releases_early():
+  m = Merge(window=10.0, limit=3)
+  for i in range(5):
+    m.push('a', _rmc(10.0 + i), 100.0 + i)
+  assert len(m.pop(0.0)) == 2
+  assert len(m) == 3
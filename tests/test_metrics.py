@@ -0,0 +1,81 @@
+'''metrics: Prometheus text rendering, registry and HTTP endpoint'''
+
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import metrics
+
+def test_counter_with_labels():
+  registry = metrics.Registry()
+  sentences = registry.counter('nmea_sentences_total', 'received sentences', ('talker', 'topic'))
+  sentences.labels(b'GP', b'RMC').inc()
+  sentences.labels(b'GP', b'RMC').inc(2)
+  sentences.labels('GN', 'G"SA').inc(0.5)
+  assert registry.render() == '\n'.join([
+    '# HELP nmea_sentences_total received sentences',
+    '# TYPE nmea_sentences_total counter',
+    'nmea_sentences_total{talker="GP",topic="RMC"} 3',
+    'nmea_sentences_total{talker="GN",topic="G\\"SA"} 0.5']) + '\n'
+
+def test_gauge_function():
+  registry = metrics.Registry()
+  gauge = registry.gauge('queue_length', 'pending items')
+  gauge.set(4)
+  assert 'queue_length 4\n' in registry.render()
+  items = [1, 2]
+  gauge.set_function(lambda: len(items))
+  items.append(3)
+  assert 'queue_length 3\n' in registry.render()
+  gauge.set_function(lambda: 1 / 0) # a broken callback drops the sample only
+  assert registry.render() == '# HELP queue_length pending items\n# TYPE queue_length gauge\n'
+
+def test_histogram_buckets_are_cumulative():
+  registry = metrics.Registry()
+  latency = registry.histogram('handle_seconds', 'handler latency', ('topic',), buckets=(0.1, 1.0))
+  for value in (0.05, 0.1, 0.5, 2.0):
+    latency.labels('RMC').observe(value)
+  assert registry.render().splitlines()[2:] == [
+    'handle_seconds_bucket{topic="RMC",le="0.1"} 2',
+    'handle_seconds_bucket{topic="RMC",le="1"} 3',
+    'handle_seconds_bucket{topic="RMC",le="+Inf"} 4',
+    'handle_seconds_sum{topic="RMC"} 2.65',
+    'handle_seconds_count{topic="RMC"} 4']
+
+def test_registry():
+  registry = metrics.Registry()
+  counter = registry.counter('dropped_total', 'dropped sentences')
+  assert registry.counter('dropped_total', 'dropped sentences') is counter
+  with pytest.raises(Exception, match='registered twice'):
+    registry.gauge('dropped_total', 'dropped sentences')
+  with pytest.raises(Exception, match='Wrong number of labels'):
+    registry.counter('labelled_total', 'labelled', ('topic',)).labels('GP', 'RMC')
+  registry.unregister(counter)
+  assert 'dropped_total' not in registry.render()
+
+def test_serve():
+  registry = metrics.Registry()
+  registry.counter('served_total', 'served').inc()
+  server = metrics.serve(0, registry=registry)
+  try:
+    url = 'http://127.0.0.1:%d' % server.server_address[1]
+    with urllib.request.urlopen(url + '/metrics', timeout=5) as response:
+      assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+      assert response.read().decode('utf-8') == registry.render()
+    with pytest.raises(urllib.error.HTTPError):
+      urllib.request.urlopen(url + '/other', timeout=5)
+  finally:
+    server.shutdown()
+    server.server_close()
+
+def test_dump():
+  registry = metrics.Registry()
+  registry.counter('dumped_total', 'dumped').inc()
+  lines = list()
+  done = threading.Event()
+  stop = metrics.dump(0.01, lambda text: (lines.append(text), done.set()), registry=registry)
+  assert done.wait(5)
+  stop.set()
+  assert lines[0] == 'dumped_total 1'
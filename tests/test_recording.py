@@ -0,0 +1,99 @@
+'''Recorder and Recording, including the recovery after a crash'''
+
+import os
+
+import pytest
+
+from NMEA0183 import Recorder, Recording
+
+def _raw(i: int) -> bytes:
+  return b'$GPTXT,%d\r\n' % i
+
+def _record(filename: str, start: int, count: int, per_chunk: int) -> Recorder:
+  '''a recorder with count records in chunks of per_chunk, not closed'''
+  recorder = Recorder(filename, chunk_size=1 << 30, interval=1e9)
+  for i in range(start, start + count):
+    recorder.append(_raw(i), 'gps%d' % (i % 2), time=i * 1000)
+    if (i - start) % per_chunk == per_chunk - 1:
+      recorder.flush()
+  return recorder
+
+def _crash(recorder: Recorder) -> None:
+  '''stop without writing the last chunk and the index'''
+  recorder._file.close()
+
+def _times(filename: str, **kwargs) -> list[int]:
+  with Recording(filename) as recording:
+    return [record.time // 1000 for record in recording.records(**kwargs)]
+
+def test_roundtrip(tmp_path):
+  filename = str(tmp_path / 'a.rec')
+  with _record(filename, 0, 100, 10):
+    pass
+  with Recording(filename) as recording:
+    assert len(recording) == 100
+    assert len(recording.chunks) == 10
+    records = list(recording.records())
+  assert [r.raw for r in records] == [_raw(i) for i in range(100)]
+  assert [r.source for r in records[:2]] == ['gps0', 'gps1']
+  assert _times(filename, start=25_000, end=35_000) == list(range(25, 35))
+  assert _times(filename, source='gps1')[:3] == [1, 3, 5]
+
+def test_unflushed_records_are_lost(tmp_path):
+  filename = str(tmp_path / 'a.rec')
+  _crash(_record(filename, 0, 25, 10))
+  assert _times(filename) == list(range(20))
+
+def test_truncated_chunk_is_dropped_and_overwritten(tmp_path):
+  filename = str(tmp_path / 'a.rec')
+  _crash(_record(filename, 0, 30, 10))
+  size = os.path.getsize(filename)
+  with open(filename, 'rb') as f:
+    complete = f.read()
+  with open(filename, 'ab') as f: # the crash hit while the third chunk was written
+    f.write(complete[8:8 + (size - 8) // 3][:-7])
+
+  assert _times(filename) == list(range(30))
+  with _record(filename, 30, 10, 10): # continued after the last complete chunk
+    pass
+  assert _times(filename) == list(range(40))
+  with Recording(filename) as recording:
+    assert len(recording.chunks) == 4
+
+def test_truncated_index_is_rebuilt(tmp_path):
+  filename = str(tmp_path / 'a.rec')
+  _record(filename, 0, 20, 10).close()
+  size = os.path.getsize(filename)
+  with open(filename, 'r+b') as f:
+    f.truncate(size - 3)
+  assert _times(filename) == list(range(20))
+  with _record(filename, 20, 10, 10):
+    pass
+  assert _times(filename) == list(range(30))
+
+def test_large_message(tmp_path):
+  filename = str(tmp_path / 'a.rec')
+  raw = b'$GPTXT,' + b'x' * 100_000 + b'\r\n'
+  with Recorder(filename) as recorder:
+    recorder.append(raw, 'burst', time=1)
+  with Recording(filename) as recording:
+    assert [r.raw for r in recording.records()] == [raw]
+
+def test_clock_set_back(tmp_path):
+  filename = str(tmp_path / 'a.rec')
+  with Recorder(filename, chunk_size=1 << 30, interval=1e9) as recorder:
+    for t in (100, 200, 300):
+      recorder.append(_raw(t), time=t * 1000)
+    recorder.flush()
+    for t in (50, 60):
+      recorder.append(_raw(t), time=t * 1000)
+  assert _times(filename, end=150_000) == [100, 50, 60]
+  assert _times(filename, start=250_000) == [300]
+
+def test_not_a_recording(tmp_path):
+  filename = tmp_path / 'a.rec'
+  filename.write_bytes(b'$GPTXT,1\r\n')
+  with pytest.raises(Exception):
+    Recording(str(filename))
+  with pytest.raises(Exception):
+    Recorder(str(filename))
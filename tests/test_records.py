@@ -0,0 +1,49 @@
+'''record(): compact NamedTuple values matching the decoder properties'''
+
+import functools
+import sys
+
+import pytest
+
+from NMEA0183 import GGA, GSA, GSV, RMC, GGARecord, GSARecord, GSVRecord, RMCRecord, Satellite, bytes_to_sentence
+
+def _sentence(body: bytes) -> bytes:
+  return b'$%s*%02X\r\n' % (body, functools.reduce(lambda a, b: a ^ b, body, 0))
+
+def _decoded(body: bytes, decoder):
+  return decoder(bytes_to_sentence(_sentence(body)))
+
+def test_rmc_record():
+  rmc = _decoded(b'GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W,A', RMC)
+  record = rmc.record()
+  assert isinstance(record, RMCRecord)
+  assert record == (rmc.time, rmc.latitude, rmc.longitude, rmc.speed, rmc.heading, None)
+  assert record.latitude == rmc.latitude
+
+def test_gga_record():
+  gga = _decoded(b'GPGGA,115739.00,4158.8441367,N,09147.4416929,W,4,13,0.9,255.747,M,-32.00,M,01,0000', GGA)
+  assert gga.record() == GGARecord(255.747)
+
+def test_gsa_record():
+  gsa = _decoded(b'GPGSA,A,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1', GSA)
+  assert gsa.record() == GSARecord(2.5, 1.3, 2.1)
+
+def test_gsv_record():
+  gsv = _decoded(b'GPGSV,2,1,05,01,40,083,46,02,17,308,,03,,,39,04,22,228,45', GSV)
+  record = gsv.record()
+  assert isinstance(record, GSVRecord)
+  assert (record.numberOfSentences, record.index, record.numberOfSatellites) == (2, 1, 5)
+  assert record.satellites[1] == Satellite(2, 17, 308, None)
+  assert record.satellites[2] == Satellite(3, None, None, 39)
+  with pytest.raises(AttributeError):
+    record.index = 2
+
+def test_keep_sentence():
+  rmc = _decoded(b'GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W,A', RMC)
+  record = rmc.record(keep_sentence=True)
+  assert record.sentence is not None
+  assert record.sentence.raw == _sentence(b'GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W,A')
+
+def test_record_is_smaller_than_decoder():
+  rmc = _decoded(b'GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W,A', RMC)
+  assert sys.getsizeof(rmc.record()) < sys.getsizeof(rmc) + sys.getsizeof(rmc.__dict__)
@@ -0,0 +1,67 @@
+'''decoder registry and the lazily importing package'''
+
+import functools
+import os
+import subprocess
+import sys
+
+import pytest
+
+import NMEA0183
+import NMEA0183.registry
+from NMEA0183 import RMC, bytes_to_sentence
+
+def _sentence(body: bytes) -> bytes:
+  return b'$%s*%02X\r\n' % (body, functools.reduce(lambda a, b: a ^ b, body, 0))
+
+@pytest.fixture
+def decoders(monkeypatch):
+  '''registrations of a test are undone afterwards'''
+  monkeypatch.setattr(NMEA0183.registry, '_decoders', dict(NMEA0183.registry._decoders))
+
+def test_builtin_decoders():
+  assert NMEA0183.find_decoder(b'RMC') is RMC
+  assert NMEA0183.find_decoder('RMC') is RMC
+  assert {b'GGA', b'GSA', b'GSV', b'RMC', b'VTG', b'XDR'} <= set(NMEA0183.decoder_topics())
+  sentence = bytes_to_sentence(_sentence(b'GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W,A'))
+  assert NMEA0183.decode(sentence).latitude == RMC(sentence).latitude
+
+def test_unknown_topic(decoders):
+  assert NMEA0183.find_decoder(b'ZZZ') is None
+  with pytest.raises(Exception, match='No decoder'):
+    NMEA0183.decode(bytes_to_sentence(_sentence(b'GPZZZ,1')))
+
+def test_register_by_name(decoders, tmp_path, monkeypatch):
+  (tmp_path / 'hdt_decoder.py').write_text('def HDT(sentence):\n  return float(sentence.fields[0])\n')
+  monkeypatch.syspath_prepend(str(tmp_path))
+  NMEA0183.register_decoder('HDT', 'hdt_decoder:HDT')
+  assert 'hdt_decoder' not in sys.modules # imported on the first lookup
+  assert b'HDT' in NMEA0183.decoder_topics()
+  assert NMEA0183.decode(bytes_to_sentence(_sentence(b'HEHDT,274.07,T'))) == 274.07
+  assert NMEA0183.find_decoder(b'HDT') is sys.modules['hdt_decoder'].HDT
+  monkeypatch.delitem(sys.modules, 'hdt_decoder')
+
+def test_register_replaces(decoders):
+  NMEA0183.register_decoder(b'RMC', len)
+  assert NMEA0183.find_decoder(b'RMC') is len
+
+def test_lazy_package():
+  # a fresh interpreter, so nothing has been imported by other tests
+  code = '\n'.join([
+    'import sys, NMEA0183',
+    'loaded = lambda: sorted(m for m in sys.modules if m.startswith("NMEA0183."))',
+    'print(loaded())',
+    'NMEA0183.find_decoder(b"GGA")',
+    'print(loaded())',
+    'from NMEA0183 import RMC',
+    'import NMEA0183.GSA as GSA',
+    'print(RMC.__name__, GSA.__name__, NMEA0183.GSA is GSA, "validate_checksums" in dir(NMEA0183))'])
+  result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.dirname(NMEA0183.__file__)))
+  assert result.stdout.splitlines() == [
+    "['NMEA0183.Sentence']",
+    "['NMEA0183.GGA', 'NMEA0183.Sentence', 'NMEA0183.registry', 'NMEA0183.status']",
+    'RMC GSA True True']
+
+def test_unknown_attribute():
+  with pytest.raises(AttributeError):
+    NMEA0183.NoSuchDecoder
@@ -0,0 +1,68 @@
+'''SatelliteStore: GSV groups per talker, GSA in-use flags and deltas'''
+
+import functools
+
+from NMEA0183 import GSA, GSV, SatelliteStore, try_decode, try_parse
+
+def _decoded(body: bytes, decoder):
+  status, sentence = try_parse(b'$%s*%02X\r\n' % (body, functools.reduce(lambda a, b: a ^ b, body, 0)))
+  assert not status
+  status, value = try_decode(sentence, decoder=decoder)
+  assert not status
+  return sentence.talker, value
+
+def _feed(store: SatelliteStore, bodies: list[bytes]) -> list:
+  deltas = list()
+  for body in bodies:
+    if body[2:5] == b'GSV':
+      deltas.extend(store.update_gsv(*_decoded(body, GSV)))
+    else:
+      deltas.extend(store.update_gsa(*_decoded(body, GSA)))
+  return deltas
+
+def _used(store: SatelliteStore) -> dict:
+  return {key: state.used for key, state in store.snapshot().items()}
+
+GPGSV = b'GPGSV,1,1,04,01,40,083,46,02,17,308,41,03,07,344,39,04,22,228,45'
+GLGSV = b'GLGSV,1,1,03,65,40,083,46,66,17,308,41,67,07,344,39'
+
+def test_nmea40_gn_gsa_per_constellation():
+  epoch = [GPGSV, GLGSV, b'GNGSA,A,3,01,02,03,,,,,,,,,,1.0,0.8,0.6', b'GNGSA,A,3,65,66,,,,,,,,,,,1.0,0.8,0.6']
+  store = SatelliteStore()
+  assert len(_feed(store, epoch)) == 7 + 5 # all in view, then the used ones
+  expected = {(b'GP', 1): True, (b'GP', 2): True, (b'GP', 3): True, (b'GP', 4): False, (b'GL', 65): True, (b'GL', 66): True, (b'GL', 67): False}
+  assert _used(store) == expected
+  for _ in range(3): # an unchanged sky changes nothing
+    assert _feed(store, epoch) == []
+  assert _used(store) == expected
+
+def test_nmea41_system_id():
+  store = SatelliteStore()
+  _feed(store, [GPGSV, GLGSV, b'GNGSA,A,3,01,02,,,,,,,,,,,1.0,0.8,0.6,1', b'GNGSA,A,3,01,,,,,,,,,,,,1.0,0.8,0.6,2'])
+  used = _used(store)
+  assert used[b'GP', 1] and used[b'GP', 2] and not used[b'GL', 65]
+
+def test_used_satellite_leaves_the_fix():
+  store = SatelliteStore()
+  _feed(store, [GPGSV, b'GPGSA,A,3,01,02,,,,,,,,,,,1.0,0.8,0.6'])
+  deltas = _feed(store, [b'GPGSA,A,3,01,,,,,,,,,,,,1.0,0.8,0.6'])
+  assert [(d.talker, d.prn, d.state.used) for d in deltas] == [(b'GP', 2, False)]
+
+def test_group_removes_satellites_out_of_view():
+  store = SatelliteStore()
+  _feed(store, [GPGSV, GLGSV])
+  deltas = _feed(store, [b'GPGSV,1,1,02,01,40,083,46,02,17,308,41'])
+  assert sorted((d.prn, d.state) for d in deltas) == [(3, None), (4, None)]
+  assert len(store) == 5 # the GLONASS group is untouched
+
+def test_interleaved_groups():
+  store = SatelliteStore()
+  _feed(store, [b'GPGSV,2,1,05,01,40,083,46,02,17,308,41,03,07,344,39,04,22,228,45', GLGSV, b'GPGSV,2,2,05,05,10,100,30'])
+  assert sorted(prn for _, prn in store.snapshot()) == [1, 2, 3, 4, 5, 65, 66, 67]
+  assert _feed(store, [b'GPGSV,2,1,05,01,40,083,46,02,17,308,41,03,07,344,39,04,22,228,45', b'GPGSV,2,2,05,05,10,100,30']) == []
+
+def test_snr_change_is_a_delta():
+  store = SatelliteStore()
+  _feed(store, [GPGSV])
+  deltas = _feed(store, [GPGSV.replace(b'083,46', b'083,40')])
+  assert [(d.prn, d.state.snr) for d in deltas] == [(1, 40)]
@@ -0,0 +1,33 @@
+'''SentenceTemplate: same lines as building a Sentence per value'''
+
+import pytest
+
+from NMEA0183 import Sentence, SentenceTemplate, bytes_to_sentence
+
+def test_encode_matches_sentence():
+  xdr = SentenceTemplate('II', 'XDR', ['C', '%.2f', 'C', 'TempAir'])
+  for value in (19.52, -3.0, 0.004):
+    assert xdr.encode(value) == Sentence('II', 'XDR', ['C', '%.2f' % value, 'C', 'TempAir']).raw
+
+def test_placeholders_anywhere():
+  template = SentenceTemplate(b'GP', b'GGA', ['%s', '%.4f', 'N', '%09.4f', 'E', '%d', '08', '0.9', '%.1f', 'M', '', '', '', ''])
+  line = template.encode(b'123519.00', 4807.038, 1131.0, 1, 545.4)
+  assert line == Sentence('GP', 'GGA', ['123519.00', '4807.0380', 'N', '1131.0000', 'E', '1', '08', '0.9', '545.4', 'M', '', '', '', '']).raw
+  assert bytes_to_sentence(line).fields[3] == b'1131.0000'
+
+def test_percent_in_constant_fields():
+  template = SentenceTemplate('II', 'XDR', ['H', '%.1f', 'P', 'Humidity 100%'])
+  assert template.encode(50.0) == Sentence('II', 'XDR', ['H', '50.0', 'P', 'Humidity 100%']).raw
+
+def test_without_placeholders():
+  template = SentenceTemplate('GP', 'TXT', ['01', '01', '02', 'hello'])
+  assert template.encode() == Sentence('GP', 'TXT', ['01', '01', '02', 'hello']).raw
+  with pytest.raises(Exception, match='no placeholders'):
+    template.encode(1)
+
+def test_encode_many():
+  xdr = SentenceTemplate('II', 'XDR', ['C', '%.2f', 'C', 'TempAir'])
+  records = [(19.52,), (20.0,), (-1.25,)]
+  assert xdr.encode_many(records) == b''.join(xdr.encode(*values) for values in records)
+  assert xdr.encode_many([]) == b''
+  assert (xdr.talker, xdr.topic) == (b'II', b'XDR')
@@ -0,0 +1,22 @@
+'''ShardedServer: the topics sharing a store and fix buffer stay on one worker'''
+
+import pytest
+
+pytest.importorskip('zmq')
+
+from server import ShardedServer
+
+@pytest.mark.parametrize('workers', [1, 2, 3, 8])
+def test_stateful_topics_stay_together(workers: int):
+  sharded = ShardedServer(workers, 'topic')
+  sharded.connect('tcp://localhost:5555')
+  shards = sharded._shards()
+  assert all(set(ShardedServer.STATEFUL) <= set(topics) for _, topics, _ in shards[:1])
+  assert not any(set(ShardedServer.STATEFUL) & set(topics) for _, topics, _ in shards[1:])
+  assert [report for _, _, report in shards] == [True] + [False] * (len(shards) - 1)
+
+def test_source_shards():
+  sharded = ShardedServer(2, 'source')
+  for addr in ('tcp://a:1', 'tcp://b:1', 'tcp://c:1'):
+    sharded.connect(addr)
+  assert [addrs for addrs, _, _ in sharded._shards()] == [['tcp://a:1', 'tcp://c:1'], ['tcp://b:1']]
@@ -0,0 +1,60 @@
+'''SkyplotRenderer: bursts collapse into one frame at most max_fps'''
+
+import time
+
+import pytest
+
+pytest.importorskip('matplotlib')
+
+from NMEA0183.plot_gsv import SkyplotRenderer
+
+SATELLITES = [(1, 40, 83, 46), (2, 17, 308, 41), (3, 7, 344, None), (4, None, None, 45)]
+
+def _timed(renderer: SkyplotRenderer) -> list:
+  '''record the monotonic time of every rendered frame'''
+  times = list()
+  render = renderer.render
+  def timed(data, when):
+    render(data, when)
+    times.append(time.monotonic())
+  renderer.render = timed
+  return times
+
+def test_render(tmp_path):
+  path = tmp_path / 'skyplot.png'
+  renderer = SkyplotRenderer(str(path))
+  renderer.render(SATELLITES, 'now')
+  assert path.read_bytes()[:8] == b'\x89PNG\r\n\x1a\n'
+  assert renderer.frames == 1
+  assert [p.name for p in tmp_path.iterdir()] == ['skyplot.png'] # no temporary files left
+
+def test_burst_collapses(tmp_path):
+  with SkyplotRenderer(str(tmp_path / 'skyplot.png'), max_fps=2.0) as renderer:
+    renderer.start()
+    for i in range(100):
+      renderer.submit(SATELLITES, i)
+  assert renderer.submitted == 100
+  assert 1 <= renderer.frames <= 3 # the first frame, maybe one throttled frame and the pending one on close
+
+def test_frame_rate_is_limited(tmp_path):
+  with SkyplotRenderer(str(tmp_path / 'skyplot.png'), max_fps=4.0) as renderer:
+    times = _timed(renderer)
+    renderer.start()
+    deadline = time.monotonic() + 1.0
+    while time.monotonic() < deadline:
+      renderer.submit(SATELLITES, 'now')
+      time.sleep(0.01)
+  # the frame pending on close is rendered without waiting
+  times = times[:-1]
+  assert len(times) >= 2
+  assert min(b - a for a, b in zip(times, times[1:])) >= 0.25 - 0.01
+
+def test_close_renders_the_pending_frame(tmp_path):
+  renderer = SkyplotRenderer(str(tmp_path / 'skyplot.png'), max_fps=0.1)
+  renderer.start()
+  renderer.submit(SATELLITES, 1)
+  while renderer.frames < 1:
+    time.sleep(0.01)
+  renderer.submit(SATELLITES, 2) # throttled for 10 s
+  renderer.close(timeout=5.0)
+  assert renderer.frames == 2
@@ -0,0 +1,68 @@
+'''try_parse and try_decode report every failure as a Status'''
+
+import functools
+
+import pytest
+
+import NMEA0183
+from NMEA0183 import LazySentence, Status, try_decode, try_parse
+
+def _sentence(body: bytes) -> bytes:
+  return b'$%s*%02X\r\n' % (body, functools.reduce(lambda a, b: a ^ b, body, 0))
+
+RMC = b'GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W,A'
+GGA = b'GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,'
+VTG = b'GPVTG,054.7,T,034.4,M,005.5,N,010.2,K,A'
+
+def _parsed(body: bytes) -> NMEA0183.Sentence:
+  status, sentence = try_parse(_sentence(body))
+  assert status == Status.OK
+  return sentence
+
+@pytest.mark.parametrize('raw, status', (
+  (_sentence(RMC), Status.OK),
+  (b'$GPTXT,no checksum\r\n', Status.OK),
+  (b'GPRMC,1\r\n', Status.MALFORMED),
+  (b'$GP\r\n', Status.MALFORMED),
+  (_sentence(RMC)[:-2], Status.TRUNCATED),
+  (_sentence(RMC)[:-4] + b'00\r\n', Status.BAD_CHECKSUM),
+))
+def test_parse(raw, status):
+  assert try_parse(raw).status == status
+
+@pytest.mark.parametrize('body, status', (
+  (RMC, Status.OK),
+  (GGA, Status.OK),
+  (VTG, Status.OK),
+  (b'IIXDR,C,19.52,C,TempAir', Status.OK),
+  (RMC.replace(b',A,4807', b',V,4807'), Status.VOID), # receiver warning
+  (RMC[:-2] + b',N', Status.VOID), # mode: data not valid
+  (GGA.replace(b',E,1,08', b',E,0,08'), Status.VOID), # no fix
+  (b'GPRMC,123519,A,4807.038', Status.TRUNCATED),
+  (b'GPGGA,123519,4807.038,N', Status.TRUNCATED),
+  (b'IIXDR,C,19.52,C', Status.TRUNCATED),
+  (GGA.replace(b',545.4,', b',high,'), Status.INVALID),
+  (RMC.replace(b'022.4', b'fast'), Status.INVALID),
+  (b'GPZZZ,1,2', Status.NO_DECODER),
+))
+def test_decode(body, status):
+  result = try_decode(_parsed(body))
+  assert result.status == status
+  assert result.ok == (status == Status.OK)
+  assert (result.value is not None) == result.ok
+
+def test_wrong_topic():
+  assert try_decode(_parsed(GGA), b'RMC').status == Status.WRONG_TOPIC
+  assert try_decode(_parsed(GGA), b'GGA').status == Status.OK
+
+def test_explicit_decoder():
+  status, rmc = try_decode(_parsed(RMC), decoder=NMEA0183.RMC)
+  assert status == Status.OK
+  assert rmc.speed == 22.4
+
+def test_lazy_sentence_bad_checksum():
+  raw = _sentence(RMC)[:-4] + b'00\r\n'
+  assert try_decode(LazySentence(raw), decoder=NMEA0183.RMC).status == Status.BAD_CHECKSUM
+
+def test_failures_are_shared():
+  assert try_decode(_parsed(b'GPZZZ,1')) is try_decode(_parsed(b'GPZZZ,2'))
@@ -0,0 +1,65 @@
+'''StreamParser framing, resynchronisation and counters'''
+
+import functools
+
+from NMEA0183 import Status, StreamParser
+
+def _sentence(body: bytes) -> bytes:
+  return b'$%s*%02X\r\n' % (body, functools.reduce(lambda a, b: a ^ b, body, 0))
+
+RMC = _sentence(b'GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W,A')
+GGA = _sentence(b'GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,')
+
+def test_chunks_of_any_size():
+  data = RMC + GGA + RMC
+  for size in (1, 2, 7, len(data)):
+    parser = StreamParser()
+    sentences = list()
+    for i in range(0, len(data), size):
+      sentences.extend(parser.feed(data[i:i + size]))
+    assert [s.topic for s in sentences] == [b'RMC', b'GGA', b'RMC']
+    assert parser.sentences == 3
+    assert parser.errors == 0
+    assert parser.discarded == 0
+
+def test_noise_between_sentences():
+  parser = StreamParser()
+  sentences = parser.feed(b'\x00\xff' + RMC + b'noise' + GGA + b'tail')
+  assert [s.topic for s in sentences] == [b'RMC', b'GGA']
+  assert parser.discarded == len(b'\x00\xff') + len(b'noise') + len(b'tail')
+
+def test_truncated_sentence_resyncs_on_next_start():
+  parser = StreamParser()
+  truncated = RMC[:30]
+  sentences = parser.feed(truncated + GGA)
+  assert [s.topic for s in sentences] == [b'GGA']
+  assert parser.discarded == len(truncated)
+  assert parser.errors == 0
+
+def test_rejected_lines_are_reported():
+  reported = list()
+  parser = StreamParser(on_error=lambda status, line: reported.append((status, line)))
+  bad = RMC[:-4] + (b'00' if RMC[-4:-2] != b'00' else b'01') + b'\r\n' # wrong checksum
+  sentences = parser.feed(bad + GGA)
+  assert [s.topic for s in sentences] == [b'GGA']
+  assert parser.errors == 1
+  assert reported == [(Status.BAD_CHECKSUM, bad)]
+
+def test_partial_sentence_is_carried_over():
+  parser = StreamParser()
+  assert parser.feed(RMC[:20]) == []
+  assert [s.topic for s in parser.feed(RMC[20:])] == [b'RMC']
+  assert parser.discarded == 0
+
+def test_overlong_partial_is_dropped():
+  parser = StreamParser(max_length=16)
+  assert parser.feed(b'$' + b'x' * 40) == []
+  assert parser.discarded == 41
+  assert [s.topic for s in parser.feed(RMC)] == [b'RMC']
+
+def test_reset_counts_the_buffer():
+  parser = StreamParser()
+  parser.feed(RMC[:10])
+  parser.reset()
+  assert parser.discarded == 10
+  assert [s.topic for s in parser.feed(GGA)] == [b'GGA']
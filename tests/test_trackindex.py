@@ -0,0 +1,103 @@
+'''TrackIndex queries against a brute-force scan of the same points'''
+
+import datetime
+import os
+
+import pytest
+
+numpy = pytest.importorskip('numpy')
+
+import trackindex
+from gpxwriter import GPXWriter
+
+def _archive(seed: int = 0, files: int = 6, points: int = 300):
+  '''{name: (latitude, longitude, elevation, time)} of random walks, some near the antimeridian'''
+  rng = numpy.random.default_rng(seed)
+  archive = dict()
+  t = 1_600_000_000.0
+  for i in range(files):
+    latitude = 55.0 + rng.normal(0, 0.01, points).cumsum()
+    longitude = 11.0 + rng.normal(0, 0.01, points).cumsum()
+    if i % 3 == 2: # eastwards over the antimeridian
+      longitude += 168.9 + numpy.linspace(0.0, 0.2, points)
+    longitude = (longitude + 180.0) % 360.0 - 180.0
+    elevation = rng.normal(2.0, 1.0, points)
+    time = t + numpy.arange(points, dtype=numpy.float64)
+    time[rng.random(points) < 0.05] = numpy.nan
+    archive['%d.gpx' % i] = (latitude, longitude, elevation, time)
+    t += points + 600
+  return archive
+
+@pytest.fixture(scope='module')
+def indexed():
+  archive = _archive()
+  index = trackindex.TrackIndex(':memory:', block=16)
+  for name, columns in archive.items():
+    index.add_points(name, [(0, 0, *columns)])
+  yield index, archive
+  index.close()
+
+def _keys(matches) -> list[tuple[str, int]]:
+  return [(match.file, match.index) for match in matches]
+
+def _brute(archive, select) -> list[tuple[str, int]]:
+  return [(name, int(i)) for name in sorted(archive) for i in numpy.flatnonzero(select(*archive[name]))]
+
+def _between(time, start, end):
+  return (time >= start) & (time <= end)
+
+@pytest.mark.parametrize('radius', (100.0, 1000.0, 5000.0, 50000.0))
+def test_near(indexed, radius):
+  index, archive = indexed
+  for name in ('0.gpx', '2.gpx'):
+    latitude, longitude = float(archive[name][0][150]), float(archive[name][1][150])
+    expected = _brute(archive, lambda lat, lon, ele, t: trackindex._haversine(lat, lon, latitude, longitude) <= radius)
+    assert _keys(index.near(latitude, longitude, radius)) == expected
+    assert expected
+
+def test_near_during(indexed):
+  index, archive = indexed
+  latitude, longitude = float(archive['1.gpx'][0][0]), float(archive['1.gpx'][1][0])
+  start, end = archive['1.gpx'][3][0] - 100, archive['1.gpx'][3][0] + 100
+  expected = _brute(archive, lambda lat, lon, ele, t: (trackindex._haversine(lat, lon, latitude, longitude) <= 20000) & _between(t, start, end))
+  assert _keys(index.near(latitude, longitude, 20000, start, end)) == expected
+
+@pytest.mark.parametrize('start, end', ((1_600_000_100.0, 1_600_000_200.0), (1_600_000_250.0, 1_600_001_200.0), (0.0, 1.0)))
+def test_during(indexed, start, end):
+  index, archive = indexed
+  expected = _brute(archive, lambda lat, lon, ele, t: _between(t, start, end))
+  assert _keys(index.during(start, end)) == expected
+  epoch = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+  assert _keys(index.during(epoch + datetime.timedelta(seconds=start), epoch + datetime.timedelta(seconds=end))) == expected
+
+def test_during_everything(indexed):
+  index, archive = indexed
+  assert len(index.during()) == len(index) == sum(len(columns[0]) for columns in archive.values())
+
+def test_box_across_the_antimeridian(indexed):
+  index, archive = indexed
+  expected = _brute(archive, lambda lat, lon, ele, t: (lat >= 54.0) & (lat <= 56.0) & ((lon >= 179.95) | (lon <= -179.95)))
+  assert _keys(index.box(54.0, 179.95, 56.0, -179.95)) == expected
+  assert expected
+
+def test_match_values(indexed):
+  index, archive = indexed
+  latitude, longitude, elevation, time = archive['0.gpx']
+  for match in index.near(float(latitude[10]), float(longitude[10]), 1.0):
+    assert (match.latitude, match.longitude, match.elevation) == (latitude[match.index], longitude[match.index], elevation[match.index])
+    assert match.time is None if numpy.isnan(time[match.index]) else match.time.timestamp() == time[match.index]
+
+def test_gpx_files(tmp_path):
+  directory = str(tmp_path)
+  start = datetime.datetime(2021, 7, 1, 12, tzinfo=datetime.timezone.utc)
+  with GPXWriter(os.path.join(directory, 'a.gpx'), sync_interval=None) as writer:
+    for i in range(100):
+      writer.append(55.0 + i * 1e-4, 11.0, 2.0, start + datetime.timedelta(seconds=i))
+  with trackindex.TrackIndex(os.path.join(directory, 'tracks.db'), block=8) as index:
+    assert index.update([directory]) == 1
+    assert index.update([directory]) == 0 # unchanged
+    assert index.files() == ['a.gpx']
+    matches = index.during(start + datetime.timedelta(seconds=10), start + datetime.timedelta(seconds=19))
+    assert [match.index for match in matches] == list(range(10, 20))
+    assert index.remove('a.gpx')
+    assert len(index) == 0
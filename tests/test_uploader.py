@@ -0,0 +1,115 @@
+'''Uploader batching, backoff and rejected files, against a fake session'''
+
+import gzip
+import os
+
+import pytest
+
+pytest.importorskip('requests')
+
+from uploader import Uploader, merge_gpx
+
+def _gpx(name: str) -> bytes:
+  return (b'<?xml version="1.0"?>\n<gpx version="1.1">\n  <trk><name>%s</name><trkseg>\n'
+    b'      <trkpt lat="55.0" lon="11.0"></trkpt>\n    </trkseg></trk>\n</gpx>\n' % name.encode('ascii'))
+
+class _Response:
+  def __init__(self, status_code: int):
+    self.status_code = status_code
+    self.ok = status_code < 400
+    self.url = 'http://test/'
+
+class _Session:
+  '''answers every POST with respond(names of the tracks in the body)'''
+
+  def __init__(self, respond):
+    self._respond = respond
+    self.posts = list()
+
+  def post(self, url, data, headers, timeout):
+    if headers.get('Content-Encoding') == 'gzip':
+      data = gzip.decompress(data)
+    names = [part.split(b'</name>')[0].decode('ascii') for part in data.split(b'<name>')[1:]]
+    self.posts.append(names)
+    return _Response(self._respond(names))
+
+  def close(self):
+    pass
+
+@pytest.fixture
+def directory(tmp_path):
+  for name in ('pending', 'uploaded'):
+    os.makedirs(str(tmp_path / name))
+  return tmp_path
+
+def _uploader(directory, respond, batch_size: int = 8, files=('a', 'b', 'c', 'd')) -> Uploader:
+  for name in files:
+    (directory / 'pending' / ('%s.gpx' % name)).write_bytes(_gpx(name))
+  uploader = Uploader('http://test', str(directory / 'pending'), str(directory / 'uploaded'), batch_size=batch_size, rejected=str(directory / 'rejected'))
+  uploader._session = _Session(respond)
+  return uploader
+
+def _names(directory, name: str) -> list[str]:
+  path = directory / name
+  return sorted(os.listdir(str(path))) if path.exists() else []
+
+def test_batches(directory):
+  uploader = _uploader(directory, lambda names: 200, batch_size=3)
+  assert uploader.upload() == 4
+  assert uploader._session.posts == [['a', 'b', 'c'], ['d']]
+  assert _names(directory, 'uploaded') == ['a.gpx', 'b.gpx', 'c.gpx', 'd.gpx']
+  assert uploader.requests == 2
+
+def test_merge_keeps_every_track():
+  merged = merge_gpx([_gpx('a'), _gpx('b')])
+  assert merged.count(b'<trk>') == 2
+  assert merged.endswith(b'</gpx>\n')
+
+def test_rejected_file_does_not_block_the_others(directory):
+  uploader = _uploader(directory, lambda names: 422 if 'b' in names else 200)
+  assert uploader.upload() == 3
+  assert uploader._session.posts == [['a', 'b', 'c', 'd'], ['a'], ['b'], ['c'], ['d']]
+  assert _names(directory, 'uploaded') == ['a.gpx', 'c.gpx', 'd.gpx']
+  assert _names(directory, 'rejected') == ['b.gpx']
+  assert uploader.rejected == 1
+  assert uploader.failures == 0
+  assert uploader.ready()
+
+def test_server_error_backs_off(directory):
+  uploader = _uploader(directory, lambda names: 503)
+  assert uploader.upload() == 0
+  assert uploader._session.posts == [['a', 'b', 'c', 'd']] # not file by file
+  assert uploader.failures == 1
+  assert not uploader.ready()
+  assert uploader.upload() == 0 # still backing off
+  assert len(uploader._session.posts) == 1
+  assert _names(directory, 'pending') == ['a.gpx', 'b.gpx', 'c.gpx', 'd.gpx']
+
+def test_server_error_while_retrying_one_by_one(directory):
+  answers = iter((400, 200, 503))
+  uploader = _uploader(directory, lambda names: next(answers))
+  assert uploader.upload() == 1
+  assert _names(directory, 'uploaded') == ['a.gpx']
+  assert _names(directory, 'rejected') == []
+  assert uploader.failures == 1
+
+def test_truncated_file_is_rejected(directory):
+  uploader = _uploader(directory, lambda names: 200)
+  path = directory / 'pending' / 'b.gpx'
+  path.write_bytes(_gpx('b')[:-20])
+  assert uploader.upload() == 3
+  assert uploader._session.posts == [['a', 'c', 'd']]
+  assert _names(directory, 'rejected') == ['b.gpx']
+
+def test_uncompressed_after_415(directory):
+  uploader = _uploader(directory, lambda names: 200, files=('a',))
+  uploader._session.post = _only_uncompressed(uploader._session.post)
+  assert uploader.upload() == 1
+  assert not uploader._compress
+
+def _only_uncompressed(post):
+  def wrapped(url, data, headers, timeout):
+    if headers.get('Content-Encoding') == 'gzip':
+      return _Response(415)
+    return post(url, data, headers, timeout)
+  return wrapped
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+'''
+Spatial and temporal index of recorded tracks
+
+Answers "when were we within 500 m of this harbour?" without reparsing the
+GPX files. The track points are kept in an SQLite database in blocks of
+consecutive points of one segment; an R-tree holds the bounding box and
+time range of every block. A query reads only the blocks whose box meets
+it and filters their points exactly:
+
+  with TrackIndex('tracks.db') as index:
+    index.add('pending/2021-07-01 12:00:00.gpx')
+    for match in index.near(54.3230, 10.1394, 500):
+      ...
+
+Files are referenced by name, so they can move from pending/ to uploaded/.
+
+  ./trackindex.py --update pending uploaded --near 54.3230 10.1394 500
+'''
+
+import argparse
+import datetime
+import os
+import sqlite3
+from typing import Iterable, NamedTuple, Optional, Union
+
+import numpy
+
+from gpxreader import GPXReader
+from gpxstats import EARTH_RADIUS, ONE_DEGREE
+
+Time = Union[datetime.datetime, float] # datetime (naive = UTC) or seconds since the epoch
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL, size INTEGER, mtime REAL, points INTEGER);
+CREATE TABLE IF NOT EXISTS blocks (id INTEGER PRIMARY KEY, file INTEGER NOT NULL, track INTEGER, segment INTEGER, first INTEGER, latitude BLOB, longitude BLOB, elevation BLOB, time BLOB);
+CREATE INDEX IF NOT EXISTS blocks_file ON blocks (file);
+CREATE VIRTUAL TABLE IF NOT EXISTS boxes USING rtree(id, south, north, west, east, start, end);
+'''
+
+class Match(NamedTuple):
+  file: str # name of the GPX file, without directory
+  track: int
+  segment: int
+  index: int # of the point in its segment
+  latitude: float
+  longitude: float
+  elevation: Optional[float]
+  time: Optional[datetime.datetime]
+
+class Visit(NamedTuple):
+  '''consecutive matches of one segment'''
+  file: str
+  track: int
+  segment: int
+  start: Optional[datetime.datetime]
+  end: Optional[datetime.datetime]
+  points: int
+
+def _seconds(time: Optional[Time], default: float) -> float:
+  if time is None:
+    return default
+  if isinstance(time, datetime.datetime):
+    if time.tzinfo is None:
+      time = time.replace(tzinfo=datetime.timezone.utc)
+    return time.timestamp()
+  return time
+
+def _longitudes(west: float, east: float) -> list[tuple[float, float]]:
+  '''longitude ranges of a box, two if it crosses the antimeridian'''
+  if west > east:
+    return [(west, 180.0), (-180.0, east)]
+  return [(west, east)]
+
+def _haversine(latitude: numpy.ndarray, longitude: numpy.ndarray, latitude0: float, longitude0: float) -> numpy.ndarray:
+  lat = numpy.radians(latitude)
+  lat0 = numpy.radians(latitude0)
+  a = numpy.sin((lat - lat0) / 2) ** 2 + numpy.cos(lat) * numpy.cos(lat0) * numpy.sin(numpy.radians(longitude - longitude0) / 2) ** 2
+  return EARTH_RADIUS * 2 * numpy.arcsin(numpy.sqrt(a))
+
+def visits(matches: Iterable[Match]) -> list[Visit]:
+  '''runs of matches of the same segment and consecutive points'''
+  result = list()
+  previous = None
+  for match in matches:
+    if previous is not None and (match.file, match.track, match.segment) == previous[:3] and match.index == previous.index + 1:
+      visit = result[-1]
+      result[-1] = visit._replace(end=match.time or visit.end, points=visit.points + 1)
+    else:
+      result.append(Visit(match.file, match.track, match.segment, match.time, match.time, 1))
+    previous = match
+  return result
+
+class TrackIndex:
+  '''
+  Index of the track points of GPX files. Blocks of block points are the
+  unit of the R-tree; smaller blocks make queries read fewer points, larger
+  ones make the index smaller and faster to build. An index may be used
+  from another thread than the one that opened it, by one thread at a time.
+  '''
+
+  def __init__(self, filename: str = 'tracks.db', block: int = 64):
+    self._block = block
+    self._db = sqlite3.connect(filename, check_same_thread=False)
+    self._db.executescript(_SCHEMA)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def close(self) -> None:
+    self._db.close()
+
+  def __len__(self) -> int:
+    return self._db.execute('SELECT COALESCE(SUM(points), 0) FROM files').fetchone()[0]
+
+  def files(self) -> list[str]:
+    return [name for name, in self._db.execute('SELECT name FROM files ORDER BY name')]
+
+  def add(self, filename: str) -> int:
+    '''index (again) the points of a GPX file; returns their number'''
+    with GPXReader(filename) as reader:
+      segments = [(track, segment, points) for track, segment, points in reader.segments()]
+    stat = os.stat(filename)
+    return self.add_points(os.path.basename(filename), ((track, segment, points.latitude, points.longitude, points.elevation, points.time) for track, segment, points in segments), stat.st_size, stat.st_mtime)
+
+  def add_points(self, name: str, segments: Iterable[tuple[int, int, numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray]], size: Optional[int] = None, mtime: Optional[float] = None) -> int:
+    '''
+    index segments of (track, segment, latitude, longitude, elevation, time
+    in seconds) under the file name name, NaN where elevation or time is
+    missing
+    '''
+    with self._db:
+      self._remove(name)
+      file = self._db.execute('INSERT INTO files (name, size, mtime, points) VALUES (?, ?, ?, 0)', (name, size, mtime)).lastrowid
+      count = 0
+      for track, segment, latitude, longitude, elevation, time in segments:
+        columns = [numpy.ascontiguousarray(column, dtype=numpy.float64) for column in (latitude, longitude, elevation, time)]
+        for first in range(0, len(columns[0]), self._block):
+          lat, lon, ele, t = (column[first:first + self._block] for column in columns)
+          rowid = self._db.execute('INSERT INTO blocks (file, track, segment, first, latitude, longitude, elevation, time) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (file, track, segment, first, lat.tobytes(), lon.tobytes(), ele.tobytes(), t.tobytes())).lastrowid
+          known = t[~numpy.isnan(t)]
+          start, end = (float(known.min()), float(known.max())) if len(known) else (float('-inf'), float('inf'))
+          self._db.execute('INSERT INTO boxes VALUES (?, ?, ?, ?, ?, ?, ?)', (rowid, float(lat.min()), float(lat.max()), float(lon.min()), float(lon.max()), start, end))
+        count += len(columns[0])
+      self._db.execute('UPDATE files SET points = ? WHERE id = ?', (count, file))
+    return count
+
+  def _remove(self, name: str) -> bool:
+    row = self._db.execute('SELECT id FROM files WHERE name = ?', (name,)).fetchone()
+    if row is None:
+      return False
+    self._db.execute('DELETE FROM boxes WHERE id IN (SELECT id FROM blocks WHERE file = ?)', row)
+    self._db.execute('DELETE FROM blocks WHERE file = ?', row)
+    self._db.execute('DELETE FROM files WHERE id = ?', row)
+    return True
+
+  def remove(self, name: str) -> bool:
+    '''drop a file from the index; returns whether it was indexed'''
+    with self._db:
+      return self._remove(os.path.basename(name))
+
+  def update(self, directories: Iterable[str]) -> int:
+    '''index the GPX files in directories that are new or changed; returns their number'''
+    known = {name: (size, mtime) for name, size, mtime in self._db.execute('SELECT name, size, mtime FROM files')}
+    added = 0
+    for directory in directories:
+      for name in sorted(os.listdir(directory)):
+        filename = os.path.join(directory, name)
+        if not name.endswith('.gpx') or not os.path.isfile(filename):
+          continue
+        stat = os.stat(filename)
+        if known.get(name) == (stat.st_size, stat.st_mtime):
+          continue
+        self.add(filename)
+        known[name] = (stat.st_size, stat.st_mtime)
+        added += 1
+    return added
+
+  def _blocks(self, south: float, west: float, north: float, east: float, start: float, end: float) -> list[tuple]:
+    '''(file name, track, segment, first point, latitude, longitude, elevation, time) of the blocks that meet a box'''
+    rows = dict() # block id -> row; a block on the antimeridian meets both halves of a box that crosses it
+    for low, high in _longitudes(west, east):
+      for rowid, *row in self._db.execute('''SELECT blocks.id, files.name, blocks.track, blocks.segment, blocks.first, blocks.latitude, blocks.longitude, blocks.elevation, blocks.time
+          FROM boxes JOIN blocks ON blocks.id = boxes.id JOIN files ON files.id = blocks.file
+          WHERE boxes.north >= ? AND boxes.south <= ? AND boxes.east >= ? AND boxes.west <= ? AND boxes.end >= ? AND boxes.start <= ?''', (south, north, low, high, start, end)):
+        rows[rowid] = row
+    return sorted(rows.values(), key=lambda row: row[:4])
+
+  def _query(self, south: float, west: float, north: float, east: float, start: Optional[Time], end: Optional[Time], near: Optional[tuple[float, float, float]] = None) -> list[Match]:
+    lower = _seconds(start, float('-inf'))
+    upper = _seconds(end, float('inf'))
+    timed = start is not None or end is not None
+    matches = list()
+    append = matches.append
+    new = tuple.__new__
+    fromtimestamp = datetime.datetime.fromtimestamp
+    utc = datetime.timezone.utc
+    for name, track, segment, first, *columns in self._blocks(south, west, north, east, lower, upper):
+      lat, lon, ele, t = (numpy.frombuffer(column, dtype=numpy.float64) for column in columns)
+      if west <= east:
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+      else:
+        inside = (lat >= south) & (lat <= north) & ((lon >= west) | (lon <= east))
+      if timed:
+        inside &= (t >= lower) & (t <= upper) # NaN times never match
+      if near is not None:
+        inside &= _haversine(lat, lon, near[0], near[1]) <= near[2]
+      index = numpy.flatnonzero(inside)
+      if not len(index):
+        continue
+      # Match() and a call per point cost more than the query for large results
+      for i, la, lo, el, ti in zip((index + first).tolist(), lat[index].tolist(), lon[index].tolist(), ele[index].tolist(), t[index].tolist()):
+        append(new(Match, (name, track, segment, i, la, lo, None if el != el else el, fromtimestamp(ti, utc) if ti == ti else None)))
+    return matches
+
+  def box(self, south: float, west: float, north: float, east: float, start: Optional[Time] = None, end: Optional[Time] = None) -> list[Match]:
+    '''points in a box (west > east crosses the antimeridian) and time range, in file order'''
+    return self._query(south, west, north, east, start, end)
+
+  def during(self, start: Optional[Time] = None, end: Optional[Time] = None) -> list[Match]:
+    '''points in a time range, in file order'''
+    return self._query(-90.0, -180.0, 90.0, 180.0, start, end)
+
+  def near(self, latitude: float, longitude: float, radius: float, start: Optional[Time] = None, end: Optional[Time] = None) -> list[Match]:
+    '''points within radius metres of a position and in a time range, in file order'''
+    dlat = radius / ONE_DEGREE
+    south = max(-90.0, latitude - dlat)
+    north = min(90.0, latitude + dlat)
+    cos = min(numpy.cos(numpy.radians(south)), numpy.cos(numpy.radians(north)))
+    if cos <= 0 or radius / ONE_DEGREE / cos >= 180.0: # a pole in reach
+      west, east = -180.0, 180.0
+    else:
+      dlon = dlat / cos
+      west = (longitude - dlon + 180.0) % 360.0 - 180.0
+      east = (longitude + dlon + 180.0) % 360.0 - 180.0
+    return self._query(south, west, north, east, start, end, (latitude, longitude, radius))
+
+def _time(text: str) -> datetime.datetime:
+  return datetime.datetime.fromisoformat(text)
+
+if __name__ == '__main__':
+  PARSER = argparse.ArgumentParser(description=__doc__, allow_abbrev=False, formatter_class=argparse.RawDescriptionHelpFormatter)
+  PARSER.add_argument('--db', default='tracks.db', help='index database (default: %(default)s)')
+  PARSER.add_argument('--update', nargs='+', metavar='DIRECTORY', help='index new and changed GPX files of these directories')
+  PARSER.add_argument('--near', nargs=3, type=float, metavar=('LATITUDE', 'LONGITUDE', 'METRES'), help='points within a radius')
+  PARSER.add_argument('--box', nargs=4, type=float, metavar=('SOUTH', 'WEST', 'NORTH', 'EAST'), help='points in a box')
+  PARSER.add_argument('--start', type=_time, help='points from this time (ISO 8601, default UTC)')
+  PARSER.add_argument('--end', type=_time, help='points up to this time')
+  PARSER.add_argument('--points', action='store_true', help='print the points instead of the visits')
+  ARGS = PARSER.parse_args()
+
+  with TrackIndex(ARGS.db) as INDEX:
+    if ARGS.update:
+      print('%d files indexed, %d points in total' % (INDEX.update(ARGS.update), len(INDEX)))
+    if ARGS.near:
+      MATCHES = INDEX.near(*ARGS.near, start=ARGS.start, end=ARGS.end)
+    elif ARGS.box:
+      MATCHES = INDEX.box(*ARGS.box, start=ARGS.start, end=ARGS.end)
+    elif ARGS.start or ARGS.end:
+      MATCHES = INDEX.during(ARGS.start, ARGS.end)
+    else:
+      MATCHES = None
+    if MATCHES is not None and ARGS.points:
+      for MATCH in MATCHES:
+        print('%s %d/%d #%d: %s %.6f %.6f %s' % (MATCH.file, MATCH.track, MATCH.segment, MATCH.index, MATCH.time, MATCH.latitude, MATCH.longitude, MATCH.elevation))
+    elif MATCHES is not None:
+      for VISIT in visits(MATCHES):
+        print('%s %d/%d: %s - %s, %d points' % (VISIT.file, VISIT.track, VISIT.segment, VISIT.start, VISIT.end, VISIT.points))
@@ -0,0 +1,214 @@
+''''''
+
+import gzip
+import logging
+import os
+import random
+import shutil
+import time
+
+import requests
+import requests.adapters
+
+def merge_gpx(documents: list[bytes]) -> bytes:
+  '''
+  One GPX document with the tracks of all documents. The tracks are spliced
+  as text, which is enough for the files client_gps writes itself.
+  '''
+  head, end, tail = documents[0].rpartition(b'</gpx>')
+  if not end:
+    raise Exception('Invalid GPX document', documents[0][-64:])
+
+  parts = [head]
+  for document in documents[1:]:
+    first = document.find(b'<trk')
+    last = document.rfind(b'</trk>')
+    if first >= 0 and last >= 0:
+      parts.append(document[first:last + len(b'</trk>')])
+  parts.append(end + tail)
+  return b''.join(parts)
+
+class Uploader:
+  '''
+  Uploads pending GPX files and positions over one pooled HTTP session.
+
+  Up to batch_size pending tracks are merged into one GPX document per
+  request and the body is gzip-compressed (Content-Encoding: gzip). If the
+  server rejects compressed bodies (415) compression is switched off. After a
+  failed request nothing is sent until the backoff expires; the delay doubles
+  with every failure (with jitter) up to max_backoff seconds.
+
+  A file the server rejects for good (4xx) must not hold up the files after
+  it: a rejected batch is sent again one file at a time, and a file that is
+  rejected on its own, or is not a complete GPX document (e.g. a truncated
+  recovered track), is moved to the rejected directory.
+
+  Only call it from one thread; the worker in client_gps owns it.
+  '''
+
+  def __init__(self, url: str = 'https://sailingjackpot.ddns.net/nmea', pending: str = 'pending', uploaded: str = 'uploaded', batch_size: int = 8, compress: bool = True, timeout: float = 30.0, min_backoff: float = 30.0, max_backoff: float = 3600.0, rejected: str = 'rejected'):
+    self._url = url.rstrip('/')
+    self._pending = pending
+    self._uploaded = uploaded
+    self._rejected_directory = rejected
+    self._batch_size = max(1, batch_size)
+    self._compress = compress
+    self._timeout = timeout
+    self._min_backoff = min_backoff
+    self._max_backoff = max_backoff
+
+    self._session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=1)
+    self._session.mount('http://', adapter)
+    self._session.mount('https://', adapter)
+
+    self._failures = 0
+    self._next_attempt = 0.0
+
+    self._requests = 0
+    self._files = 0
+    self._rejected = 0
+    self._bytes_raw = 0
+    self._bytes_sent = 0
+
+  def close(self) -> None:
+    self._session.close()
+
+  def ready(self) -> bool:
+    '''whether the backoff after the last failure has expired'''
+    return time.monotonic() >= self._next_attempt
+
+  def _succeeded(self) -> None:
+    self._failures = 0
+    self._next_attempt = 0.0
+
+  def _failed(self) -> None:
+    self._failures += 1
+    delay = min(self._max_backoff, self._min_backoff * 2 ** (self._failures - 1))
+    delay *= random.uniform(0.5, 1.0)
+    self._next_attempt = time.monotonic() + delay
+    logging.info(f'upload failed {self._failures} times in a row; next attempt in {delay:.0f}s')
+
+  def position(self, date, latitude, longitude, speed, heading) -> bool:
+    if not self.ready():
+      return False
+
+    try:
+      r = self._session.get(f'{self._url}/gps', params={'date': date, 'lat': latitude, 'lon': longitude, 'sog': speed, 'cog': heading}, timeout=self._timeout)
+    except requests.RequestException as e:
+      logging.info(f'Something went wrong; we\'ll try later again: {e}')
+      self._failed()
+      return False
+
+    self._requests += 1
+    logging.info(f'{r.status_code}: {r.url}')
+    return r.ok
+
+  def pending(self) -> list[str]:
+    return sorted([os.path.join(self._pending, f) for f in os.listdir(self._pending) if f.endswith('.gpx') and os.path.isfile(os.path.join(self._pending, f))])
+
+  def upload(self) -> int:
+    '''upload pending files until done or a request fails; returns the number of uploaded files'''
+    uploaded = self._files
+    files = self.pending()
+    while files and self.ready():
+      batch, files = files[:self._batch_size], files[self._batch_size:]
+      if not self._post(batch):
+        break
+    return self._files - uploaded
+
+  def _reject(self, file: str, reason: str) -> None:
+    '''move a file that can never be uploaded out of the way'''
+    logging.warning(f'{file}: {reason}; moved to {self._rejected_directory}')
+    os.makedirs(self._rejected_directory, exist_ok=True)
+    shutil.move(file, self._rejected_directory)
+    self._rejected += 1
+
+  def _post(self, files: list[str]) -> bool:
+    '''upload files in one request; returns False after a failure worth retrying later'''
+    valid = list()
+    documents = list()
+    for file in files:
+      with open(file, 'rb') as f:
+        document = f.read()
+      if document.rfind(b'</gpx>') < 0:
+        self._reject(file, 'not a complete GPX document')
+        continue
+      valid.append(file)
+      documents.append(document)
+    files = valid
+    if not files:
+      return True
+
+    try:
+      data = documents[0] if len(documents) == 1 else merge_gpx(documents)
+    except Exception:
+      logging.exception(f'cannot merge {", ".join(files)}')
+      return all(self._post([file]) for file in files)
+    headers = {'Content-Type': 'application/xml'}
+    body = data
+    if self._compress:
+      body = gzip.compress(data, compresslevel=6)
+      headers['Content-Encoding'] = 'gzip'
+
+    try:
+      r = self._session.post(f'{self._url}/gpx', data=body, headers=headers, timeout=self._timeout)
+    except requests.RequestException as e:
+      logging.info(f'Something went wrong; we\'ll try later again: {e}')
+      self._failed()
+      return False
+
+    self._requests += 1
+    self._bytes_raw += len(data)
+    self._bytes_sent += len(body)
+    logging.info(f'{r.status_code}: {", ".join(files)} ({len(data)} bytes, {len(body)} on the wire)')
+
+    if r.status_code == 415 and self._compress:
+      logging.warning('server does not accept compressed uploads; sending them uncompressed')
+      self._compress = False
+      return self._post(files)
+
+    if 400 <= r.status_code < 500 and r.status_code not in (408, 429): # the request, not the server or the connection
+      if len(files) > 1:
+        return all(self._post([file]) for file in files) # stops at the first failure worth retrying
+      self._reject(files[0], f'rejected by the server ({r.status_code})')
+      return True
+
+    if r.status_code != 200:
+      self._failed()
+      return False
+
+    self._succeeded()
+    for file in files:
+      shutil.move(file, self._uploaded)
+    self._files += len(files)
+    return True
+
+  @property
+  def failures(self) -> int:
+    '''consecutive failed requests'''
+    return self._failures
+
+  @property
+  def requests(self) -> int:
+    return self._requests
+
+  @property
+  def files(self) -> int:
+    '''number of uploaded files'''
+    return self._files
+
+  @property
+  def rejected(self) -> int:
+    '''number of files moved to the rejected directory'''
+    return self._rejected
+
+  @property
+  def bytes_raw(self) -> int:
+    '''uncompressed size of the uploaded GPX bodies'''
+    return self._bytes_raw
+
+  @property
+  def bytes_sent(self) -> int:
+    '''size of the uploaded GPX bodies on the wire'''
+    return self._bytes_sent